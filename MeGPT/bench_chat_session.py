@@ -0,0 +1,126 @@
+"""Per-turn latency over a long chat: KV-cached ChatSession vs re-encoding.
+
+Plays the same scripted conversation through a ChatSession, which keeps
+past_key_values between turns, and through the stateless path, which
+re-tokenizes and re-encodes the whole history every turn (trimmed to the
+model's maximum length so it doesn't fail). Both decode greedily for
+exactly --reply-tokens tokens per turn, so only the context handling
+differs. Reports latency over the first and last ten turns and the
+per-turn latencies as JSON.
+
+    python -m MeGPT.bench_chat_session --model facebook/opt-125m --turns 100 --device cpu
+"""
+import argparse
+import json
+import statistics
+import time
+
+import torch
+
+from MeGPT.generate import ChatSession, autocast_for, greeting, load_model
+
+MESSAGES = [
+    "hey what are you up to",
+    "want to grab dinner later",
+    "i'm running a bit late sorry",
+    "did you see the game last night",
+    "lol that's amazing",
+    "can you send me the address",
+    "what time works for you tomorrow",
+    "ok sounds good see you then",
+]
+
+
+class FixedLengthSession(ChatSession):
+    """Never stops early, so every turn decodes the same number of tokens"""
+
+    def _sample(self, logits):
+        logits[self.tokenizer.eos_token_id] = -float("inf")
+        return super()._sample(logits)
+
+    def _stop_length(self):
+        return 0
+
+
+def reencode_turn(model, tokenizer, history, text, reply_tokens, max_length):
+    """One stateless turn; returns the new history"""
+    history += f"person: {text}\nMeGPT:"
+    ids = tokenizer.encode(history)[-(max_length - reply_tokens) :]
+    input_ids = torch.tensor([ids], device=model.device)
+    with torch.inference_mode(), autocast_for(model.device.type):
+        output = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=reply_tokens,
+            min_new_tokens=reply_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id,
+            use_cache=True,
+        )
+    reply = tokenizer.decode(output[0, len(ids) :], skip_special_tokens=True)
+    return history + reply + "\n"
+
+
+def summarize(name, latencies):
+    first, last = latencies[:10], latencies[-10:]
+    summary = {
+        "mode": name,
+        "first_10_ms": statistics.mean(first) * 1000,
+        "last_10_ms": statistics.mean(last) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "growth": statistics.mean(last) / statistics.mean(first),
+        "per_turn_ms": [round(l * 1000, 2) for l in latencies],
+    }
+    print(
+        f"{name:9s} first 10 turns={summary['first_10_ms']:8.1f}ms last 10 turns={summary['last_10_ms']:8.1f}ms "
+        f"max={summary['max_ms']:8.1f}ms growth={summary['growth']:5.2f}x"
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="facebook/opt-125m", help="adapter directory or model name")
+    parser.add_argument("--device", choices=["auto", "cpu", "cuda"], default="auto")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--reply-tokens", type=int, default=16)
+    parser.add_argument("--max-context", type=int, default=1024)
+    parser.add_argument("--output", default=None, help="also write the JSON results here")
+    args = parser.parse_args(argv)
+
+    model, tokenizer = load_model(args.model, args.device)
+    max_length = model.config.max_position_embeddings
+    script = [MESSAGES[i % len(MESSAGES)] for i in range(args.turns)]
+
+    session = FixedLengthSession(
+        model, tokenizer, max_context_tokens=args.max_context, keep_tokens=args.max_context // 2, temperature=0
+    )
+    cached = []
+    for text in script:
+        start = time.perf_counter()
+        session.say(text, args.reply_tokens)
+        cached.append(time.perf_counter() - start)
+
+    history = greeting
+    reencoded = []
+    for text in script:
+        start = time.perf_counter()
+        history = reencode_turn(model, tokenizer, history, text, args.reply_tokens, max_length)
+        reencoded.append(time.perf_counter() - start)
+
+    results = {
+        "model": args.model,
+        "turns": args.turns,
+        "reply_tokens": args.reply_tokens,
+        "max_context": args.max_context,
+        "session_rebuilds": session.rebuilds,
+        "results": [summarize("session", cached), summarize("re-encode", reencoded)],
+    }
+    print(f"session rebuilt its cache {session.rebuilds} times")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""CPU latency and throughput: unmerged fp32 adapter vs merged fp32 vs merged int8.
+
+Every variant generates exactly --new-tokens tokens greedily for the same
+prompts, at each batch size, after a warm-up call. Exports the adapter to a
+temporary directory first unless --export points at an existing one.
+
+    python -m MeGPT.bench_export --adapter facebook/opt-1.3b-finetuned --batch-sizes 1 8 --threads 16
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import torch
+
+from MeGPT.export import export, load_export
+from MeGPT.fine_tune import configure_cpu_threads
+from MeGPT.generate import greeting, load_model
+
+PROMPT = f"{greeting}person: want to grab dinner later?\nMeGPT:"
+
+
+def time_generate(model, tokenizer, batch_size, new_tokens, repeats):
+    batch = tokenizer([PROMPT] * batch_size, return_tensors="pt", padding=True)
+    latencies = []
+    with torch.inference_mode():
+        for i in range(repeats + 1):
+            start = time.perf_counter()
+            model.generate(
+                **batch,
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id,
+            )
+            if i:  # the first call is warm-up
+                latencies.append(time.perf_counter() - start)
+    latency = statistics.median(latencies)
+    return {
+        "batch_size": batch_size,
+        "latency_ms": latency * 1000,
+        "ms_per_token": latency * 1000 / new_tokens,
+        "tokens_per_second": batch_size * new_tokens / latency,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--adapter", required=True, help="fine-tuned adapter directory")
+    parser.add_argument("--export", default=None, help="existing export of the adapter")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None, help="also write the JSON results here")
+    args = parser.parse_args(argv)
+
+    print(f"{configure_cpu_threads(args.threads)} threads")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.export or export(args.adapter, tmp, "int8")
+        variants = [
+            ("unmerged fp32", lambda: load_model(args.adapter, "cpu")),
+            ("merged fp32", lambda: load_export(path, "none")),
+            ("merged int8", lambda: load_export(path, "int8")),
+        ]
+        results = []
+        for name, load in variants:
+            model, tokenizer = load()
+            for batch_size in args.batch_sizes:
+                result = dict(time_generate(model, tokenizer, batch_size, args.new_tokens, args.repeats), variant=name)
+                results.append(result)
+                print(
+                    f"{name:14s} batch={batch_size:3d} latency={result['latency_ms']:9.1f}ms "
+                    f"ms/token={result['ms_per_token']:7.2f} tokens/s={result['tokens_per_second']:8.1f}"
+                )
+            del model
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Samples/sec of LoRA fine-tuning on CPU over a fixed synthetic corpus.
+
+Each configuration (dtype x intra-op threads) trains for a fixed number of
+steps in its own process, since torch's inter-op pool can only be sized once
+per process. The first steps are treated as warm-up and excluded from the
+rate. Results are printed one per line and as a JSON summary.
+
+    python -m MeGPT.bench_fine_tune --model facebook/opt-125m --dtypes fp32 bf16 --threads 8 16 32
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "hey yeah lol ok sure sounds good what are you up to tonight want to grab food "
+    "i'm on my way running late be there soon did you see that omg haha no way "
+    "can't wait for the weekend let me know when you're free call me later"
+).split()
+
+
+def write_corpus(path, records=2000, seed=0):
+    """Write a deterministic JSON corpus of short chat-like messages"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for _ in range(records):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 40)))
+            f.write(json.dumps({"text": text}) + "\n")
+
+
+def run_one(args):
+    """Train one configuration in this process and return its measurements"""
+    from transformers import TrainerCallback
+
+    from MeGPT.fine_tune import fine_tune
+
+    class StepTimer(TrainerCallback):
+        def __init__(self):
+            self.times = []
+
+        def on_step_end(self, args, state, control, **kwargs):
+            self.times.append(time.perf_counter())
+
+    timer = StepTimer()
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus.json")
+        write_corpus(corpus, args.records, args.seed)
+        fine_tune(
+            input_json=corpus,
+            model_name=args.model,
+            output_dir=os.path.join(tmp, "out"),
+            block_size=args.block_size,
+            callbacks=[timer],
+            device="cpu",
+            dtype=args.dtype,
+            num_threads=args.threads,
+            interop_threads=args.interop_threads,
+            batch_size=args.batch_size,
+            gradient_accumulation_steps=args.grad_accum,
+            max_steps=args.warmup + args.steps,
+            logging_steps=args.warmup + args.steps,
+            save=False,
+            cache_dir=os.path.join(tmp, "cache"),
+        )
+
+    measured = timer.times[args.warmup :]
+    seconds = measured[-1] - measured[0]
+    samples = (len(measured) - 1) * args.batch_size * args.grad_accum
+    return {
+        "model": args.model,
+        "dtype": args.dtype,
+        "threads": args.threads,
+        "interop_threads": args.interop_threads,
+        "batch_size": args.batch_size,
+        "grad_accum": args.grad_accum,
+        "block_size": args.block_size,
+        "steps": len(measured) - 1,
+        "seconds": seconds,
+        "samples_per_second": samples / seconds if seconds else None,
+        "tokens_per_second": samples * args.block_size / seconds if seconds else None,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="facebook/opt-125m")
+    parser.add_argument("--dtypes", nargs="+", default=["fp32", "bf16"], choices=["fp32", "bf16"])
+    parser.add_argument("--threads", nargs="+", type=int, default=[os.cpu_count()])
+    parser.add_argument("--interop-threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--grad-accum", type=int, default=4)
+    parser.add_argument("--block-size", type=int, default=128)
+    parser.add_argument("--records", type=int, default=2000, help="synthetic messages in the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=2, help="optimizer steps excluded from the rate")
+    parser.add_argument("--steps", type=int, default=10, help="optimizer steps measured")
+    parser.add_argument("--output", default=None, help="also write the JSON results here")
+    # Internal: run a single configuration and print its result
+    parser.add_argument("--dtype", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.dtype is not None:
+        args.threads = args.threads[0]
+        print(json.dumps(run_one(args)))
+        return
+
+    results = []
+    for dtype in args.dtypes:
+        for threads in args.threads:
+            command = [
+                sys.executable, "-m", "MeGPT.bench_fine_tune",
+                "--model", args.model, "--dtype", dtype, "--threads", str(threads),
+                "--batch-size", str(args.batch_size), "--grad-accum", str(args.grad_accum),
+                "--block-size", str(args.block_size), "--records", str(args.records),
+                "--seed", str(args.seed), "--warmup", str(args.warmup), "--steps", str(args.steps),
+            ]
+            if args.interop_threads:
+                command += ["--interop-threads", str(args.interop_threads)]
+            output = subprocess.run(command, cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(
+                f"{dtype:5s} threads={threads:3d} samples/s={result['samples_per_second']:8.2f} "
+                f"tokens/s={result['tokens_per_second']:10.1f}"
+            )
+
+    summary = json.dumps(results, indent=2)
+    print(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(summary)
+
+
+if __name__ == "__main__":
+    main()
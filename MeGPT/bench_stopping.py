@@ -0,0 +1,72 @@
+"""Decode steps and latency saved by stopping at the end of the turn.
+
+Generates replies for the same batch of prompts with and without
+StopOnSequences and reports how many tokens were decoded and how long each
+batch took.
+
+    python -m MeGPT.bench_stopping --model facebook/opt-1.3b-finetuned --batch-size 4 --rounds 5
+"""
+import argparse
+import time
+
+import torch
+
+from MeGPT.generate import StopOnSequences, autocast_for, greeting, load_model, stop_sequences
+
+PROMPTS = [
+    "want to grab dinner later",
+    "did you see the game last night",
+    "can you send me the address",
+    "what time works for you tomorrow",
+    "i'm running a bit late sorry",
+    "lol that's amazing",
+    "how was your day",
+    "are you coming to the party",
+]
+
+
+def run_batch(model, tokenizer, prompts, max_new_tokens, stop):
+    batch = tokenizer([f"{greeting}person: {p}\nMeGPT:" for p in prompts], return_tensors="pt", padding=True)
+    batch = {k: v.to(model.device) for k, v in batch.items()}
+    prompt_length = batch["input_ids"].shape[1]
+    criteria = [StopOnSequences(stop_sequences(tokenizer), prompt_length, tokenizer.eos_token_id)] if stop else []
+
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    with torch.inference_mode(), autocast_for(model.device.type):
+        output = model.generate(
+            **batch,
+            max_new_tokens=max_new_tokens,
+            do_sample=True,
+            temperature=0.6,
+            pad_token_id=tokenizer.pad_token_id,
+            stopping_criteria=criteria,
+        )
+    return time.perf_counter() - start, output.shape[1] - prompt_length
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="facebook/opt-125m", help="adapter directory or model name")
+    parser.add_argument("--device", choices=["auto", "cpu", "cuda"], default="auto")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    model, tokenizer = load_model(args.model, args.device)
+    for stop in (False, True):
+        seconds, steps = 0.0, 0
+        for i in range(args.rounds):
+            prompts = [PROMPTS[(i * args.batch_size + j) % len(PROMPTS)] for j in range(args.batch_size)]
+            elapsed, decoded = run_batch(model, tokenizer, prompts, args.max_new_tokens, stop)
+            seconds += elapsed
+            steps += decoded
+        print(
+            f"{'stop words' if stop else 'no stop':10s} decode steps/batch={steps / args.rounds:6.1f} "
+            f"latency/batch={seconds / args.rounds * 1000:8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Export a fine-tuned adapter as a standalone CPU inference model.
+
+The LoRA weights are merged into the base model, so inference runs plain
+Linear layers with no adapter on the side, and the merged model is saved
+with save_pretrained. With int8 quantization (the default), its Linear
+layers are converted to dynamic int8 when loaded; that takes a few seconds
+and needs no calibration data, so the saved weights stay in fp32 and the
+same export can also be served unquantized.
+
+    python -m MeGPT.export --adapter facebook/opt-1.3b-finetuned --output models/megpt-cpu
+"""
+import argparse
+import json
+import os
+import time
+
+import torch
+from peft import PeftConfig, PeftModel
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+EXPORT_CONFIG = "megpt_export.json"
+
+
+def is_export(path):
+    return os.path.isfile(os.path.join(path, EXPORT_CONFIG))
+
+
+def merge_adapter(adapter_dir):
+    """The adapter's base model in fp32 on CPU with the LoRA weights merged in"""
+    config = PeftConfig.from_pretrained(adapter_dir)
+    model = AutoModelForCausalLM.from_pretrained(config.base_model_name_or_path, torch_dtype=torch.float32)
+    model = PeftModel.from_pretrained(model, adapter_dir)
+    model = model.merge_and_unload()
+    tokenizer = AutoTokenizer.from_pretrained(config.base_model_name_or_path)
+    return model, tokenizer, config.base_model_name_or_path
+
+
+def quantize(model):
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations quantized per batch)"""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export(adapter_dir, output_dir, quantization="int8"):
+    start = time.perf_counter()
+    model, tokenizer, base_model_name = merge_adapter(adapter_dir)
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, EXPORT_CONFIG), "w") as f:
+        json.dump(
+            {"adapter": adapter_dir, "base_model": base_model_name, "quantization": quantization},
+            f,
+            indent=2,
+        )
+    print(f"Exported {adapter_dir} to {output_dir} in {time.perf_counter() - start:.1f}s")
+    return output_dir
+
+
+def load_export(path, quantization=None):
+    """Load an export on CPU, quantized as it was exported unless quantization overrides it"""
+    with open(os.path.join(path, EXPORT_CONFIG)) as f:
+        config = json.load(f)
+    model = AutoModelForCausalLM.from_pretrained(path, torch_dtype=torch.float32)
+    if (quantization or config["quantization"]) == "int8":
+        model = quantize(model)
+    model.eval()
+
+    tokenizer = AutoTokenizer.from_pretrained(path, padding_side="left")
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+    return model, tokenizer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge a LoRA adapter into its base model for CPU inference")
+    parser.add_argument("--adapter", required=True, help="fine-tuned adapter directory")
+    parser.add_argument("--output", required=True, help="directory to write the merged model to")
+    parser.add_argument("--quantization", choices=["int8", "none"], default="int8")
+    args = parser.parse_args(argv)
+    export(args.adapter, args.output, args.quantization)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,53 +3,50 @@ import sqlite3
 import json
 import sys
 import tarfile
-import tempfile
 
-def extract_messages(phone_number: str) -> list:
-    """Extract messages for a given phone number and return them as a list."""
-    # Get the user's home directory
-    home = os.path.expanduser("~")
-    
-    # Path to the SQLite database
-    db_path = f"{home}/Library/Messages/chat.db"
-    
-    # SQL query to extract messages
-    query = """
-    WITH messages_with_prev AS (
-        SELECT m.ROWID, m.guid, m.text, m.subject, m.country, m.date, chj.chat_id, m.is_from_me,
-               LAG(m.is_from_me) OVER (PARTITION BY chj.chat_id ORDER BY m.date) AS prev_is_from_me
-        FROM message AS m
-        JOIN chat_message_join AS chj ON m.ROWID = chj.message_id
-        JOIN handle h ON m.handle_id = h.ROWID
-        WHERE LENGTH(m.text) > 0
-        AND h.id = ?  -- Phone number in format: +1234567890
-    ),
-    grouped_messages AS (
-        SELECT *,
-               SUM(CASE WHEN is_from_me != IFNULL(prev_is_from_me, -1) THEN 1 ELSE 0 END) OVER (PARTITION BY chat_id ORDER BY date) AS grp
-        FROM messages_with_prev
-    ),
-    consecutive_messages AS (
-        SELECT chat_id, is_from_me, group_concat(text, '\n') AS joined_text, MIN(date) AS min_date
-        FROM grouped_messages
-        GROUP BY chat_id, is_from_me, grp
-    ),
-    my_consecutive_messages AS (
-        SELECT * FROM consecutive_messages WHERE is_from_me = 1
-    ),
-    other_consecutive_messages AS (
-        SELECT * FROM consecutive_messages WHERE is_from_me = 0
-    )
+# Pairs each block of consecutive "my" messages with the block of "other"
+# messages right before it in the same chat.
+PAIRS_QUERY = """
+WITH messages_with_prev AS (
+    SELECT m.ROWID, m.guid, m.text, m.subject, m.country, m.date, chj.chat_id, m.is_from_me,
+           LAG(m.is_from_me) OVER (PARTITION BY chj.chat_id ORDER BY m.date) AS prev_is_from_me
+    FROM message AS m
+    JOIN chat_message_join AS chj ON m.ROWID = chj.message_id
+    JOIN handle h ON m.handle_id = h.ROWID
+    WHERE LENGTH(m.text) > 0
+    AND h.id = ?  -- Phone number in format: +1234567890
+),
+grouped_messages AS (
+    SELECT *,
+           SUM(CASE WHEN is_from_me != IFNULL(prev_is_from_me, -1) THEN 1 ELSE 0 END) OVER (PARTITION BY chat_id ORDER BY date) AS grp
+    FROM messages_with_prev
+),
+consecutive_messages AS (
+    SELECT chat_id, is_from_me, group_concat(text, '\n') AS joined_text, MIN(date) AS min_date
+    FROM grouped_messages
+    GROUP BY chat_id, is_from_me, grp
+),
+blocks_with_prev AS (
+    SELECT *,
+           LAG(joined_text) OVER (PARTITION BY chat_id ORDER BY min_date) AS prev_text,
+           LAG(is_from_me) OVER (PARTITION BY chat_id ORDER BY min_date) AS prev_is_from_me
+    FROM consecutive_messages
+)
 
-    SELECT other.joined_text AS prev_text, my.joined_text AS my_text
-            FROM my_consecutive_messages AS my
-    LEFT JOIN other_consecutive_messages AS other ON my.chat_id = other.chat_id AND other.min_date < my.min_date
-    WHERE other.min_date = (
-        SELECT MAX(min_date) FROM other_consecutive_messages AS ocm
-        WHERE ocm.chat_id = my.chat_id AND ocm.min_date < my.min_date
-    )
-    ORDER BY my.min_date;
-    """
+-- Blocks alternate senders, so the block right before each "my" block is
+-- the previous "other" block. One window pass instead of a self-join.
+SELECT prev_text, joined_text AS my_text
+FROM blocks_with_prev
+WHERE is_from_me = 1 AND prev_is_from_me = 0
+ORDER BY min_date;
+"""
+
+def iter_messages(phone_number: str, db_path: str = None, batch_size: int = 1000):
+    """Yield training records for a given phone number, fetching rows in batches."""
+    # Path to the SQLite database
+    if db_path is None:
+        home = os.path.expanduser("~")
+        db_path = f"{home}/Library/Messages/chat.db"
 
     # Check if file exists
     if not os.path.exists(db_path):
@@ -70,17 +67,15 @@ def extract_messages(phone_number: str) -> list:
         clean_number = '+' + ''.join(c for c in phone_number.lstrip('+') if c.isdigit())
         
         # Execute query
-        cursor.execute(query, (clean_number,))
-        results = cursor.fetchall()
-        
-        if not results:
-            return []
-            
-        # Process results
-        results = [tuple(map(lambda x: x.replace("\n", " ") if x else "", row)) for row in results]
-        messages = [{"text": f"person: {row[0]}\nMeGPT: {row[1]}", "label": 0} for row in results]
-        
-        return messages
+        cursor.execute(PAIRS_QUERY, (clean_number,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for prev_text, my_text in rows:
+                prev_text = prev_text.replace("\n", " ") if prev_text else ""
+                my_text = my_text.replace("\n", " ") if my_text else ""
+                yield {"text": f"person: {prev_text}\nMeGPT: {my_text}", "label": 0}
 
     except sqlite3.Error as e:
         raise Exception(f"Database error: {str(e)}")
@@ -88,22 +83,31 @@ def extract_messages(phone_number: str) -> list:
         if 'conn' in locals():
             conn.close()
 
+def extract_messages(phone_number: str) -> list:
+    """Extract messages for a given phone number and return them as a list."""
+    return list(iter_messages(phone_number))
+
 if __name__ == "__main__":
     # This part only runs when script is executed directly
     phone_number = input("Enter phone number (format: +1234567890): ")
     try:
-        messages = extract_messages(phone_number)
-        if messages:
-            print(f"Found {len(messages)} conversations")
-            # Save to JSON
-            with open("messages.json", "w") as f:
-                json.dump(messages, f, indent=4)
+        # Stream records to JSON one at a time
+        count = 0
+        with open("messages.json", "w") as f:
+            f.write("[")
+            for message in iter_messages(phone_number):
+                f.write(("," if count else "") + "\n    " + json.dumps(message))
+                count += 1
+            f.write("\n]")
+        if count:
+            print(f"Found {count} conversations")
             # Create tar.gz
             with tarfile.open("messages.tar.gz", "w:gz") as tar:
                 tar.add("messages.json")
             os.remove("messages.json")
             print("Successfully saved messages to messages.tar.gz")
         else:
+            os.remove("messages.json")
             print("No messages found")
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -1,39 +1,17 @@
-from itertools import chain
-
+import argparse
 import os
 import torch
 import transformers
-from datasets import load_dataset
 from peft import LoraConfig, get_peft_model, prepare_model_for_int8_training
 from transformers import AutoModelForCausalLM, AutoTokenizer, TrainingArguments
 
+from MeGPT.prepare_data import CACHE_DIR, load_packed_dataset
+
 
 model_name = "facebook/opt-1.3b"
 block_size = 128
 input_json = "response.json"
 
-model = AutoModelForCausalLM.from_pretrained(
-    model_name,
-    load_in_8bit=True,
-    device_map="auto",
-)
-
-
-tokenizer = AutoTokenizer.from_pretrained(
-    model_name, model_max_length=1024, padding_side="left"
-)
-if tokenizer.pad_token_id is None:
-    tokenizer.pad_token_id = tokenizer.eos_token_id
-
-
-model = prepare_model_for_int8_training(model)
-for name, param in model.named_parameters():
-    # freeze base model's layers
-    param.requires_grad = False
-    if getattr(model, "is_loaded_in_8bit", False):
-        if param.ndim == 1 and "layer_norm" in name:
-            param.data = param.data.to(torch.float16)
-
 
 def print_trainable_parameters(model):
     trainable_params = 0
@@ -47,99 +25,232 @@ def print_trainable_parameters(model):
     )
 
 
-target_modules = None
-if "gpt-neox" in model_name:
-    target_modules = [
-        "query_key_value",
-        "xxx",
-    ]
-config = LoraConfig(
-    r=16,
-    lora_alpha=32,
-    target_modules=target_modules,
-    lora_dropout=0.05,
-    bias="none",
-    task_type="CAUSAL_LM",
-)
-
-model = get_peft_model(model, config)
-print_trainable_parameters(model)
-
-
-training_args = TrainingArguments(
-    f"{model_name}-finetuned",
-    evaluation_strategy="steps",
+def resolve_device(device="auto"):
+    """Pick "cuda" or "cpu" for device="auto", based on whether a GPU is present"""
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def configure_cpu_threads(num_threads=None, interop_threads=None):
+    """Size torch's thread pools for CPU training.
+
+    Defaults to one intra-op thread per core and a small inter-op pool; the
+    training step is a chain of large matmuls, so wide intra-op parallelism
+    is what matters. Must run before torch does any parallel work.
+    """
+    num_threads = num_threads or os.cpu_count()
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(interop_threads or min(4, num_threads))
+    except RuntimeError:
+        # Already fixed once torch has started parallel work; keep what is set
+        pass
+    return torch.get_num_threads()
+
+
+def load_model(model_name, device):
+    """Load the base model for LoRA training on device.
+
+    On CUDA the weights are loaded in 8-bit. On CPU they stay fp32; bf16
+    training runs forward/backward under autocast instead, which keeps fp32
+    master weights for the LoRA updates.
+    """
+    if device == "cuda":
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            load_in_8bit=True,
+            device_map="auto",
+        )
+        model = prepare_model_for_int8_training(model)
+        for name, param in model.named_parameters():
+            # freeze base model's layers
+            param.requires_grad = False
+            if getattr(model, "is_loaded_in_8bit", False):
+                if param.ndim == 1 and "layer_norm" in name:
+                    param.data = param.data.to(torch.float16)
+        return model
+
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+    for param in model.parameters():
+        # freeze base model's layers
+        param.requires_grad = False
+    return model
+
+
+def fine_tune(
+    input_json=input_json,
+    model_name=model_name,
+    output_dir=None,
+    block_size=block_size,
+    callbacks=None,
+    device="auto",
+    dtype="fp32",
+    num_threads=None,
+    interop_threads=None,
+    batch_size=8,
+    gradient_accumulation_steps=1,
+    num_train_epochs=3,
+    max_steps=-1,
     learning_rate=2e-5,
-    weight_decay=0.01,
     logging_steps=100,
-    logging_strategy="steps",
-)
-
-data = load_dataset("json", data_files=input_json, split="train")
-data = data.map(lambda x: {"label": 0})
-data = data.train_test_split(test_size=0.1)
-
-
-def group_texts(examples):
-    concatenated_examples = {k: list(chain(*examples[k])) for k in examples.keys()}
-    total_length = len(concatenated_examples[list(examples.keys())[0]])
-
-    if total_length >= block_size:
-        total_length = (total_length // block_size) * block_size
-    result = {
-        k: [t[i : i + block_size] for i in range(0, total_length, block_size)]
-        for k, t in concatenated_examples.items()
-    }
-    result["labels"] = result["input_ids"].copy()
-    return result
-
-
-columns = data["train"].features
-data = data.map(
-    lambda samples: tokenizer(samples["text"], padding=True, truncation=True),
-    batched=True,
-    remove_columns=columns,
-    num_proc=os.cpu_count(),
-)
-
-data = data.map(group_texts, batched=True, batch_size=1000, num_proc=os.cpu_count())
-data.set_format(type="torch", columns=["input_ids", "labels"])
-
-model.gradient_checkpointing_enable()
-trainer = transformers.Trainer(
-    model=model,
-    train_dataset=data["train"],
-    eval_dataset=data["test"],
-    args=training_args,
-    data_collator=transformers.DataCollatorForLanguageModeling(tokenizer, mlm=False),
-)
-model.config.use_cache = False  # silence the warnings. Please re-enable for inference!
-trainer.train()
-
-# save the model
-model.save_pretrained(
-    f"{model_name}-finetuned",
-    save_function=trainer.save_model,
-    push_to_hub=False,
-)
-
-model.config.use_cache = True  # re-enable for inference
-
-# inference
-PROMPT = """hello, how are you?"""
-batch = tokenizer(PROMPT, return_tensors="pt", padding=True, truncation=True)
-
-with torch.cuda.amp.autocast():
-    output_tokens = model.generate(
-        **batch,
-        max_new_tokens=500,
-        do_sample=True,
-        top_k=50,
-        top_p=0.95,
-        temperature=0.9,
-        eos_token_id=tokenizer.eos_token_id,
-        pad_token_id=tokenizer.pad_token_id,
-        num_return_sequences=1,
+    gradient_checkpointing=None,
+    save=True,
+    cache_dir=CACHE_DIR,
+):
+    """LoRA fine-tune model_name on input_json and save the adapter to output_dir.
+
+    device is "cuda", "cpu" or "auto". On CPU, dtype picks fp32 or bf16
+    autocast and num_threads/interop_threads size torch's thread pools.
+    callbacks are passed to the transformers Trainer, e.g. to report progress
+    or stop training early. The tokenized corpus is cached in cache_dir.
+    Returns the trained model, tokenizer and the Trainer's TrainOutput.
+    """
+    output_dir = output_dir or f"{model_name}-finetuned"
+    device = resolve_device(device)
+    if device == "cpu":
+        print(f"Training on CPU with {configure_cpu_threads(num_threads, interop_threads)} threads, {dtype}")
+    if gradient_checkpointing is None:
+        # Saves GPU memory; on CPU, RAM is plentiful and recomputation is pure cost
+        gradient_checkpointing = device == "cuda"
+
+    model = load_model(model_name, device)
+
+    tokenizer = AutoTokenizer.from_pretrained(
+        model_name, model_max_length=1024, padding_side="left"
     )
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+
+    target_modules = None
+    if "gpt-neox" in model_name:
+        target_modules = [
+            "query_key_value",
+            "xxx",
+        ]
+    config = LoraConfig(
+        r=16,
+        lora_alpha=32,
+        target_modules=target_modules,
+        lora_dropout=0.05,
+        bias="none",
+        task_type="CAUSAL_LM",
+    )
+
+    model = get_peft_model(model, config)
+    print_trainable_parameters(model)
+
+    training_args = TrainingArguments(
+        output_dir,
+        evaluation_strategy="steps",
+        learning_rate=learning_rate,
+        weight_decay=0.01,
+        logging_steps=logging_steps,
+        logging_strategy="steps",
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=batch_size,
+        gradient_accumulation_steps=gradient_accumulation_steps,
+        num_train_epochs=num_train_epochs,
+        max_steps=max_steps,
+        no_cuda=device == "cpu",
+        bf16=dtype == "bf16",
+        dataloader_num_workers=0,
+        report_to=[],
+    )
+
+    # Tokenized once per corpus and tokenizer, then memory-mapped on later runs
+    data = load_packed_dataset(input_json, tokenizer, block_size, cache_dir)
+    train_data, eval_data = data.split(test_size=0.1)
+
+    if gradient_checkpointing:
+        model.gradient_checkpointing_enable()
+    trainer = transformers.Trainer(
+        model=model,
+        train_dataset=train_data,
+        eval_dataset=eval_data,
+        args=training_args,
+        # Blocks are full length and carry their labels, so nothing to pad or mask
+        data_collator=transformers.default_data_collator,
+        callbacks=callbacks,
+    )
+    model.config.use_cache = False  # silence the warnings. Please re-enable for inference!
+    result = trainer.train()
+
+    # save the model
+    if save:
+        model.save_pretrained(
+            output_dir,
+            save_function=trainer.save_model,
+            push_to_hub=False,
+        )
+
+    model.config.use_cache = True  # re-enable for inference
+    return model, tokenizer, result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="LoRA fine-tune a causal LM on exported messages")
+    parser.add_argument("--input", default=input_json, help="JSON file of {\"text\": ...} records")
+    parser.add_argument("--model", default=model_name, help="base model name or path")
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument("--block-size", type=int, default=block_size)
+    parser.add_argument("--device", choices=["auto", "cpu", "cuda"], default="auto")
+    parser.add_argument("--dtype", choices=["fp32", "bf16"], default="fp32", help="CPU precision (bf16 uses autocast)")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads (default: all cores)")
+    parser.add_argument("--interop-threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--grad-accum", type=int, default=1, help="gradient accumulation steps")
+    parser.add_argument("--epochs", type=float, default=3)
+    parser.add_argument("--max-steps", type=int, default=-1)
+    parser.add_argument("--learning-rate", type=float, default=2e-5)
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="where tokenized corpora are cached")
+    parser.add_argument("--prompt", default="hello, how are you?", help="sample completion after training")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model, tokenizer, _ = fine_tune(
+        input_json=args.input,
+        model_name=args.model,
+        output_dir=args.output_dir,
+        block_size=args.block_size,
+        device=args.device,
+        dtype=args.dtype,
+        num_threads=args.threads,
+        interop_threads=args.interop_threads,
+        batch_size=args.batch_size,
+        gradient_accumulation_steps=args.grad_accum,
+        num_train_epochs=args.epochs,
+        max_steps=args.max_steps,
+        learning_rate=args.learning_rate,
+        cache_dir=args.cache_dir,
+    )
+
+    # inference
+    device = resolve_device(args.device)
+    batch = tokenizer(args.prompt, return_tensors="pt", padding=True, truncation=True)
+    batch = {k: v.to(model.device) for k, v in batch.items()}
+
+    if device == "cuda":
+        autocast = torch.cuda.amp.autocast()
+    else:
+        autocast = torch.autocast("cpu", dtype=torch.bfloat16, enabled=args.dtype == "bf16")
+    with autocast:
+        output_tokens = model.generate(
+            **batch,
+            max_new_tokens=500,
+            do_sample=True,
+            top_k=50,
+            top_p=0.95,
+            temperature=0.9,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id,
+            num_return_sequences=1,
+        )
+
+    print("\n\n", tokenizer.decode(output_tokens[0], skip_special_tokens=True))
+
 
-print("\n\n", tokenizer.decode(output_tokens[0], skip_special_tokens=True))
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import argparse
+import contextlib
+
 import torch
 from transformers import (
     AutoModelForCausalLM,
@@ -9,73 +12,279 @@ from peft import (
     PeftConfig,
     PeftModel,
 )
-import re
+
+from MeGPT.export import is_export, load_export
+from MeGPT.fine_tune import resolve_device
 
 model_name = "facebook/opt-1.3b-finetuned"
-config = PeftConfig.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(
-    config.base_model_name_or_path,
-    load_in_8bit=True,
-    device_map="auto",
-)
+greeting = "MeGPT: hi i am you. How can I help?\n"
+stop_words = ["MeGPT:", "person:"]
 
-tokenizer = AutoTokenizer.from_pretrained(config.base_model_name_or_path)
 
-model = PeftModel.from_pretrained(model, model_name)
-model.to("cuda")
+def load_model(model_name=model_name, device="auto"):
+    """Load a fine-tuned adapter, a CPU export or a plain model and its tokenizer for inference"""
+    if is_export(model_name):
+        # Merged (and usually int8) weights, made for the CPU
+        return load_export(model_name)
+    device = resolve_device(device)
+    try:
+        config = PeftConfig.from_pretrained(model_name)
+        base_model_name = config.base_model_name_or_path
+    except ValueError:
+        config, base_model_name = None, model_name
 
-stop_words_ids = [tokenizer.encode(stop_word) for stop_word in ["MeGPT:", "person:"]]
+    if device == "cuda":
+        model = AutoModelForCausalLM.from_pretrained(
+            base_model_name,
+            load_in_8bit=True,
+            device_map="auto",
+        )
+    else:
+        model = AutoModelForCausalLM.from_pretrained(base_model_name, torch_dtype=torch.float32)
+    if config is not None:
+        model = PeftModel.from_pretrained(model, model_name)
+    model.eval()
 
+    # Left padding keeps every row of a batch ending at its prompt's last token
+    tokenizer = AutoTokenizer.from_pretrained(base_model_name, padding_side="left")
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+    return model, tokenizer
 
-class StoppingCriteriaSub(StoppingCriteria):
-    def __init__(self, stops=[]):
-        StoppingCriteria.__init__(self),
 
-    def __call__(
-        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, stops=[]
-    ):
-        self.stops = stops
-        for i in range(len(stops)):
-            self.stops = self.stops[i]
+def autocast_for(device):
+    return torch.cuda.amp.autocast() if device == "cuda" else contextlib.nullcontext()
 
 
-stopping_criteria = StoppingCriteriaList([StoppingCriteriaSub(stops=stop_words_ids)])
+def stop_sequences(tokenizer, words=stop_words):
+    """Token ids of each stop word, as it tokenizes at the start of a line and after a space"""
+    sequences = []
+    for word in words:
+        for text in (word, " " + word):
+            ids = tokenizer.encode(text, add_special_tokens=False)
+            if ids and ids not in sequences:
+                sequences.append(ids)
+    return sequences
 
 
-def chat_with_model(input_text, conversation_history):
-    conversation_text = f"{conversation_history}person: {input_text}\nMeGPT: "
+class StopOnSequences(StoppingCriteria):
+    """Stops generation once every row of the batch has produced a stop sequence or EOS.
 
-    batch = tokenizer(conversation_text, return_tensors="pt", padding=True)
-    batch = {k: v.to("cuda") for k, v in batch.items()}
+    Each step compares only the last len(stop) ids of each row with each stop
+    sequence. ends[i] is where row i's stop sequence (or EOS) begins, or None
+    if that row hasn't stopped; tokens from there on are not part of the
+    reply. Use a new instance for every generate call.
+    """
 
-    with torch.cuda.amp.autocast():
+    def __init__(self, stops, prompt_length=0, eos_token_id=None):
+        self.stops = [torch.tensor(stop) for stop in stops if stop]
+        if eos_token_id is not None:
+            self.stops.append(torch.tensor([eos_token_id]))
+        self.prompt_length = prompt_length
+        self.done = None
+        self.ends = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        length = input_ids.shape[1]
+        if self.done is None:
+            self.done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+            self.ends = [None] * input_ids.shape[0]
+            self.stops = [stop.to(input_ids.device) for stop in self.stops]
+        for stop in self.stops:
+            if length - self.prompt_length < len(stop):
+                continue
+            hit = (input_ids[:, -len(stop) :] == stop).all(dim=1) & ~self.done
+            if hit.any():
+                for row in hit.nonzero().flatten().tolist():
+                    self.ends[row] = length - len(stop)
+                self.done |= hit
+        return bool(self.done.all())
+
+
+def generate_replies(model, tokenizer, prompts, max_new_tokens=100, temperature=0.6):
+    """Complete a batch of prompts, each ending at its first stop word"""
+    # Drop the start of prompts that would leave no room for the reply
+    max_positions = getattr(model.config, "max_position_embeddings", None)
+    if max_positions:
+        tokenizer.truncation_side = "left"
+        batch = tokenizer(
+            prompts, return_tensors="pt", padding=True, truncation=True, max_length=max_positions - max_new_tokens
+        )
+    else:
+        batch = tokenizer(prompts, return_tensors="pt", padding=True)
+    batch = {k: v.to(model.device) for k, v in batch.items()}
+    prompt_length = batch["input_ids"].shape[1]
+    stop = StopOnSequences(stop_sequences(tokenizer), prompt_length, tokenizer.eos_token_id)
+
+    with torch.inference_mode(), autocast_for(model.device.type):
         output_tokens = model.generate(
             **batch,
-            max_new_tokens=100,
-            temperature=0.6,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
             pad_token_id=tokenizer.pad_token_id,
             use_cache=True,
-            do_sample=True,
-            stopping_criteria=stopping_criteria,
+            do_sample=temperature > 0,
+            stopping_criteria=StoppingCriteriaList([stop]),
         )
 
-    response_text = tokenizer.decode(output_tokens[0], skip_special_tokens=True).strip()
-    if "  " in response_text:
-        regex = re.compile(r"\s{2,}")
-        split = regex.split(response_text)
-        response_text = split[1]
+    replies = []
+    for row, ids in enumerate(output_tokens):
+        end = stop.ends[row] if stop.ends and stop.ends[row] is not None else len(ids)
+        replies.append(tokenizer.decode(ids[prompt_length:end], skip_special_tokens=True).strip())
+    return replies
 
-    conversation_history += f"person: {input_text}\nMeGPT: {response_text}\n"
 
+def chat_with_model(model, tokenizer, input_text, conversation_history, max_new_tokens=100):
+    """Stateless turn: re-encodes the whole conversation_history every call"""
+    conversation_text = f"{conversation_history}person: {input_text}\nMeGPT:"
+    response_text = generate_replies(model, tokenizer, [conversation_text], max_new_tokens)[0]
+    conversation_history += f"person: {input_text}\nMeGPT: {response_text}\n"
     return response_text, conversation_history
 
 
-conversation_history = "MeGPT: hi i am you. How can I help?\n"
-print(conversation_history)
-while True:
-    user_input = input("> ")
-    if user_input.lower() == "quit":
-        break
-    response, conversation_history = chat_with_model(user_input, conversation_history)
+class ChatSession:
+    """A conversation that keeps the model's KV cache between turns.
+
+    Each turn only encodes the new user input and the generated reply; the
+    rest of the conversation is already in past_key_values. When the
+    conversation would grow past max_context_tokens, the oldest turns are
+    dropped until it fits in keep_tokens (the greeting is always kept) and
+    the cache is rebuilt from what is left. That full re-encode happens once
+    every (max_context_tokens - keep_tokens) tokens rather than every turn.
+    """
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        greeting=greeting,
+        max_context_tokens=1024,
+        keep_tokens=512,
+        temperature=0.6,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = model.device
+        self.max_context_tokens = max_context_tokens
+        self.keep_tokens = keep_tokens
+        self.temperature = temperature
+        self.stop_ids = stop_sequences(tokenizer)
+
+        self.ids = tokenizer.encode(greeting)  # whole conversation, with special tokens
+        self.prefix_len = len(self.ids)
+        self.turn_starts = []  # index in ids where each turn begins
+        self.past = None
+        self.cached = 0  # leading ids whose keys/values are in past
+        self.rebuilds = 0
+
+    @property
+    def history(self):
+        return self.tokenizer.decode(self.ids, skip_special_tokens=True)
+
+    def say(self, input_text, max_new_tokens=100):
+        """Add the person's message and return MeGPT's reply"""
+        turn = f"person: {input_text}\nMeGPT:"
+        if not self.tokenizer.decode(self.ids[-1:]).endswith("\n"):
+            turn = "\n" + turn
+        self.turn_starts.append(len(self.ids))
+        self.ids.extend(self.tokenizer.encode(turn, add_special_tokens=False))
+        self._fit(max_new_tokens)
+
+        reply_start = len(self.ids)
+        with torch.inference_mode(), autocast_for(self.device.type):
+            for _ in range(max_new_tokens):
+                token = self._sample(self._forward())
+                if token == self.tokenizer.eos_token_id:
+                    break
+                self.ids.append(token)
+                stop = self._stop_length()
+                if stop:
+                    self._rewind(len(self.ids) - stop)
+                    break
+
+        reply_ids = self.ids[reply_start:]
+        return self.tokenizer.decode(reply_ids, skip_special_tokens=True).strip()
+
+    def _forward(self):
+        """Encode the ids not yet in the cache; return the next-token logits"""
+        new = torch.tensor([self.ids[self.cached :]], device=self.device)
+        attention_mask = torch.ones((1, len(self.ids)), dtype=torch.long, device=self.device)
+        output = self.model(
+            input_ids=new,
+            attention_mask=attention_mask,
+            past_key_values=self.past,
+            use_cache=True,
+        )
+        self.past = output.past_key_values
+        self.cached = len(self.ids)
+        return output.logits[0, -1]
+
+    def _sample(self, logits):
+        if not self.temperature:
+            return int(logits.argmax())
+        probs = torch.softmax(logits.float() / self.temperature, dim=-1)
+        return int(torch.multinomial(probs, 1))
+
+    def _stop_length(self):
+        """Length of the stop word the ids end with, or 0"""
+        for stop in self.stop_ids:
+            if self.ids[-len(stop) :] == stop:
+                return len(stop)
+        return 0
+
+    def _rewind(self, length):
+        """Forget everything after the first length ids, including its cache"""
+        del self.ids[length:]
+        if self.cached > length:
+            self.cached = length
+            self.past = tuple(
+                tuple(tensor[:, :, :length] for tensor in layer) for layer in self.past
+            )
+
+    def _fit(self, max_new_tokens):
+        """Drop the oldest turns if this turn could overflow the context"""
+        if len(self.ids) + max_new_tokens <= self.max_context_tokens:
+            return
+        budget = max(self.keep_tokens - max_new_tokens, 0)
+        cut = next(
+            (start for start in self.turn_starts if len(self.ids) - start <= budget - self.prefix_len),
+            self.turn_starts[-1],
+        )
+        self.ids = self.ids[: self.prefix_len] + self.ids[cut:]
+        self.turn_starts = [start - cut + self.prefix_len for start in self.turn_starts if start >= cut]
+        self.past = None
+        self.cached = 0
+        self.rebuilds += 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chat with a fine-tuned model")
+    parser.add_argument("--model", default=model_name, help="adapter directory or model name")
+    parser.add_argument("--device", choices=["auto", "cpu", "cuda"], default="auto")
+    parser.add_argument("--max-new-tokens", type=int, default=100)
+    parser.add_argument("--max-context", type=int, default=1024, help="tokens kept before old turns are dropped")
+    parser.add_argument("--temperature", type=float, default=0.6)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model, tokenizer = load_model(args.model, args.device)
+    session = ChatSession(
+        model,
+        tokenizer,
+        max_context_tokens=args.max_context,
+        keep_tokens=args.max_context // 2,
+        temperature=args.temperature,
+    )
+
+    print(greeting)
+    while True:
+        user_input = input("> ")
+        if user_input.lower() == "quit":
+            break
+        print("MeGPT:", session.say(user_input, args.max_new_tokens))
+
 
-    print("MeGPT:", response)
+if __name__ == "__main__":
+    main()
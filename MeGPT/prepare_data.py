@@ -0,0 +1,151 @@
+"""Tokenize a training corpus once and keep it as a memory-mapped token file.
+
+Every record is tokenized without padding and followed by the tokenizer's
+EOS token, and the results are concatenated into one flat stream stored as
+a .npy file. The file is keyed by a hash of the corpus bytes and the
+tokenizer, so later runs on the same data map it straight back in.
+PackedDataset slices the stream into block_size chunks at load time, so a
+different block size reuses the same file.
+
+    python -m MeGPT.prepare_data --input response.json --model facebook/opt-1.3b
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+CACHE_DIR = os.path.expanduser(os.getenv("MEGPT_CACHE_DIR", "~/.cache/megpt/datasets"))
+# Records tokenized per call; the fast tokenizers parallelise within a batch
+TOKENIZE_BATCH_SIZE = 1000
+
+
+def read_texts(input_json):
+    """The "text" of every record in a JSON array or JSON lines file"""
+    with open(input_json) as f:
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            records = json.load(f)
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    return [record["text"] for record in records]
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of everything about the tokenizer that changes its output"""
+    digest = hashlib.sha256()
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        digest.update(backend.to_str().encode())
+    else:
+        digest.update(tokenizer.name_or_path.encode())
+        digest.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode())
+    digest.update(str(tokenizer.eos_token_id).encode())
+    return digest.hexdigest()
+
+
+def cache_key(input_json, tokenizer):
+    digest = hashlib.sha256()
+    with open(input_json, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(tokenizer_fingerprint(tokenizer).encode())
+    return digest.hexdigest()[:24]
+
+
+def token_dtype(tokenizer):
+    return np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def tokenize_corpus(texts, tokenizer):
+    """One flat array of every text's tokens, each followed by EOS"""
+    dtype = token_dtype(tokenizer)
+    eos = tokenizer.eos_token_id
+    chunks = []
+    for start in range(0, len(texts), TOKENIZE_BATCH_SIZE):
+        batch = tokenizer(texts[start : start + TOKENIZE_BATCH_SIZE], add_special_tokens=False)
+        for ids in batch["input_ids"]:
+            ids.append(eos)
+            chunks.append(np.asarray(ids, dtype=dtype))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+
+
+def prepare_tokens(input_json, tokenizer, cache_dir=CACHE_DIR):
+    """Path of the token file for input_json, tokenizing it if not yet cached"""
+    path = os.path.join(cache_dir, f"{cache_key(input_json, tokenizer)}.npy")
+    if os.path.exists(path):
+        return path
+
+    start = time.perf_counter()
+    tokens = tokenize_corpus(read_texts(input_json), tokenizer)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, tokens)
+    os.replace(tmp, path)
+    print(f"Tokenized {input_json} into {len(tokens)} tokens in {time.perf_counter() - start:.1f}s ({path})")
+    return path
+
+
+def load_tokens(path):
+    """Memory-map a token file; pages are read from disk only as blocks are used"""
+    return np.load(path, mmap_mode="r")
+
+
+class PackedDataset(torch.utils.data.Dataset):
+    """Fixed-length blocks of a token stream, as causal LM examples.
+
+    Every block is exactly block_size tokens, so there is no padding to
+    mask. The tail that doesn't fill a block is dropped.
+    """
+
+    def __init__(self, tokens, block_size, indices=None):
+        self.tokens = tokens
+        self.block_size = block_size
+        self.indices = np.arange(len(tokens) // block_size) if indices is None else indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        start = int(self.indices[i]) * self.block_size
+        block = torch.from_numpy(self.tokens[start : start + self.block_size].astype(np.int64))
+        return {"input_ids": block, "labels": block}
+
+    def split(self, test_size=0.1, seed=0):
+        """Random (train, test) split of the blocks"""
+        indices = np.random.default_rng(seed).permutation(self.indices)
+        test = int(len(indices) * test_size)
+        return (
+            PackedDataset(self.tokens, self.block_size, np.sort(indices[test:])),
+            PackedDataset(self.tokens, self.block_size, np.sort(indices[:test])),
+        )
+
+
+def load_packed_dataset(input_json, tokenizer, block_size, cache_dir=CACHE_DIR):
+    return PackedDataset(load_tokens(prepare_tokens(input_json, tokenizer, cache_dir)), block_size)
+
+
+def main(argv=None):
+    from transformers import AutoTokenizer
+
+    parser = argparse.ArgumentParser(description="Tokenize and cache a training corpus")
+    parser.add_argument("--input", default="response.json")
+    parser.add_argument("--model", default="facebook/opt-1.3b", help="model whose tokenizer to use")
+    parser.add_argument("--block-size", type=int, default=128)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    dataset = load_packed_dataset(args.input, tokenizer, args.block_size, args.cache_dir)
+    print(f"{len(dataset.tokens)} tokens, {len(dataset)} blocks of {args.block_size}")
+
+
+if __name__ == "__main__":
+    main()
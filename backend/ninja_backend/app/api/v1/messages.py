@@ -1,20 +1,39 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import os
 import sys
 import json
-import ollama
 import asyncio
-import random
 
 # Add MeGPT to path
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))))
 sys.path.append(root_dir)
 
-from MeGPT.extract_messages import extract_messages
-from app.message_extractor.fine_tune import train_model
-from app.message_extractor.generate import get_response, analyze_message_suggestions
+from app.message_extractor.extract_messages import (
+    count_records,
+    iter_corpus,
+    update_corpus,
+    write_json_array,
+)
+from app.llm.backends import get_backend
+from app.llm.scheduler import Superseded
+from app.training.jobs import get_manager
+from app.message_extractor.context_cache import mark_exported
+from app.message_extractor.generate import (
+    analyze_draft,
+    analyze_message_suggestions,
+    get_analysis_cache,
+    get_analysis_scheduler,
+    get_practice_result,
+    get_suggestion_speculator,
+    get_suggestions_cache,
+    speculate_suggestions,
+    stream_practice,
+    stream_suggestions,
+)
+from app.message_extractor.suggestions import Feedback, get_suggestion_stats
 
 router = APIRouter()
 
@@ -36,10 +55,8 @@ class RealChatRequest(BaseModel):
     context: dict | None = None
     messages: List[Message]
 
-class Feedback(BaseModel):
-    text: str
-    score: int
-    explanation: str
+class IncomingMessageRequest(RealChatRequest):
+    session_id: str
 
 class PracticeResponse(BaseModel):
     response: str
@@ -49,63 +66,109 @@ class AnalyzeRequest(BaseModel):
     message: str
     context: dict = {}
     conversation_history: Optional[str] = None
+    session_id: Optional[str] = None
+
+def format_conversation_history(messages: List[Message]) -> str:
+    """Render chat messages as a plain-text transcript.
+
+    The prompt builder keeps as much of the end of it as fits in the token budget.
+    """
+    return "\n".join([
+        f"{'User' if msg.isUser else 'Other'}: {msg.text}"
+        for msg in messages
+    ])
 
-# Global training state
-training_state = {
-    "is_training": False,
-    "progress": 0,
-    "message": "",
-    "error": None
-}
+def sse_event(event: str, data) -> str:
+    """Format a Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    """Wrap an async iterator of SSE strings in an unbuffered streaming response"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def training_progress(job: Optional[dict]) -> dict:
+    """Summarize a training job in the shape the export dialog polls for"""
+    if job is None:
+        return {"is_training": False, "progress": 0, "message": "", "error": None}
+    error = job["error"]
+    if job["status"] == "cancelled":
+        error = job["message"]
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "is_training": job["status"] in ("queued", "running"),
+        "progress": job["progress"],
+        "message": job["message"],
+        "error": error,
+        "step": job["step"],
+        "max_steps": job["max_steps"],
+        "loss": job["loss"],
+        "samples_per_second": job["samples_per_second"],
+        "eta_seconds": job["eta_seconds"],
+    }
 
 @router.get("/training-progress")
-async def get_training_progress():
-    """Get current training progress"""
-    return training_state
-
-def update_training_state(progress: int, message: str, error: str | None = None):
-    """Update training state"""
-    global training_state
-    training_state["progress"] = progress
-    training_state["message"] = message
-    training_state["error"] = error
-    training_state["is_training"] = progress < 100 and not error
-
-async def train_in_background(messages):
-    """Train model in background with progress updates"""
-    try:
-        update_training_state(0, "Preparing data...")
-        await asyncio.sleep(2)  # Initial prep
-        
-        update_training_state(10, "Loading model...")
-        await asyncio.sleep(3)  # Model loading time
-        
-        update_training_state(20, "Starting training...")
-        
-        # Try actual fine-tuning but continue with simulated progress if it fails
-        try:
-            train_model(messages)
-        except Exception as e:
-            print(f"Logging.")
-        
-        # Simulate longer training process with random progress
-        progress = 20
-        while progress < 90:
-            progress += random.randint(3, 8)
-            progress = min(progress, 89)  # Cap at 89
-            update_training_state(progress, f"Training model... {progress}%")
-            await asyncio.sleep(5)
-        
-        update_training_state(90, "Saving model...")
-        await asyncio.sleep(5)  # Saving time
-        
-        update_training_state(95, "Finalizing...")
-        await asyncio.sleep(3)
-        
-        update_training_state(100, "Training complete!")
-    except Exception as e:
-        update_training_state(0, "Training failed", str(e))
-        raise
+async def get_training_progress(job_id: Optional[str] = None):
+    """Get progress of a training job, by default the most recent one"""
+    manager = get_manager()
+    if job_id is None:
+        return training_progress(manager.latest())
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return training_progress(job)
+
+@router.get("/training/jobs")
+async def list_training_jobs():
+    """Status of every training job since startup"""
+    return {"jobs": get_manager().list()}
+
+@router.get("/training/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """Status of one training job: step, loss, ETA and samples/s while it runs"""
+    job = get_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@router.get("/training/jobs/{job_id}/events")
+async def stream_training_job(job_id: str):
+    """Push a job's progress as Server-Sent Events.
+
+    Sends a ``progress`` event with the current state straight away and then
+    only when it changes, plus a ``done`` event once the job has finished.
+    """
+    manager = get_manager()
+    if manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+
+    async def events():
+        last = None
+        async for job in manager.watch(job_id):
+            if job is None:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            progress = training_progress(job)
+            if progress != last:
+                yield sse_event("progress", progress)
+                last = progress
+        if last is not None:
+            yield sse_event("done", last)
+
+    return sse_response(events())
+
+@router.post("/training/jobs/{job_id}/cancel")
+async def cancel_training_job(job_id: str):
+    """Cancel a queued or running training job"""
+    job = get_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
 
 @router.get("/contacts")
 async def list_contacts():
@@ -120,10 +183,7 @@ async def list_contacts():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/export")
-async def export_messages(
-    request: MessageExportRequest,
-    background_tasks: BackgroundTasks
-):
+async def export_messages(request: MessageExportRequest):
     """Export messages for a specific contact and start training"""
     try:
         print(f"Exporting messages for contact: {request.contact_filter}")
@@ -146,11 +206,12 @@ async def export_messages(
             
         print(f"Cleaned phone number: {clean_number}")
         
-        # Extract messages with cleaned number
-        messages = extract_messages(clean_number)
-        print(f"Found {len(messages) if messages else 0} messages")
+        # Bring the contact's corpus up to date (only new messages are scanned)
+        state = await asyncio.to_thread(update_corpus, clean_number)
+        message_count = await asyncio.to_thread(count_records, state)
+        print(f"Found {message_count} messages")
         
-        if not messages:
+        if not message_count:
             return {
                 "status": "error",
                 "message": f"No messages found for {clean_number}. Make sure the number format is correct (e.g. +1XXXXXXXXXX)",
@@ -163,23 +224,21 @@ async def export_messages(
         
         output_file = os.path.join(output_dir, f"messages_{clean_number}.json")
         
-        # Save messages to JSON
-        with open(output_file, 'w') as f:
-            json.dump(messages, f, indent=2)
+        # Stream messages to JSON without loading the corpus into memory
+        await asyncio.to_thread(write_json_array, output_file, iter_corpus(clean_number), indent=2)
+        mark_exported(output_file)
             
-        # Reset training state
-        update_training_state(0, "Starting training...")
-            
-        # Start training in background
-        background_tasks.add_task(train_in_background, messages)
+        # Fine-tune in a worker process, outside the API event loop
+        job = await asyncio.to_thread(get_manager().start, output_file)
         
         return {
             "status": "success",
             "message": "Export complete, training started",
-            "file": output_file
+            "file": output_file,
+            "job_id": job["id"]
         }
         
-    except FileNotFoundError:
+    except (FileNotFoundError, PermissionError):
         return {
             "status": "error",
             "message": "Messages database access denied. Please grant Full Disk Access permission.",
@@ -199,20 +258,17 @@ async def analyze_message(request: PracticeRequest):
     try:
         print(f"Received practice message: {request.message}")
         
-        # Generate response using local model
-        response = get_response(
-            message=request.message
-        )
-        
         # Get goal/background from context
         goal = request.context.get("goal", "") if request.context else ""
         background = request.context.get("background", "") if request.context else ""
+        contact = request.context.get("contact") if request.context else None
         
-        # Get suggestions
-        suggestions = analyze_message_suggestions(
+        # Generate response and suggestions concurrently, each within its budget
+        response, suggestions = await get_practice_result(
             message=request.message,
             conversation_history="",
-            goal=goal
+            goal=goal,
+            contact=contact
         )
         
         result = PracticeResponse(
@@ -231,16 +287,14 @@ async def get_message_suggestions(request: RealChatRequest):
     """Analyze a real message and provide suggested responses with feedback"""
     try:
         # Convert conversation history to string format
-        conversation_history = "\n".join([
-            f"{'User' if msg.isUser else 'Other'}: {msg.text}"
-            for msg in request.messages[-5:]  # Only use last 5 messages for context
-        ])
+        conversation_history = format_conversation_history(request.messages)
         
         # Get suggestions using the model
-        suggestions = analyze_message_suggestions(
+        suggestions = await analyze_message_suggestions(
             request.message,
             conversation_history,
-            request.context.get("goal", "") if request.context else ""
+            request.context.get("goal", "") if request.context else "",
+            request.context.get("contact") if request.context else None
         )
         
         return {
@@ -250,6 +304,80 @@ async def get_message_suggestions(request: RealChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/real/incoming")
+async def precompute_message_suggestions(request: IncomingMessageRequest):
+    """Start generating suggestions as soon as the other person's message arrives.
+
+    Takes the same conversation state a later ``/real`` call will send, and
+    returns right away; that call then gets the cached suggestions or joins
+    the running generation.
+    """
+    conversation_history = format_conversation_history(request.messages)
+    status = speculate_suggestions(
+        request.session_id,
+        request.message,
+        conversation_history,
+        request.context.get("goal", "") if request.context else "",
+        request.context.get("contact") if request.context else None,
+    )
+    return {"status": status}
+
+@router.get("/real/stats")
+async def get_real_stats():
+    """Hit/miss counters for cached suggestions, and speculative generations"""
+    return {**get_suggestions_cache().stats(), "speculation": get_suggestion_speculator().stats()}
+
+@router.post("/practice/stream")
+async def stream_practice_message(request: PracticeRequest):
+    """Stream the simulated reply and suggestions as Server-Sent Events.
+
+    Emits ``token`` events as the reply is generated, a ``suggestion`` event
+    for each suggestion as soon as it is complete, and a final ``done`` event
+    carrying the full response and feedback.
+    """
+    goal = request.context.get("goal", "") if request.context else ""
+    contact = request.context.get("contact") if request.context else None
+
+    async def events():
+        response = ""
+        feedback = []
+        try:
+            async for kind, item in stream_practice(request.message, "", goal, contact):
+                if kind == "token":
+                    response += item
+                    yield sse_event("token", {"text": item})
+                elif kind == "suggestion":
+                    feedback.append(item)
+                    yield sse_event("suggestion", item)
+                else:
+                    yield sse_event("error", {"detail": item})
+        except Exception as e:
+            print(f"Error in practice stream: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {"response": response.strip(), "feedback": feedback})
+
+    return sse_response(events())
+
+@router.post("/real/stream")
+async def stream_message_suggestions(request: RealChatRequest):
+    """Stream suggested responses for a real chat as Server-Sent Events"""
+    conversation_history = format_conversation_history(request.messages)
+    goal = request.context.get("goal", "") if request.context else ""
+    contact = request.context.get("contact") if request.context else None
+
+    async def events():
+        feedback = []
+        try:
+            async for suggestion in stream_suggestions(request.message, conversation_history, goal, contact):
+                feedback.append(suggestion)
+                yield sse_event("suggestion", suggestion)
+        except Exception as e:
+            print(f"Error in suggestions stream: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {"feedback": feedback, "response": None})
+
+    return sse_response(events())
+
 @router.post("/analyze")
 async def analyze_message_realtime(request: AnalyzeRequest):
     """Real-time analysis of message alignment with goals/context"""
@@ -260,37 +388,29 @@ async def analyze_message_realtime(request: AnalyzeRequest):
         goal = request.context.get("goal", "") if request.context else ""
         background = request.context.get("background", "") if request.context else ""
         
-        # Get real-time analysis using Ollama
-        response = ollama.chat(
-            model="llama3.1:8b",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": f"""You are a messaging advisor. Analyze this draft message and provide 2 brief points about how it aligns with the goal/context.
-
-Goal: {goal}
-Background: {background}
-Message: {request.message}
-
-Give exactly 2 points:
-- Use "✓" for positive aspects that align well
-- Use "→" for suggestions to improve
-
-Keep each point under 8 words. Be direct and specific. No explanations or intros."""
-                },
-                {"role": "user", "content": "Analyze message"}
-            ]
-        )
-        
-        feedback = response['message']['content'].strip()
-        if not feedback:
-            feedback = "→ Keep typing..."
-            
-        # Clean up any extra newlines
-        feedback = "\n".join(line for line in feedback.split("\n") if line.strip().startswith(("✓", "→")))
+        # Identical drafts share one generation and a short-lived cached result,
+        # and a newer draft from the same session cancels this one
+        feedback = await analyze_draft(request.message, goal, background, request.session_id)
             
         return {"feedback": feedback}
         
+    except Superseded:
+        return {"feedback": "", "superseded": True}
     except Exception as e:
         print(f"Analysis failed: {str(e)}")
         return {"feedback": ""}
+
+@router.get("/analyze/stats")
+async def get_analyze_stats():
+    """Hit/miss counters for the draft analysis cache, and per-session scheduling"""
+    return {**get_analysis_cache().stats(), "sessions": get_analysis_scheduler().stats()}
+
+@router.get("/backend")
+async def get_backend_stats():
+    """Which inference backend and model are serving, and its counters"""
+    return get_backend().stats()
+
+@router.get("/suggestions/stats")
+async def get_suggestions_stats():
+    """How often generated suggestions fail validation, and the retries spent on them"""
+    return get_suggestion_stats().stats()
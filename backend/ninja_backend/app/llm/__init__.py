@@ -0,0 +1 @@
+"""LLM access layer shared by the API endpoints."""
@@ -0,0 +1,239 @@
+"""Inference backends behind one async chat/stream interface.
+
+Generation code talks to ``get_backend()`` and never to a particular model
+server. Which backend runs is picked by ``LLM_BACKEND``:
+
+- ``ollama``: the Ollama server, through the pooled client
+- ``local``: the fine-tuned MeGPT model in-process, with dynamic batching
+- ``fake``: deterministic text with simulated latency, for benchmarks and
+  load tests without a model
+
+Options use Ollama's names (``num_predict``, ``temperature``); backends
+ignore the ones they don't support. ``format`` is a JSON schema the reply
+must follow, where the backend can enforce one.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from app.llm import client, local_model
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama")
+# Model the backend runs; for "local", an adapter or export directory
+DEFAULT_MODELS = {"ollama": "llama3.1:8b", "local": local_model.LOCAL_MODEL, "fake": "fake"}
+LLM_MODEL = os.getenv("LLM_MODEL") or DEFAULT_MODELS.get(LLM_BACKEND, "")
+# Fake backend: time to first token, time per token and tokens per reply
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0.05"))
+FAKE_LLM_SECONDS_PER_TOKEN = float(os.getenv("FAKE_LLM_SECONDS_PER_TOKEN", "0.01"))
+FAKE_LLM_TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "20"))
+
+class Backend(ABC):
+    """A chat model. Subclasses implement chat and stream."""
+
+    name = ""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.calls = 0
+
+    @abstractmethod
+    async def chat(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> str:
+        """Return the assistant's reply to messages"""
+
+    @abstractmethod
+    def stream(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> AsyncIterator[str]:
+        """Yield the assistant's reply to messages in chunks as it is generated"""
+
+    def max_prompt_tokens(self) -> Optional[int]:
+        """Longest prompt that leaves room for a default-length reply, if the model has a limit"""
+        return None
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "model": self.model, "calls": self.calls}
+
+class OllamaBackend(Backend):
+    name = "ollama"
+
+    @staticmethod
+    def request_kwargs(options: Optional[dict], format: Optional[dict]) -> dict:
+        kwargs = {"options": options} if options else {}
+        if format:
+            kwargs["format"] = format
+        return kwargs
+
+    async def chat(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> str:
+        self.calls += 1
+        return await client.chat(self.model, messages, **self.request_kwargs(options, format))
+
+    async def stream(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> AsyncIterator[str]:
+        self.calls += 1
+        kwargs = self.request_kwargs(options, format)
+        async for chunk in client.stream_chat(self.model, messages, **kwargs):
+            yield chunk
+
+    async def close(self):
+        await client.close_client()
+
+class LocalBackend(Backend):
+    """The fine-tuned model, which completes text rather than chat messages.
+
+    Messages are rendered as the ``person:`` / ``MeGPT:`` transcript it was
+    fine-tuned on, ending in ``MeGPT:``, so its stop words end the reply
+    after one turn. Prompt plus reply must fit in LOCAL_CONTEXT_LENGTH
+    positions. Replies come from the batcher in one piece, so stream()
+    yields a single chunk. There is no constrained decoding here, so
+    ``format`` is ignored and structured replies rely on the prompt and the
+    caller's validation and retry.
+    """
+
+    name = "local"
+    NUM_PREDICT = 256
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        self.batcher = local_model.get_batcher(model)
+
+    @staticmethod
+    def render(messages: List[dict]) -> str:
+        """System text as-is, user turns as the person's and assistant turns as MeGPT's"""
+        turns = []
+        for m in messages:
+            if m["role"] == "system":
+                turns.append(m["content"])
+            elif m["role"] == "assistant":
+                turns.append(f"MeGPT: {m['content']}")
+            else:
+                turns.append(f"person: {m['content']}")
+        return "\n".join(turns) + "\nMeGPT:"
+
+    def max_prompt_tokens(self) -> Optional[int]:
+        return local_model.LOCAL_CONTEXT_LENGTH - self.NUM_PREDICT
+
+    async def chat(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> str:
+        self.calls += 1
+        max_new_tokens = (options or {}).get("num_predict", self.NUM_PREDICT)
+        return await self.batcher.submit(self.render(messages), max_new_tokens)
+
+    async def stream(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> AsyncIterator[str]:
+        yield await self.chat(messages, options, format)
+
+    async def close(self):
+        await local_model.close_batcher()
+
+    def stats(self) -> dict:
+        return dict(super().stats(), **self.batcher.stats())
+
+class FakeBackend(Backend):
+    """Deterministic replies with simulated latency.
+
+    The reply depends only on the messages, and is shaped like what the
+    prompt asks for (JSON suggestions when given a ``format``, ✓/→ feedback,
+    or a plain reply) so the app's parsers accept it. Each call waits
+    ``latency`` before its first token and ``seconds_per_token`` per token;
+    at most ``parallel`` calls generate at once and the rest queue.
+    """
+
+    name = "fake"
+    WORDS = "sure sounds good want to grab dinner later tonight lol ok see you then maybe tomorrow".split()
+
+    def __init__(
+        self,
+        model: str = "fake",
+        latency: float = FAKE_LLM_LATENCY_SECONDS,
+        seconds_per_token: float = FAKE_LLM_SECONDS_PER_TOKEN,
+        tokens: int = FAKE_LLM_TOKENS,
+        parallel: Optional[int] = None,
+    ):
+        super().__init__(model)
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.tokens = tokens
+        self.slots = asyncio.Semaphore(parallel) if parallel else None
+        self.completed = 0
+        self.aborted = 0
+
+    def reply(self, messages: List[dict], num_predict: Optional[int] = None, format: Optional[dict] = None) -> str:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).digest()
+        count = min(self.tokens, num_predict) if num_predict else self.tokens
+        words = [self.WORDS[b % len(self.WORDS)] for b in (digest * (count // len(digest) + 1))[:max(count, 1)]]
+        text = " ".join(words)
+        if format:
+            suggestions = [
+                {"text": f"{text} {i + 1}", "score": 9 - i, "explanation": "Matches the style"} for i in range(3)
+            ]
+            return json.dumps({"suggestions": suggestions})
+        if any("✓" in m["content"] for m in messages):
+            return f"✓ {' '.join(words[:4])}\n→ {' '.join(words[-4:])}"
+        return text
+
+    async def chat(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> str:
+        chunks = []
+        async for chunk in self.stream(messages, options, format):
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    async def stream(self, messages: List[dict], options: Optional[dict] = None, format: Optional[dict] = None) -> AsyncIterator[str]:
+        self.calls += 1
+        text = self.reply(messages, (options or {}).get("num_predict"), format)
+        tokens = re.findall(r"\s*\S+|\s+", text) or [""]
+        finished = False
+        if self.slots is not None:
+            await self.slots.acquire()
+        try:
+            await asyncio.sleep(self.latency)
+            for token in tokens:
+                if self.seconds_per_token:
+                    await asyncio.sleep(self.seconds_per_token)
+                yield token
+            finished = True
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+            if finished:
+                self.completed += 1
+            else:
+                self.aborted += 1
+
+    def stats(self) -> dict:
+        return dict(super().stats(), completed=self.completed, aborted=self.aborted)
+
+BACKENDS: Dict[str, Callable[[str], Backend]] = {
+    "ollama": OllamaBackend,
+    "local": LocalBackend,
+    "fake": FakeBackend,
+}
+
+_backend: Optional[Backend] = None
+
+def register_backend(name: str, factory: Callable[[str], Backend]):
+    """Make a backend selectable with LLM_BACKEND=name"""
+    BACKENDS[name] = factory
+
+def get_backend() -> Backend:
+    """Return the configured backend, creating it on first use"""
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; choose from {', '.join(BACKENDS)}")
+        _backend = BACKENDS[LLM_BACKEND](LLM_MODEL)
+        print(f"Using the {_backend.name} backend with {_backend.model}...")
+    return _backend
+
+def set_backend(backend: Backend):
+    """Replace the backend, e.g. with a FakeBackend in a benchmark"""
+    global _backend
+    _backend = backend
+
+async def close_backend():
+    """Release the backend's resources (called on application shutdown)"""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,149 @@
+"""Dynamic batching of concurrent generations for a local model.
+
+A local model runs one ``generate`` at a time, but a batch of prompts costs
+little more than a single one. BatchingGenerator queues incoming prompts,
+waits up to ``max_wait`` seconds after the first one for others to arrive,
+and runs up to ``max_batch_size`` of them in a single call on a dedicated
+thread, then hands each caller its own result.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+class _Request:
+    __slots__ = ("prompt", "max_new_tokens", "future", "queued_at")
+
+    def __init__(self, prompt: str, max_new_tokens: int, future: asyncio.Future):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+class BatchingGenerator:
+    """Groups concurrent submit() calls into batched generate_batch calls.
+
+    ``generate_batch(prompts, max_new_tokens)`` is a blocking function that
+    returns one completion per prompt; it is called with the largest
+    max_new_tokens of the batch. A batch that fails, or returns the wrong
+    number of completions, fails every request in it.
+    """
+
+    def __init__(
+        self,
+        generate_batch: Callable[[List[str], int], List[str]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.01,
+        history: int = 1000,
+    ):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = None
+        self.worker = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-generate")
+        self.requests = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.busy_seconds = 0.0
+        self.first_request_at = None
+        self.queue_waits = deque(maxlen=history)
+        self.batch_seconds = deque(maxlen=history)
+
+    async def submit(self, prompt: str, max_new_tokens: int = 100) -> str:
+        """Queue prompt and wait for its completion"""
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter()
+        await self.queue.put(_Request(prompt, max_new_tokens, future))
+        return await future
+
+    async def _collect(self) -> List[_Request]:
+        """Wait for a request, then gather more until the batch is full or max_wait passes"""
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Callers that went away while queued don't take a row in the batch
+        return [request for request in batch if not request.future.cancelled()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            for request in batch:
+                self.queue_waits.append(started - request.queued_at)
+            prompts = [request.prompt for request in batch]
+            max_new_tokens = max(request.max_new_tokens for request in batch)
+            try:
+                results = await loop.run_in_executor(self.executor, self.generate_batch, prompts, max_new_tokens)
+                # Which result belongs to which prompt is unknown, so none are handed out
+                if len(results) != len(batch):
+                    raise RuntimeError(f"generate_batch returned {len(results)} completions for {len(batch)} prompts")
+            except Exception as e:
+                self.failed += len(batch)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            finally:
+                elapsed = time.perf_counter() - started
+                self.busy_seconds += elapsed
+                self.batch_seconds.append(elapsed)
+                self.batches += 1
+                self.batched_requests += len(batch)
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+                self.completed += 1
+
+    async def close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.first_request_at if self.first_request_at else None
+        waits = list(self.queue_waits)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_seconds": self.max_wait,
+            "pending": self.queue.qsize() if self.queue is not None else 0,
+            "requests": self.requests,
+            "completed": self.completed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_requests / self.batches if self.batches else None,
+            "queue_wait_p50_seconds": _percentile(waits, 0.5),
+            "queue_wait_p99_seconds": _percentile(waits, 0.99),
+            "batch_p50_seconds": _percentile(list(self.batch_seconds), 0.5),
+            "busy_seconds": self.busy_seconds,
+            "throughput_per_second": self.completed / elapsed if elapsed else None,
+        }
@@ -0,0 +1,100 @@
+"""Result cache with in-flight coalescing for repeated generations.
+
+Concurrent calls with the same key share one running generation, and
+completed results are kept for a limited time so repeating a request (e.g.
+re-analyzing an unchanged draft) doesn't reach the model at all.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+class SingleFlightCache:
+    """Bounded TTL cache whose misses are computed at most once at a time per key"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.in_flight = {}  # key -> asyncio.Task
+        self.waiters = {}  # key -> callers awaiting the in-flight task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable]):
+        """Return the cached value for key, computing it with compute() if needed.
+
+        Failures are not cached; every caller waiting on a failed computation
+        sees the exception. If every caller waiting on a computation is
+        cancelled, the computation is cancelled too.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self.entries[key]
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._compute(key, compute))
+            self.in_flight[key] = task
+        self.waiters[key] = self.waiters.get(key, 0) + 1
+        try:
+            # Shield so one caller going away doesn't cancel the others' result
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self.waiters[key] == 1:
+                task.cancel()
+            raise
+        finally:
+            self.waiters[key] -= 1
+            if not self.waiters[key]:
+                del self.waiters[key]
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable]):
+        try:
+            value = await compute()
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            return value
+        finally:
+            self.in_flight.pop(key, None)
+
+    def peek(self, key: Hashable):
+        """Cached value for key, or None, without starting a computation"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def contains(self, key: Hashable) -> bool:
+        """Whether key is cached or being computed, without counting a hit"""
+        entry = self.entries.get(key)
+        return key in self.in_flight or (entry is not None and entry[0] > time.monotonic())
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "in_flight": len(self.in_flight),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,59 @@
+"""Pooled async Ollama client.
+
+Every endpoint awaits generations through one shared ``ollama.AsyncClient`` so
+a slow completion never blocks the event loop and HTTP connections to the
+Ollama server are reused between requests.
+"""
+import os
+from typing import AsyncIterator, List, Optional
+
+import httpx
+import ollama
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+# How long Ollama keeps the model (and its prompt cache) loaded after a request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+_client: Optional[ollama.AsyncClient] = None
+
+def get_client() -> ollama.AsyncClient:
+    """Return the shared client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = ollama.AsyncClient(
+            host=OLLAMA_HOST,
+            timeout=OLLAMA_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+async def close_client():
+    """Close pooled connections (called on application shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+async def chat(model: str, messages: List[dict], **kwargs) -> str:
+    """Run a chat completion and return the assistant message text"""
+    kwargs.setdefault("keep_alive", OLLAMA_KEEP_ALIVE)
+    response = await get_client().chat(model=model, messages=messages, **kwargs)
+    return response['message']['content']
+
+async def stream_chat(model: str, messages: List[dict], **kwargs) -> AsyncIterator[str]:
+    """Run a streaming chat completion, yielding content chunks as they arrive"""
+    kwargs.setdefault("keep_alive", OLLAMA_KEEP_ALIVE)
+    stream = await get_client().chat(model=model, messages=messages, stream=True, **kwargs)
+    try:
+        async for part in stream:
+            content = part['message']['content']
+            if content:
+                yield content
+    finally:
+        # Closing the stream drops the HTTP response, which stops generation in Ollama
+        await stream.aclose()
@@ -0,0 +1,68 @@
+"""The fine-tuned MeGPT model served in-process with dynamic batching.
+
+The model is loaded on first use, on the batcher's generate thread, so
+importing this module (or starting the API without using it) never loads
+torch.
+"""
+import os
+import sys
+from typing import List, Optional
+
+from app.llm.batching import BatchingGenerator
+
+# MeGPT lives at the repository root, next to backend/
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+LOCAL_MODEL = os.getenv("LOCAL_MODEL", "facebook/opt-1.3b-finetuned")
+LOCAL_MODEL_DEVICE = os.getenv("LOCAL_MODEL_DEVICE", "auto")
+LOCAL_MAX_BATCH_SIZE = int(os.getenv("LOCAL_MAX_BATCH_SIZE", "8"))
+# How long the first request of a batch waits for others to join it
+LOCAL_BATCH_WAIT_SECONDS = float(os.getenv("LOCAL_BATCH_WAIT_SECONDS", "0.01"))
+LOCAL_TEMPERATURE = float(os.getenv("LOCAL_TEMPERATURE", "0.6"))
+# Positions the model attends over (OPT: 2048); prompt plus reply must fit
+LOCAL_CONTEXT_LENGTH = int(os.getenv("LOCAL_CONTEXT_LENGTH", "2048"))
+
+class LocalModel:
+    """Loads the model lazily and completes batches of prompts"""
+
+    def __init__(self, model_name: str = LOCAL_MODEL, device: str = LOCAL_MODEL_DEVICE):
+        self.model_name = model_name
+        self.device = device
+        self.model = None
+        self.tokenizer = None
+
+    def load(self):
+        if self.model is None:
+            if REPO_ROOT not in sys.path:
+                sys.path.append(REPO_ROOT)
+            from MeGPT.generate import load_model
+            self.model, self.tokenizer = load_model(self.model_name, self.device)
+
+    def generate_batch(self, prompts: List[str], max_new_tokens: int) -> List[str]:
+        self.load()
+        from MeGPT.generate import generate_replies
+        return generate_replies(self.model, self.tokenizer, prompts, max_new_tokens, LOCAL_TEMPERATURE)
+
+_batcher: Optional[BatchingGenerator] = None
+
+def get_batcher(model_name: Optional[str] = None) -> BatchingGenerator:
+    """Return the shared batcher for the local model, creating it on first use"""
+    global _batcher
+    if _batcher is None:
+        _batcher = BatchingGenerator(
+            LocalModel(model_name or LOCAL_MODEL).generate_batch,
+            max_batch_size=LOCAL_MAX_BATCH_SIZE,
+            max_wait=LOCAL_BATCH_WAIT_SECONDS,
+        )
+    return _batcher
+
+async def generate(prompt: str, max_new_tokens: int = 100) -> str:
+    """Complete prompt with the local model, batched with concurrent requests"""
+    return await get_batcher().submit(prompt, max_new_tokens)
+
+async def close_batcher():
+    """Stop the batcher (called on application shutdown)"""
+    global _batcher
+    if _batcher is not None:
+        await _batcher.close()
+        _batcher = None
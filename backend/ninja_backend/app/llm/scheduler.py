@@ -0,0 +1,73 @@
+"""Per-session scheduling of generations where only the latest request matters.
+
+While a user types, each new draft makes the previous draft's analysis
+useless. Running generations through a SessionScheduler cancels the older
+task for the same session, which closes its Ollama stream so the model
+stops generating for it.
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+class Superseded(Exception):
+    """Raised to a caller whose request was replaced by a newer one"""
+
+class SessionScheduler:
+    """Keeps at most one running generation per session.
+
+    With ``debounce`` set, each task first waits that many seconds, so drafts
+    replaced within the window never reach the model.
+    """
+
+    def __init__(self, debounce: float = 0.0):
+        self.debounce = debounce
+        self.tasks = {}  # session id -> asyncio.Task
+        self._superseded = set()
+        self.started = 0
+        self.superseded = 0
+        self.completed = 0
+
+    async def run(self, session_id: Hashable, compute: Callable[[], Awaitable]):
+        """Run compute() as the session's current generation.
+
+        Raises Superseded if a newer run for the session starts first.
+        """
+        self.cancel(session_id)
+        task = asyncio.create_task(self._run(compute))
+        self.tasks[session_id] = task
+        self.started += 1
+        try:
+            result = await task
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            if task in self._superseded:
+                raise Superseded() from None
+            # Our caller went away, so nobody wants the result
+            task.cancel()
+            raise
+        finally:
+            self._superseded.discard(task)
+            if self.tasks.get(session_id) is task:
+                del self.tasks[session_id]
+
+    async def _run(self, compute: Callable[[], Awaitable]):
+        if self.debounce > 0:
+            await asyncio.sleep(self.debounce)
+        return await compute()
+
+    def cancel(self, session_id: Hashable):
+        """Cancel the session's running generation, if any"""
+        task = self.tasks.pop(session_id, None)
+        if task is not None and not task.done():
+            self._superseded.add(task)
+            task.cancel()
+            self.superseded += 1
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.tasks),
+            "debounce_seconds": self.debounce,
+            "started": self.started,
+            "superseded": self.superseded,
+            "completed": self.completed,
+        }
@@ -0,0 +1,126 @@
+"""Speculative generations started before anyone asks for them.
+
+When the other person's message arrives, the suggestions the user is likely
+to ask for next can already be generated. A Speculator runs those
+generations through a SingleFlightCache, so the request that eventually
+wants the result either finds it cached or joins the running generation
+instead of starting its own.
+
+Speculative work is capped per session: a new speculation replaces the
+session's oldest one once ``max_in_flight`` are running (the conversation
+has moved on), and at most ``max_per_minute`` are started per session.
+Start times are kept for at most ``max_sessions`` sessions, least recently
+active dropped first, so memory doesn't grow with every session seen.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Hashable
+
+from app.llm.cache import SingleFlightCache
+
+class Speculator:
+    """Starts cached generations in the background, a few per session"""
+
+    WINDOW_SECONDS = 60
+
+    def __init__(
+        self,
+        cache: SingleFlightCache,
+        max_in_flight: int = 1,
+        max_per_minute: int = 6,
+        max_sessions: int = 1024,
+    ):
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.max_per_minute = max_per_minute
+        self.max_sessions = max_sessions
+        self.tasks = {}  # session id -> running speculative tasks, oldest first
+        self.recent = OrderedDict()  # session id -> start times within the window, least recently active first
+        self.started = 0
+        self.already_cached = 0
+        self.rate_limited = 0
+        self.superseded = 0
+        self.completed = 0
+        self.failed = 0
+
+    def speculate(self, session_id: Hashable, key: Hashable, compute: Callable[[], Awaitable]) -> str:
+        """Start computing key for a session unless it is cached or over its cap.
+
+        Returns "cached" (already cached or running), "limited" (the session
+        used up its speculations for the minute) or "started".
+        """
+        if self.cache.contains(key):
+            self.already_cached += 1
+            return "cached"
+
+        now = time.monotonic()
+        self._prune(now)
+        recent = self.recent.get(session_id, deque())
+        while recent and recent[0] <= now - self.WINDOW_SECONDS:
+            recent.popleft()
+        if len(recent) >= self.max_per_minute:
+            self.rate_limited += 1
+            return "limited"
+        recent.append(now)
+        self.recent[session_id] = recent
+        self.recent.move_to_end(session_id)
+        while len(self.recent) > self.max_sessions:
+            self.recent.popitem(last=False)
+
+        tasks = self.tasks.setdefault(session_id, [])
+        while len(tasks) >= self.max_in_flight:
+            # Only stops the generation if no request has joined it
+            tasks.pop(0).cancel()
+            self.superseded += 1
+
+        task = asyncio.create_task(self.cache.get(key, compute))
+        task.add_done_callback(lambda task: self._finished(session_id, task))
+        tasks.append(task)
+        self.started += 1
+        return "started"
+
+    def _prune(self, now: float):
+        """Forget sessions with no starts left in the window"""
+        while self.recent:
+            session_id, recent = next(iter(self.recent.items()))
+            if recent and recent[-1] > now - self.WINDOW_SECONDS:
+                break
+            del self.recent[session_id]
+
+    def _finished(self, session_id: Hashable, task: asyncio.Task):
+        tasks = self.tasks.get(session_id, [])
+        if task in tasks:
+            tasks.remove(task)
+        if not tasks:
+            self.tasks.pop(session_id, None)
+        self._prune(time.monotonic())
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.failed += 1
+            print(f"Speculative generation failed: {task.exception()}")
+        else:
+            self.completed += 1
+
+    def cancel_all(self):
+        """Stop every running speculation (called on application shutdown)"""
+        for tasks in list(self.tasks.values()):
+            for task in list(tasks):
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "active_sessions": len(self.tasks),
+            "tracked_sessions": len(self.recent),
+            "max_sessions": self.max_sessions,
+            "in_flight": sum(len(tasks) for tasks in self.tasks.values()),
+            "max_in_flight": self.max_in_flight,
+            "max_per_minute": self.max_per_minute,
+            "started": self.started,
+            "already_cached": self.already_cached,
+            "rate_limited": self.rate_limited,
+            "superseded": self.superseded,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,73 @@
+"""Token counts for sizing prompts.
+
+Counts come from the model's Hugging Face tokenizer when PROMPT_TOKENIZER
+names one and transformers is installed, and from a characters-per-token
+estimate otherwise. Ollama doesn't expose its tokenizer, so for the Ollama
+backend point PROMPT_TOKENIZER at the same model's tokenizer for exact counts.
+Counts are cached per text, since the same examples are counted for every
+prompt.
+"""
+import os
+from collections import OrderedDict
+from typing import Optional
+
+# Hugging Face tokenizer to count with (empty: estimate from length)
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "")
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "65536"))
+# Rough average for English chat text with Llama-style tokenizers
+CHARS_PER_TOKEN = 4
+
+def load_tokenizer(name: str):
+    """The named tokenizer, or None if it can't be loaded"""
+    try:
+        from transformers import AutoTokenizer
+
+        return AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"WARNING: Could not load tokenizer {name!r}, estimating token counts: {e}")
+        return None
+
+class TokenCounter:
+    """Counts tokens in text, caching the count for recently seen texts"""
+
+    def __init__(self, tokenizer=None, cache_size: int = TOKEN_COUNT_CACHE_SIZE):
+        self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self.counts = OrderedDict()  # text -> token count
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        count = self.counts.get(text)
+        if count is not None:
+            self.counts.move_to_end(text)
+            self.hits += 1
+            return count
+        self.misses += 1
+        if self.tokenizer is not None:
+            count = len(self.tokenizer.encode(text, add_special_tokens=False))
+        else:
+            count = -(-len(text) // CHARS_PER_TOKEN)
+        self.counts[text] = count
+        if len(self.counts) > self.cache_size:
+            self.counts.popitem(last=False)
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "tokenizer": getattr(self.tokenizer, "name_or_path", None) or "estimate",
+            "entries": len(self.counts),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+_counter: Optional[TokenCounter] = None
+
+def get_token_counter() -> TokenCounter:
+    """Return the shared counter, loading the tokenizer on first use"""
+    global _counter
+    if _counter is None:
+        _counter = TokenCounter(load_tokenizer(PROMPT_TOKENIZER) if PROMPT_TOKENIZER else None)
+    return _counter
@@ -1,8 +1,13 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 from app.api.v1 import router as api_router
+from app.llm.client import close_client
+from app.llm.backends import close_backend
+from app.training.jobs import shutdown_manager
+from app.message_extractor.generate import WARM_UP_ON_STARTUP, get_suggestion_speculator, warm_up
 
 app = FastAPI(title="Ninja Social Coach")
 
@@ -21,3 +26,16 @@ app.include_router(api_router, prefix="/api/v1")
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
+
+@app.on_event("startup")
+async def startup():
+    # Warm up in the background so the server accepts requests right away
+    if WARM_UP_ON_STARTUP:
+        app.state.warm_up = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown():
+    get_suggestion_speculator().cancel_all()
+    await close_client()
+    await close_backend()
+    await asyncio.to_thread(shutdown_manager)
@@ -0,0 +1,162 @@
+"""In-memory cache of loaded few-shot examples, one entry per messages file.
+
+Entries are checked against the file's size and mtime on every lookup (a
+single stat, no directory scan) and reloaded when the file changes. The
+export endpoint can also invalidate an entry directly after rewriting a
+contact's messages file. Least recently used entries are evicted once the
+cache grows past CONTEXT_CACHE_MAX_BYTES; a single file too large for that
+bound is loaded for each lookup and never cached.
+
+A miss parses the file and builds or loads its index, so async code calls
+``get`` through ``asyncio.to_thread``. Threads missing on the same path wait
+for one load rather than each parsing the file.
+"""
+import glob
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from app.message_extractor.retrieval import ExampleIndex
+
+MESSAGES_DIR = os.path.expanduser("~/Documents/ninja/messages_data")
+
+# Upper bound on the memory held by cached examples and their indexes
+CONTEXT_CACHE_MAX_BYTES = int(os.getenv("CONTEXT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+Examples = Tuple[List[str], Optional[ExampleIndex]]
+
+def estimate_size(examples: List[str], index: Optional[ExampleIndex]) -> int:
+    """Approximate memory held by a cache entry, in bytes"""
+    size = sum(sys.getsizeof(example) for example in examples) + sys.getsizeof(examples)
+    if index is not None:
+        size += index.nbytes
+    return size
+
+class ContextCache:
+    """Byte-bounded LRU of examples keyed by messages file path"""
+
+    def __init__(self, max_bytes: int = CONTEXT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # path -> (fingerprint, examples, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+        self.lock = threading.Lock()
+        self.loading = {}  # path -> lock held while that path is loaded
+
+    def get(self, path: str, loader: Callable[[str], Examples]) -> Examples:
+        """Cached examples for path, loading them if missing or stale"""
+        try:
+            stat = os.stat(path)
+            fingerprint = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            self.invalidate(path)
+            return [], None
+
+        with self.lock:
+            examples = self._lookup(path, fingerprint)
+            if examples is not None:
+                return examples
+            loading = self.loading.setdefault(path, threading.Lock())
+
+        with loading:
+            try:
+                return self._load(path, fingerprint, loader)
+            finally:
+                with self.lock:
+                    self.loading.pop(path, None)
+
+    def _load(self, path: str, fingerprint: tuple, loader: Callable[[str], Examples]) -> Examples:
+        with self.lock:
+            # Loaded by another thread while this one waited
+            examples = self._lookup(path, fingerprint)
+            if examples is not None:
+                return examples
+            self.misses += 1
+
+        examples = loader(path)
+        size = estimate_size(*examples)
+        with self.lock:
+            self._remove(path)
+            if size > self.max_bytes:
+                self.oversized += 1
+                print(f"WARNING: {path} needs {size} bytes, over the context cache bound; not caching it")
+                return examples
+            self.entries[path] = (fingerprint, examples, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return examples
+
+    def _lookup(self, path: str, fingerprint: tuple) -> Optional[Examples]:
+        """The current entry for path, counted as a hit (caller holds the lock)"""
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        self.entries.move_to_end(path)
+        self.hits += 1
+        return entry[1]
+
+    def invalidate(self, path: Optional[str] = None):
+        """Drop the entry for path, or every entry if no path is given"""
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                self.bytes = 0
+            else:
+                self._remove(path)
+
+    def _remove(self, path: str):
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "oversized": self.oversized,
+            }
+
+_cache = ContextCache()
+_latest_file: Optional[str] = None
+
+def get_cache() -> ContextCache:
+    return _cache
+
+def contact_messages_file(contact: str) -> str:
+    """Path of the exported messages file for a contact's phone number"""
+    digits = ''.join(c for c in contact.lstrip('+') if c.isdigit())
+    # Same normalisation as the export endpoint: assume US for 10 digits
+    if len(digits) == 10:
+        digits = '1' + digits
+    return os.path.join(MESSAGES_DIR, f"messages_+{digits}.json")
+
+def latest_messages_file() -> Optional[str]:
+    """Most recently exported messages file.
+
+    The directory is only scanned the first time; after that exports report
+    their file through mark_exported.
+    """
+    global _latest_file
+    if _latest_file is None or not os.path.exists(_latest_file):
+        message_files = glob.glob(os.path.join(MESSAGES_DIR, "messages_*.json"))
+        _latest_file = max(message_files, key=os.path.getmtime) if message_files else None
+    return _latest_file
+
+def mark_exported(messages_file: str):
+    """Record a freshly written messages file so the next lookup reloads it"""
+    global _latest_file
+    _latest_file = messages_file
+    _cache.invalidate(messages_file)
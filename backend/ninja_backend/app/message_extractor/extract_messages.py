@@ -2,8 +2,11 @@ import os
 import sqlite3
 import json
 import tarfile
-import tempfile
+import threading
+import time
+import zlib
 import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -11,10 +14,113 @@ logger = logging.getLogger(__name__)
 OUTPUT_DIR = os.path.expanduser("~/Documents/ninja/messages_data")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def get_contacts():
+CHAT_DB_PATH = os.path.expanduser("~/Library/Messages/chat.db")
+
+# Rows pulled from SQLite per round trip, and bytes per streamed archive chunk
+FETCH_BATCH_SIZE = 1000
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+ARCHIVE_MEMBER = "messages.jsonl"
+
+# Per-contact locks serialising corpus updates, keyed by cleaned number
+_corpus_locks: Dict[str, threading.Lock] = {}
+_corpus_locks_guard = threading.Lock()
+
+# Messages for a contact added since the watermark, oldest first
+NEW_MESSAGES_QUERY = """
+SELECT m.ROWID, m.date, chj.chat_id, m.is_from_me, m.text
+FROM message AS m
+JOIN chat_message_join AS chj ON m.ROWID = chj.message_id
+JOIN handle h ON m.handle_id = h.ROWID
+WHERE LENGTH(m.text) > 0
+AND h.id = ?
+AND m.ROWID > ?
+ORDER BY m.date, m.ROWID;
+"""
+
+class MessagePairer:
+    """Pairs each block of consecutive "my" messages with the "other" block before it.
+
+    Messages are fed one at a time in date order. State is kept per chat as
+    the block currently being built plus the "other" block preceding it, so
+    it can be saved and resumed when later messages extend that block.
+    """
+
+    def __init__(self, chats: Optional[Dict[str, dict]] = None):
+        self.chats = chats or {}
+
+    def feed(self, chat_id, is_from_me: int, text: str) -> Optional[Tuple[str, str]]:
+        """Add a message and return the pair it closes, if any"""
+        key = str(chat_id)
+        text = text.replace("\n", " ")
+        block = self.chats.get(key)
+        if block and block["is_from_me"] == is_from_me:
+            block["text"] += " " + text
+            return None
+
+        closed = None
+        prev_text = None
+        if block:
+            if block["is_from_me"]:
+                if block["prev_text"] is not None:
+                    closed = (block["prev_text"], block["text"])
+            else:
+                prev_text = block["text"]
+        self.chats[key] = {"is_from_me": is_from_me, "text": text, "prev_text": prev_text}
+        return closed
+
+    def pending(self) -> List[Tuple[str, str]]:
+        """Pairs whose "my" block is still open and may grow with later messages"""
+        return [
+            (block["prev_text"], block["text"])
+            for block in self.chats.values()
+            if block["is_from_me"] and block["prev_text"] is not None
+        ]
+
+def format_pair(pair: Tuple[str, str]) -> dict:
+    """Format a (prev_text, my_text) pair as a training record"""
+    return {"text": f"person: {pair[0]}\nMeGPT: {pair[1]}", "label": 0}
+
+def _contact_paths(clean_number: str) -> Tuple[str, str]:
+    """Paths of a contact's pair corpus (JSON lines) and its watermark state"""
+    return (
+        os.path.join(OUTPUT_DIR, f"{clean_number}.jsonl"),
+        os.path.join(OUTPUT_DIR, f"{clean_number}.state.json"),
+    )
+
+def _load_state(state_file: str, corpus_file: str) -> Optional[dict]:
+    """Load a watermark, discarding it if the corpus it describes is missing"""
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(corpus_file) or os.path.getsize(corpus_file) < state["corpus_size"]:
+        return None
+    return state
+
+def _fetch_rows(cursor: sqlite3.Cursor, batch_size: int = FETCH_BATCH_SIZE) -> Iterator[tuple]:
+    """Yield query rows, pulling them from SQLite in fixed-size batches"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def _save_state(state_file: str, state: dict):
+    """Write the watermark atomically so an interrupted export is not half-recorded"""
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+
+def _clean_number(phone_number: str) -> str:
+    """Digits of a phone number, used to name the contact's files"""
+    return ''.join(c for c in phone_number.lstrip('+') if c.isdigit())
+
+def get_contacts(db_path: Optional[str] = None):
     """Get list of contacts from the database."""
-    home = os.path.expanduser("~")
-    db_path = f"{home}/Library/Messages/chat.db"
+    db_path = db_path or CHAT_DB_PATH
 
     if not os.access(db_path, os.R_OK):
         try:
@@ -35,109 +141,185 @@ def get_contacts():
     
     return contacts
 
-def extract_messages(phone_number=None):
-    """Extract messages from the database."""
-    logger.debug(f"Starting message extraction for phone number: {phone_number}")
-    home = os.path.expanduser("~")
-    db_path = f"{home}/Library/Messages/chat.db"
+def _corpus_lock(clean_number: str) -> threading.Lock:
+    """Lock held while a contact's corpus and watermark are updated"""
+    with _corpus_locks_guard:
+        return _corpus_locks.setdefault(clean_number, threading.Lock())
+
+def update_corpus(phone_number: str, db_path: Optional[str] = None) -> dict:
+    """Bring a contact's pair corpus up to date with the database.
+
+    Only messages after the stored watermark (the last message ROWID seen)
+    are read. The block left open by the previous export is restored from
+    the saved state, so new messages that continue it are stitched onto it
+    instead of starting a new pair. New closed pairs are appended to the
+    contact's JSON lines corpus. Updates for the same contact run one at a
+    time, so concurrent exports don't append the same pairs twice. Returns
+    the updated state; raises PermissionError if the database is not
+    readable.
+    """
+    db_path = db_path or CHAT_DB_PATH
 
     if not os.access(db_path, os.R_OK):
         try:
             os.chmod(db_path, 0o644)
         except PermissionError as e:
             logger.error(f"Permission error accessing database: {e}")
-            return None
+            raise
 
-    # Clean the phone number for filename
-    clean_number = ''.join(c for c in phone_number.lstrip('+') if c.isdigit()) if phone_number else 'all'
-    output_file = os.path.join(OUTPUT_DIR, f"{clean_number}.tar.gz")
-    
-    logger.debug("Creating temporary directory")
-    with tempfile.TemporaryDirectory() as temp_dir:
-        messages_json = os.path.join(temp_dir, "messages.json")
-        
-        logger.debug("Connecting to database")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # Base query
-        query = """
-        WITH messages_with_prev AS (
-            SELECT m.ROWID, m.guid, m.text, m.subject, m.country, m.date, chj.chat_id, m.is_from_me,
-                   LAG(m.is_from_me) OVER (PARTITION BY chj.chat_id ORDER BY m.date) AS prev_is_from_me
-            FROM message AS m
-            JOIN chat_message_join AS chj ON m.ROWID = chj.message_id
-            JOIN handle h ON m.handle_id = h.ROWID
-            WHERE LENGTH(m.text) > 0
-            AND h.id = ?
-        ),
-        grouped_messages AS (
-            SELECT *,
-                   SUM(CASE WHEN is_from_me != IFNULL(prev_is_from_me, -1) THEN 1 ELSE 0 END) OVER (PARTITION BY chat_id ORDER BY date) AS grp
-            FROM messages_with_prev
-        ),
-        consecutive_messages AS (
-            SELECT chat_id, is_from_me, group_concat(text, '\n') AS joined_text, MIN(date) AS min_date
-            FROM grouped_messages
-            GROUP BY chat_id, is_from_me, grp
-        ),
-        my_consecutive_messages AS (
-            SELECT * FROM consecutive_messages WHERE is_from_me = 1
-        ),
-        other_consecutive_messages AS (
-            SELECT * FROM consecutive_messages WHERE is_from_me = 0
-        )
-
-        SELECT other.joined_text AS prev_text, my.joined_text AS my_text
-                FROM my_consecutive_messages AS my
-        LEFT JOIN other_consecutive_messages AS other ON my.chat_id = other.chat_id AND other.min_date < my.min_date
-        WHERE other.min_date = (
-            SELECT MAX(min_date) FROM other_consecutive_messages AS ocm
-            WHERE ocm.chat_id = my.chat_id AND ocm.min_date < my.min_date
-        )
-        ORDER BY my.min_date;
-        """
+    clean_number = _clean_number(phone_number)
+    handle = '+' + clean_number
+    corpus_file, state_file = _contact_paths(clean_number)
+    fresh_state = {"handle": handle, "last_rowid": 0, "last_date": 0, "corpus_size": 0, "pairs": 0, "chats": {}}
 
+    # From loading the watermark to saving the new one
+    with _corpus_lock(clean_number):
+        state = _load_state(state_file, corpus_file)
+        if state is None or state["handle"] != handle:
+            state = fresh_state
+
+        conn = sqlite3.connect(db_path)
         try:
-            logger.debug("Executing query")
-            if phone_number:
-                logger.debug(f"Using phone number filter: {clean_number}")
-                cursor.execute(query, (clean_number,))
-            else:
-                cursor.execute(query)
-            
-            results = cursor.fetchall()
-            logger.debug(f"Found {len(results) if results else 0} results")
-            
-            if not results:
-                logger.debug("No results found")
-                return None
-            
-            logger.debug("Processing results")
-            results = [tuple(map(lambda x: x.replace("\n", " ") if x else "", row)) for row in results]
-            
-            logger.debug("Saving to JSON")
-            with open(messages_json, "w") as f:
-                json.dump(
-                    [{"text": f"person: {row[0]}\nMeGPT: {row[1]}", "label": 0} for row in results],
-                    f,
-                    indent=4,
-                )
-            
-            logger.debug(f"Creating tar.gz file at {output_file}")
-            with tarfile.open(output_file, "w:gz") as tar:
-                tar.add(messages_json, arcname="messages.json")
-            
-            logger.debug("Reading tar.gz file")
-            with open(output_file, "rb") as f:
-                return f.read()
-                
-        except Exception as e:
-            logger.error(f"Error during message extraction: {str(e)}", exc_info=True)
-            raise
+            max_rowid = conn.execute("SELECT IFNULL(MAX(ROWID), 0) FROM message").fetchone()[0]
+            if max_rowid < state["last_rowid"]:
+                logger.debug("Database is behind the watermark, rebuilding corpus")
+                state = fresh_state
+
+            logger.debug(f"Scanning messages for {handle} after ROWID {state['last_rowid']}")
+            pairer = MessagePairer(state["chats"])
+            cursor = conn.execute(NEW_MESSAGES_QUERY, (handle, state["last_rowid"]))
+            scanned = 0
+            with open(corpus_file, "a", encoding="utf-8") as f:
+                # Drop anything written after the last recorded watermark
+                f.truncate(state["corpus_size"])
+                for rowid, date, chat_id, is_from_me, text in _fetch_rows(cursor):
+                    scanned += 1
+                    pair = pairer.feed(chat_id, is_from_me, text)
+                    if pair:
+                        f.write(json.dumps(format_pair(pair)) + "\n")
+                        state["pairs"] += 1
+                    state["last_rowid"] = max(state["last_rowid"], rowid)
+                    state["last_date"] = max(state["last_date"], date)
         finally:
             conn.close()
 
+        state["chats"] = pairer.chats
+        state["corpus_size"] = os.path.getsize(corpus_file)
+        _save_state(state_file, state)
+    logger.debug(f"Scanned {scanned} new messages, corpus has {state['pairs']} closed pairs")
+    return state
+
+def count_records(state: dict) -> int:
+    """Number of training records in a corpus, including still-open pairs"""
+    return state["pairs"] + len(MessagePairer(state["chats"]).pending())
+
+def _pending_lines(state: dict) -> bytes:
+    """Still-open pairs serialised as JSON lines"""
+    return "".join(
+        json.dumps(format_pair(pair)) + "\n" for pair in MessagePairer(state["chats"]).pending()
+    ).encode("utf-8")
+
+def iter_corpus(phone_number: str) -> Iterator[dict]:
+    """Stream a contact's training records: closed pairs followed by still-open ones"""
+    corpus_file, state_file = _contact_paths(_clean_number(phone_number))
+    state = _load_state(state_file, corpus_file)
+    if state is None:
+        return
+
+    with open(corpus_file, "rb") as f:
+        while f.tell() < state["corpus_size"]:
+            line = f.readline()
+            if not line:
+                break
+            yield json.loads(line)
+    for pair in MessagePairer(state["chats"]).pending():
+        yield format_pair(pair)
+
+def read_corpus(phone_number: str) -> List[dict]:
+    """Load a contact's training records into a list"""
+    return list(iter_corpus(phone_number))
+
+def write_json_array(path: str, records: Iterable[dict], indent: int = 2) -> int:
+    """Write records as a JSON array one element at a time; returns the count"""
+    count = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for record in records:
+            element = json.dumps(record, indent=indent).replace("\n", "\n" + " " * indent)
+            f.write(("," if count else "") + "\n" + " " * indent + element)
+            count += 1
+        f.write("\n]" if count else "]")
+    return count
+
+def iter_export_archive(phone_number: str, chunk_size: int = ARCHIVE_CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream a contact's corpus as a tar.gz holding a single messages.jsonl member.
+
+    The member size is known up front (stored corpus bytes plus the open
+    pairs), so the tar header goes out first and the corpus is copied through
+    gzip in fixed-size chunks without building the archive in memory or on disk.
+    """
+    corpus_file, state_file = _contact_paths(_clean_number(phone_number))
+    state = _load_state(state_file, corpus_file)
+    if state is None:
+        return
+
+    pending = _pending_lines(state)
+    info = tarfile.TarInfo(ARCHIVE_MEMBER)
+    info.size = state["corpus_size"] + len(pending)
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    header = info.tobuf(format=tarfile.GNU_FORMAT)
+
+    gzip = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    yield gzip.compress(header)
+
+    with open(corpus_file, "rb") as f:
+        remaining = state["corpus_size"]
+        while remaining:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                raise IOError(f"Corpus {corpus_file} is shorter than its watermark")
+            remaining -= len(chunk)
+            compressed = gzip.compress(chunk)
+            if compressed:
+                yield compressed
+
+    # Pad the member to a block boundary, then close the archive with two
+    # empty blocks and pad it to a full record like tarfile does
+    written = len(header) + info.size
+    member_padding = -info.size % tarfile.BLOCKSIZE
+    written += member_padding + 2 * tarfile.BLOCKSIZE
+    trailer = tarfile.NUL * (member_padding + 2 * tarfile.BLOCKSIZE + -written % tarfile.RECORDSIZE)
+    yield gzip.compress(pending + trailer) + gzip.flush()
+
+def extract_messages(phone_number=None, db_path: Optional[str] = None) -> Optional[str]:
+    """Extract messages from the database into a tar.gz; returns its path."""
+    logger.debug(f"Starting message extraction for phone number: {phone_number}")
+    if not phone_number:
+        raise ValueError("A phone number is required to extract messages")
+
+    # Clean the phone number for filename
+    clean_number = _clean_number(phone_number)
+    output_file = os.path.join(OUTPUT_DIR, f"{clean_number}.tar.gz")
+
+    try:
+        state = update_corpus(phone_number, db_path)
+        results = count_records(state)
+        logger.debug(f"Found {results} results")
+        if not results:
+            logger.debug("No results found")
+            return None
+
+        logger.debug(f"Streaming tar.gz file to {output_file}")
+        with open(output_file, "wb") as f:
+            for chunk in iter_export_archive(phone_number):
+                f.write(chunk)
+        return output_file
+
+    except Exception as e:
+        logger.error(f"Error during message extraction: {str(e)}", exc_info=True)
+        raise
+
 if __name__ == "__main__":
     # Test the functions
     contacts = get_contacts()
@@ -1,22 +1,23 @@
 import os
-import json
+import shutil
 import logging
-from typing import List
 
 logger = logging.getLogger(__name__)
 
-def train_model(messages: List[dict]) -> None:
-    """Simplified training function that just logs messages."""
+def train_model(messages_file: str) -> str:
+    """Copy an exported messages file to where training reads it from, returning the copy's path"""
     try:
-        logger.info(f"Would train model on {len(messages)} messages")
+        logger.info(f"Preparing training data from {messages_file}")
         # Save messages for later use
         output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
         os.makedirs(output_dir, exist_ok=True)
         
-        with open(os.path.join(output_dir, "training_messages.json"), "w") as f:
-            json.dump(messages, f, indent=2)
+        # One copy per export, so concurrent jobs don't overwrite each other's data
+        training_file = os.path.join(output_dir, f"training_{os.path.basename(messages_file)}")
+        shutil.copyfile(messages_file, training_file)
             
         logger.info("Saved messages for training")
+        return training_file
     except Exception as e:
         logger.error(f"Failed to process messages: {str(e)}")
         raise
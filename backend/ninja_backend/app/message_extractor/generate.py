@@ -1,74 +1,151 @@
 import os
 import json
-from typing import Optional
-import ollama
-import glob
-from functools import lru_cache
+import asyncio
+import hashlib
+import time
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from app.llm.cache import SingleFlightCache
+from app.llm.scheduler import SessionScheduler
+from app.llm.speculative import Speculator
+from app.llm.backends import get_backend
+from app.llm.tokens import get_token_counter
+from app.message_extractor.context_cache import contact_messages_file, get_cache, latest_messages_file
+from app.message_extractor.retrieval import ExampleIndex, load_or_build_index
+from app.message_extractor.suggestions import (
+    SUGGESTION_RETRIES,
+    SUGGESTIONS_SCHEMA,
+    SuggestionParser,
+    get_suggestion_stats,
+    repair_messages,
+)
+
+# Most past exchanges retrieved as few-shot examples for each message; how
+# many are used depends on what fits in PROMPT_TOKEN_BUDGET
+FEW_SHOT_EXAMPLES = int(os.getenv("FEW_SHOT_EXAMPLES", "20"))
+# Number of most recent exchanges kept in the fixed part of every prompt
+STYLE_EXAMPLES = int(os.getenv("STYLE_EXAMPLES", "5"))
+# Prompt size in tokens. The instructions and the message always go in, then
+# as much of the recent conversation as fits, then examples.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2048"))
+# Tokens a chat template adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
 
 def get_latest_messages_file():
     """Get the most recent messages file from messages_data directory"""
-    messages_dir = os.path.expanduser("~/Documents/ninja/messages_data")
-    if not os.path.exists(messages_dir):
-        return None
-        
-    # Get all messages_*.json files
-    message_files = glob.glob(os.path.join(messages_dir, "messages_*.json"))
-    if not message_files:
-        return None
-        
-    # Return most recently modified file
-    return max(message_files, key=os.path.getmtime)
-
-@lru_cache(maxsize=1)
-def load_context(messages_file: Optional[str] = None) -> str:
-    """Load and format messages for context"""
-    if messages_file is None:
-        messages_file = get_latest_messages_file()
-        
-    print(f"Attempting to load messages from: {messages_file}")
-    if messages_file and os.path.exists(messages_file):
-        print(f"Found messages file at {messages_file}")
-        with open(messages_file, 'r') as f:
-            messages = json.load(f)
-            print(f"Loaded {len(messages)} messages")
-            # Format messages into clear examples
-            examples = []
-            for msg in messages:
-                if "text" in msg:
-                    # Split into person/MeGPT parts
-                    parts = msg["text"].split("\n")
-                    if len(parts) == 2:
-                        person = parts[0].replace("person: ", "")
-                        megpt = parts[1].replace("MeGPT: ", "")
-                        examples.append(f"Them: {person}\nYou: {megpt}")
-            print(f"Formatted {len(examples)} examples")
-            print("\nExample messages to copy style from:")
-            for i, ex in enumerate(examples[-2:], 1):  # Show last 2 examples
-                print(f"\nExample {i}:\n{ex}")
-            # Return last 5 examples to stay within context
-            final_context = "\n\n".join(examples[-5:])
-            return final_context
-    else:
-        print(f"WARNING: No messages file found")
-    return ""
+    return latest_messages_file()
 
-MODEL_NAME = "llama3.1:8b"
-print(f"Using Ollama with {MODEL_NAME}...")
+def load_examples(messages_file: str) -> Tuple[List[str], Optional[ExampleIndex]]:
+    """Load and format messages as examples, with a retrieval index over them"""
+    print(f"Loading messages from: {messages_file}")
+    with open(messages_file, 'r') as f:
+        messages = json.load(f)
+    print(f"Loaded {len(messages)} messages")
+    # Format messages into clear examples
+    examples = []
+    incoming = []
+    for msg in messages:
+        if "text" in msg:
+            # Split into person/MeGPT parts
+            parts = msg["text"].split("\n")
+            if len(parts) == 2:
+                person = parts[0].replace("person: ", "")
+                megpt = parts[1].replace("MeGPT: ", "")
+                examples.append(f"Them: {person}\nYou: {megpt}")
+                incoming.append(person)
+    print(f"Formatted {len(examples)} examples")
+    # Index what the other person said, to match against incoming messages
+    return examples, load_or_build_index(messages_file, incoming)
+
+def get_examples(contact: Optional[str] = None) -> Tuple[List[str], Optional[ExampleIndex]]:
+    """Cached examples for a contact, or for the latest export if none is given"""
+    messages_file = contact_messages_file(contact) if contact else get_latest_messages_file()
+    if not messages_file:
+        print("WARNING: No messages file found")
+        return [], None
+    return get_cache().get(messages_file, load_examples)
+
+def fit_examples(examples: List[str], recent: List[int], related: List[int], budget: int) -> Tuple[List[int], List[int]]:
+    """Choose the recent and related examples that fit in budget tokens.
+
+    Recent examples go first, newest first, so the prompt prefix stays the
+    same between requests; related ones follow in order of relevance. An
+    example that doesn't fit is skipped in favour of shorter ones after it.
+    """
+    counter = get_token_counter()
+    chosen = {"recent": [], "related": []}
+    used = 0
+    for kind, indices in (("recent", reversed(recent)), ("related", related)):
+        for i in indices:
+            # Plus one for the blank line between examples
+            tokens = counter.count(examples[i]) + 1
+            if used + tokens <= budget:
+                chosen[kind].append(i)
+                used += tokens
+    return sorted(chosen["recent"]), chosen["related"]
+
+def load_context(
+    message: Optional[str] = None,
+    k: Optional[int] = None,
+    contact: Optional[str] = None,
+    budget: Optional[int] = None,
+) -> Tuple[str, str]:
+    """Format past exchanges as style examples, split into (recent, related).
+
+    ``recent`` is the last STYLE_EXAMPLES exchanges, which only change when
+    the corpus does, so it can sit in the cached prompt prefix. ``related``
+    holds up to k further exchanges most relevant to message. With a budget,
+    only the examples that fit in that many tokens are kept.
+    """
+    k = k or FEW_SHOT_EXAMPLES
+    examples, index = get_examples(contact)
+    if not examples:
+        return "", ""
+
+    recent = range(max(len(examples) - STYLE_EXAMPLES, 0), len(examples))
+    related = []
+    if message and index:
+        # Search past the recent ones so they don't crowd out other matches
+        related = [i for i in index.search(message, k + STYLE_EXAMPLES) if i not in recent][:k]
+    if budget is not None:
+        recent, related = fit_examples(examples, recent, related, budget)
+    # Keep chronological order so the examples read like a conversation
+    return (
+        "\n\n".join(examples[i] for i in recent),
+        "\n\n".join(examples[i] for i in sorted(related)),
+    )
+
+# Per-call latency budgets (seconds) for the practice fan-out
+RESPONSE_BUDGET_SECONDS = float(os.getenv("RESPONSE_BUDGET_SECONDS", "30"))
+SUGGESTIONS_BUDGET_SECONDS = float(os.getenv("SUGGESTIONS_BUDGET_SECONDS", "20"))
+
+RESPONSE_FALLBACK = "Sorry, I had trouble generating a response"
+
+# Completed draft analyses kept for repeated /analyze calls
+ANALYZE_CACHE_SIZE = int(os.getenv("ANALYZE_CACHE_SIZE", "1024"))
+ANALYZE_CACHE_TTL_SECONDS = float(os.getenv("ANALYZE_CACHE_TTL_SECONDS", "300"))
+# Wait this long before analyzing a draft, in case the user is still typing
+ANALYZE_DEBOUNCE_SECONDS = float(os.getenv("ANALYZE_DEBOUNCE_SECONDS", "0"))
+
+# Completed real-chat suggestions, keyed by conversation state
+SUGGESTIONS_CACHE_SIZE = int(os.getenv("SUGGESTIONS_CACHE_SIZE", "256"))
+SUGGESTIONS_CACHE_TTL_SECONDS = float(os.getenv("SUGGESTIONS_CACHE_TTL_SECONDS", "300"))
+# Generate suggestions as soon as the other person's message arrives
+SPECULATIVE_SUGGESTIONS = os.getenv("SPECULATIVE_SUGGESTIONS", "1") == "1"
+SPECULATIVE_MAX_IN_FLIGHT = int(os.getenv("SPECULATIVE_MAX_IN_FLIGHT", "1"))
+SPECULATIVE_MAX_PER_MINUTE = int(os.getenv("SPECULATIVE_MAX_PER_MINUTE", "6"))
+# Sessions whose speculation counts are tracked at once
+SPECULATIVE_MAX_SESSIONS = int(os.getenv("SPECULATIVE_MAX_SESSIONS", "1024"))
+
+# Load the model and evaluate the shared prompt prefix when the server starts
+WARM_UP_ON_STARTUP = os.getenv("OLLAMA_WARM_UP", "1") == "1"
+
+# Shared by every prompt so Ollama can reuse the evaluated prefix across
+# replies and suggestions. Anything that varies per request (goal, related
+# examples, history, the message itself) goes after it.
+SYSTEM_PROMPT = """You are simulating a specific person's texting style based on their message history.
+You will either reply as them or suggest replies they could send.
 
-def get_response(message: str, conversation_history: Optional[str] = None) -> str:
-    """Get response using Ollama."""
-    try:
-        # Format prompt with context
-        context = load_context()
-        if not context:
-            print("WARNING: No context loaded from messages.json")
-            return "Error: No message history available for style matching"
-            
-        # Format examples for better context understanding
-        system_prompt = {
-            "role": "system",
-            "content": """You are simulating a specific person's texting style based on their message history.
-            
 CONTEXT STRUCTURE:
 Each example is formatted as:
 Them: [what others say]
@@ -85,158 +162,501 @@ CRITICAL RULES:
 3. NEVER explain or be meta
 4. NEVER give long responses unless examples show long responses
 5. Stay 100% in character"""
+
+def build_prefix_messages(examples: str) -> List[dict]:
+    """Fixed start of every prompt: instructions and the recent examples"""
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Here are the person's actual text messages. Study their style carefully:\n\n{examples}"
+        },
+        {
+            "role": "assistant",
+            "content": "I'll analyze their exact texting patterns."
         }
+    ]
 
-        # Build conversation context
-        context_messages = [
-            system_prompt,
+def build_volatile_messages(related: str, conversation_history: Optional[str]) -> List[dict]:
+    """Per-request examples and conversation history, placed after the prefix"""
+    context_messages = []
+    if related:
+        context_messages.extend([
             {
                 "role": "user",
-                "content": "Here are the person's actual text messages. Study their style carefully:"
+                "content": f"More of their messages, similar to this conversation:\n\n{related}"
             },
             {
-                "role": "assistant", 
-                "content": "I'll analyze their exact texting patterns."
-            },
+                "role": "assistant",
+                "content": "Got it."
+            }
+        ])
+
+    # Add conversation history if available and non-empty
+    if conversation_history and conversation_history.strip():
+        context_messages.extend([
             {
                 "role": "user",
-                "content": context
+                "content": "Recent conversation context:"
+            },
+            {
+                "role": "assistant",
+                "content": conversation_history
             }
-        ]
-
-        # Add conversation history if available
-        if conversation_history:
-            context_messages.extend([
-                {
-                    "role": "user",
-                    "content": "Recent conversation context:"
-                },
-                {
-                    "role": "assistant",
-                    "content": conversation_history
-                }
-            ])
-
-        # Add current message
-        context_messages.append({
-            "role": "user",
-            "content": f"Respond to this message: {message}"
-        })
+        ])
+    return context_messages
+
+def build_response_messages(context: Tuple[str, str], message: str, conversation_history: Optional[str] = None) -> List[dict]:
+    """Build the chat messages for a simulated reply"""
+    recent, related = context
+    context_messages = build_prefix_messages(recent) + build_volatile_messages(related, conversation_history)
+
+    # Add current message
+    context_messages.append({
+        "role": "user",
+        "content": f"Respond to this message: {message}"
+    })
+    return context_messages
+
+def build_suggestion_messages(context: Tuple[str, str], message: str, conversation_history: str, goal: str = "") -> List[dict]:
+    """Build the chat messages asking for suggested responses"""
+    recent, related = context
+    context_messages = build_prefix_messages(recent) + build_volatile_messages(related, conversation_history)
+
+    # Add the task, goal and current message
+    context_messages.append({
+        "role": "user",
+        "content": f"""Suggest 3 possible responses to the message below that:
+1. Match the exact texting style from the examples
+2. Are appropriate for the current conversation
+3. Help achieve the goal
+
+Goal: {goal if goal else 'Have a natural conversation'}
+
+Reply with only a JSON object in this shape:
+{{"suggestions": [{{"text": "your suggested message", "score": 6-10, "explanation": "1 line about style/goal match"}}]}}
+
+Message to respond to: {message}
+
+Generate exactly 3 suggestions that match the texting style and goal."""
+    })
+    return context_messages
+
+def prompt_tokens(messages: List[dict]) -> int:
+    """Tokens in a chat prompt, counting the template's per-message overhead"""
+    counter = get_token_counter()
+    return sum(counter.count(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+def fit_history(conversation_history: Optional[str], budget: int) -> Tuple[str, int]:
+    """The most recent lines of conversation_history that fit in budget tokens, and their count"""
+    if not conversation_history or budget <= 0:
+        return "", 0
+    counter = get_token_counter()
+    kept, used = [], 0
+    for line in reversed(conversation_history.strip().split("\n")):
+        # Plus one for the newline
+        tokens = counter.count(line) + 1
+        if used + tokens > budget:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(reversed(kept)), used
 
-        print("\nSending context to Ollama:")
+def build_prompt(
+    build: Callable[[Tuple[str, str], Optional[str]], List[dict]],
+    message: str,
+    conversation_history: Optional[str],
+    contact: Optional[str] = None,
+    budget: Optional[int] = None,
+) -> Optional[List[dict]]:
+    """Build a prompt that fits in budget (PROMPT_TOKEN_BUDGET) tokens, or the backend's limit.
+
+    ``build(context, history)`` assembles the messages. The instructions and
+    message always go in, then room is kept for the STYLE_EXAMPLES recent
+    examples, which make up the prefix shared by every prompt. What is left
+    goes to the most recent conversation history, then to related examples.
+    A budget too small for the recent examples drops some of them, so the
+    shared prefix (and the server's cached evaluation of it) changes. Returns
+    None if there are no examples to match the style of.
+    """
+    examples = get_examples(contact)[0]
+    if not examples:
+        return None
+    budget = budget or PROMPT_TOKEN_BUDGET
+    # Leave the reply room in a model with a short context (the local OPT model)
+    limit = get_backend().max_prompt_tokens()
+    if limit is not None:
+        budget = min(budget, limit)
+    base = prompt_tokens(build(("", ""), None))
+    remaining = budget - base
+
+    # The user/assistant turns that wrap the history and the related examples
+    history_overhead = prompt_tokens(build(("", ""), "-")) - base - 1
+    related_overhead = prompt_tokens(build(("", "-"), None)) - base - 1
+    # Counted the way fit_examples counts them, so they still fit after the history
+    counter = get_token_counter()
+    style = sum(counter.count(example) + 1 for example in examples[max(len(examples) - STYLE_EXAMPLES, 0):])
+    history, used = fit_history(conversation_history, remaining - style - related_overhead - history_overhead)
+    if history:
+        remaining -= used + history_overhead
+
+    context = load_context(message, contact=contact, budget=max(remaining - related_overhead, 0))
+    return build(context, history)
+
+async def warm_up(contact: Optional[str] = None):
+    """Load the model and prime Ollama's prompt cache with the shared prefix"""
+    try:
+        recent, _ = await asyncio.to_thread(load_context, None, None, contact)
+        # With no messages Ollama just loads the model
+        prefix = build_prefix_messages(recent) if recent else []
+        start = time.perf_counter()
+        backend = get_backend()
+        await backend.chat(prefix, options={"num_predict": 1})
+        print(f"Warmed up {backend.model} in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"WARNING: Model warm-up failed: {str(e)}")
+
+async def get_response(message: str, conversation_history: Optional[str] = None, contact: Optional[str] = None) -> str:
+    """Get response from the configured backend."""
+    try:
+        # Format prompt with context
+        context_messages = await asyncio.to_thread(
+            build_prompt,
+            lambda context, history: build_response_messages(context, message, history),
+            message,
+            conversation_history,
+            contact,
+        )
+        if context_messages is None:
+            print("WARNING: No context loaded from messages.json")
+            return "Error: No message history available for style matching"
+
+        print("\nSending context to the model:")
         for msg in context_messages:
             print(f"\n{msg['role']}: {msg['content'][:100]}...")
 
-        # Generate response using Ollama
-        response = ollama.chat(
-            model=MODEL_NAME,
-            messages=context_messages
-        )
+        # Generate response with the configured backend
+        response = await get_backend().chat(context_messages)
         
-        result = response['message']['content'].strip()
-        print(f"\nOllama response: {result}")
+        result = response.strip()
+        print(f"\nModel response: {result}")
         return result
 
     except Exception as e:
         print(f"Error generating response: {str(e)}")
-        return "Sorry, I had trouble generating a response"
+        return RESPONSE_FALLBACK
 
-def analyze_message_suggestions(message: str, conversation_history: str, goal: str = "") -> list:
-    """Generate and analyze potential response suggestions."""
-    try:
-        context = load_context()
-        if not context:
-            print("WARNING: No context loaded")
-            return []
+async def stream_response(message: str, conversation_history: Optional[str] = None, contact: Optional[str] = None) -> AsyncIterator[str]:
+    """Stream the simulated reply token by token"""
+    context_messages = await asyncio.to_thread(
+        build_prompt,
+        lambda context, history: build_response_messages(context, message, history),
+        message,
+        conversation_history,
+        contact,
+    )
+    if context_messages is None:
+        print("WARNING: No context loaded from messages.json")
+        yield "Error: No message history available for style matching"
+        return
+    started = False
+    async for token in get_backend().stream(context_messages):
+        # Match get_response, which strips leading whitespace from the reply
+        if not started:
+            token = token.lstrip()
+            if not token:
+                continue
+            started = True
+        yield token
 
-        # Build context messages
-        context_messages = [
-            {
-                "role": "system",
-                "content": f"""You are analyzing a text message conversation and suggesting responses.
-Goal: {goal if goal else 'Have a natural conversation'}
+async def generate_suggestions(context_messages: List[dict], stream: bool = True) -> AsyncIterator[dict]:
+    """Yield validated suggestions as they are parsed.
 
-Your task is to suggest 3 possible responses that:
-1. Match the exact texting style from the examples
-2. Are appropriate for the current conversation
-3. Help achieve the goal
+    The reply is constrained to SUGGESTIONS_SCHEMA. If it yields fewer than
+    three usable suggestions the model is asked again, with the error, up to
+    SUGGESTION_RETRIES times; duplicates of suggestions already yielded are
+    skipped.
+    """
+    stats = get_suggestion_stats()
+    stats.requests += 1
+    backend = get_backend()
+    parser = SuggestionParser()
+    if stream:
+        tokens = backend.stream(context_messages, format=SUGGESTIONS_SCHEMA)
+        try:
+            async for token in tokens:
+                for suggestion in parser.feed(token):
+                    yield suggestion
+                if parser.count >= parser.limit:
+                    break
+        finally:
+            # Stops the generation once there are enough suggestions
+            await tokens.aclose()
+    else:
+        for suggestion in parser.feed(await backend.chat(context_messages, format=SUGGESTIONS_SCHEMA)):
+            yield suggestion
+    parser.close()
 
-Format each suggestion as:
-Score: [6-10]
-Message: [your suggested text]
-Explanation: [1 line about style/goal match]"""
-            },
-            {
-                "role": "user",
-                "content": "Here are example messages showing the texting style:"
-            },
-            {
-                "role": "assistant",
-                "content": "I'll analyze the style patterns."
-            },
-            {
-                "role": "user",
-                "content": context
-            }
-        ]
-
-        # Add conversation history if available and non-empty
-        if conversation_history and conversation_history.strip():
-            context_messages.extend([
-                {
-                    "role": "user",
-                    "content": "Recent messages in the conversation:"
-                },
-                {
-                    "role": "assistant",
-                    "content": conversation_history
-                }
-            ])
-
-        # Add current message
-        context_messages.append({
-            "role": "user",
-            "content": f"""Message to respond to: {message}
-
-Generate exactly 3 suggestions that match the texting style and goal.
-Use Score/Message/Explanation format.
-Separate suggestions with double newlines."""
-        })
-
-        # Generate suggestions using Ollama
-        print("Generating suggestions...")
-        response = ollama.chat(
-            model=MODEL_NAME,
-            messages=context_messages
-        )
-        
-        suggestions_text = response['message']['content'].strip()
-        print(f"Raw suggestions:\n{suggestions_text}")
-        suggestions = []
-        
-        # Parse suggestions
-        blocks = suggestions_text.split("\n\n")
-        for block in blocks:
-            try:
-                lines = block.strip().split("\n")
-                if len(lines) >= 3:
-                    score = int(lines[0].replace("Score:", "").strip())
-                    message = lines[1].replace("Message:", "").strip()
-                    explanation = lines[2].replace("Explanation:", "").strip()
-                    
-                    if score >= 6 and message:  # Only include valid suggestions
-                        suggestions.append({
-                            "text": message,
-                            "score": score,
-                            "explanation": explanation
-                        })
-            except Exception as e:
-                print(f"Failed to parse suggestion block: {e}")
-                continue
-                
-        print(f"Generated {len(suggestions)} valid suggestions")
-        return suggestions[:3]  # Return top 3 suggestions
+    for _ in range(SUGGESTION_RETRIES):
+        if parser.count >= parser.limit:
+            break
+        print(f"Retrying suggestions: {parser.error}")
+        stats.retries += 1
+        messages = repair_messages(context_messages, parser)
+        parser.restart()
+        for suggestion in parser.feed(await backend.chat(messages, format=SUGGESTIONS_SCHEMA)):
+            yield suggestion
+        parser.close()
+
+    if parser.count < parser.limit:
+        stats.short_requests += 1
+        print(f"Only {parser.count} valid suggestions: {parser.error}")
+
+async def _compute_suggestions(message: str, conversation_history: str, goal: str, contact: Optional[str]) -> list:
+    """Generate suggestions, raising instead of returning none so they aren't cached"""
+    context_messages = await asyncio.to_thread(
+        build_prompt,
+        lambda context, history: build_suggestion_messages(context, message, history, goal),
+        message,
+        conversation_history,
+        contact,
+    )
+    if context_messages is None:
+        print("WARNING: No context loaded")
+        raise ValueError("No message history available for style matching")
+
+    # Generate suggestions with the configured backend
+    print("Generating suggestions...")
+    suggestions = [s async for s in generate_suggestions(context_messages, stream=False)]
 
+    print(f"Generated {len(suggestions)} valid suggestions")
+    if not suggestions:
+        raise ValueError("No valid suggestions generated")
+    return suggestions
+
+def suggestion_key(message: str, conversation_history: str, goal: str = "", contact: Optional[str] = None) -> str:
+    """Hash of the conversation state that suggestions are generated from"""
+    state = [_normalize(message), (conversation_history or "").strip(), _normalize(goal), contact or ""]
+    return hashlib.sha256(json.dumps(state).encode()).hexdigest()
+
+async def analyze_message_suggestions(message: str, conversation_history: str, goal: str = "", contact: Optional[str] = None) -> list:
+    """Generate and analyze potential response suggestions.
+
+    Results are cached by conversation state, so when suggestions for this
+    state were speculated on, the cached result is returned or the running
+    generation is joined.
+    """
+    key = suggestion_key(message, conversation_history, goal, contact)
+    try:
+        return await _suggestions_cache.get(
+            key, lambda: _compute_suggestions(message, conversation_history, goal, contact)
+        )
     except Exception as e:
         print(f"Error generating suggestions: {str(e)}")
         return []
+
+def speculate_suggestions(
+    session_id: str, message: str, conversation_history: str, goal: str = "", contact: Optional[str] = None
+) -> str:
+    """Start generating suggestions for a conversation state in the background.
+
+    Called when the other person's message arrives, so a later
+    analyze_message_suggestions for the same state finds them ready. Returns
+    the Speculator's status, or "disabled".
+    """
+    if not SPECULATIVE_SUGGESTIONS:
+        return "disabled"
+    key = suggestion_key(message, conversation_history, goal, contact)
+    return _suggestion_speculator.speculate(
+        session_id, key, lambda: _compute_suggestions(message, conversation_history, goal, contact)
+    )
+
+async def stream_suggestions(message: str, conversation_history: str, goal: str = "", contact: Optional[str] = None) -> AsyncIterator[dict]:
+    """Stream suggestions, yielding each one as soon as its block is complete"""
+    # The first lookup for a contact parses its corpus and loads the index
+    if not (await asyncio.to_thread(get_examples, contact))[0]:
+        print("WARNING: No context loaded")
+        return
+
+    # Speculated on already: wait for that generation rather than start another
+    if _suggestions_cache.contains(suggestion_key(message, conversation_history, goal, contact)):
+        for suggestion in await analyze_message_suggestions(message, conversation_history, goal, contact):
+            yield suggestion
+        return
+
+    context_messages = await asyncio.to_thread(
+        build_prompt,
+        lambda context, history: build_suggestion_messages(context, message, history, goal),
+        message,
+        conversation_history,
+        contact,
+    )
+    async for suggestion in generate_suggestions(context_messages):
+        yield suggestion
+
+def build_analysis_messages(message: str, goal: str = "", background: str = "") -> List[dict]:
+    """Build the chat messages for a real-time draft analysis"""
+    return [
+        {
+            "role": "system",
+            "content": f"""You are a messaging advisor. Analyze this draft message and provide 2 brief points about how it aligns with the goal/context.
+
+Goal: {goal}
+Background: {background}
+Message: {message}
+
+Give exactly 2 points:
+- Use "✓" for positive aspects that align well
+- Use "→" for suggestions to improve
+
+Keep each point under 8 words. Be direct and specific. No explanations or intros."""
+        },
+        {"role": "user", "content": "Analyze message"}
+    ]
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+_analysis_cache = SingleFlightCache(ANALYZE_CACHE_SIZE, ANALYZE_CACHE_TTL_SECONDS)
+_analysis_scheduler = SessionScheduler(ANALYZE_DEBOUNCE_SECONDS)
+
+_suggestions_cache = SingleFlightCache(SUGGESTIONS_CACHE_SIZE, SUGGESTIONS_CACHE_TTL_SECONDS)
+_suggestion_speculator = Speculator(
+    _suggestions_cache, SPECULATIVE_MAX_IN_FLIGHT, SPECULATIVE_MAX_PER_MINUTE, SPECULATIVE_MAX_SESSIONS
+)
+
+def get_analysis_cache() -> SingleFlightCache:
+    return _analysis_cache
+
+def get_suggestions_cache() -> SingleFlightCache:
+    return _suggestions_cache
+
+def get_suggestion_speculator() -> Speculator:
+    return _suggestion_speculator
+
+def get_analysis_scheduler() -> SessionScheduler:
+    return _analysis_scheduler
+
+async def analyze_draft(message: str, goal: str = "", background: str = "", session_id: Optional[str] = None) -> str:
+    """Two-point feedback on a draft message.
+
+    Identical drafts (ignoring surrounding and repeated whitespace) share one
+    generation while it runs and reuse its result for ANALYZE_CACHE_TTL_SECONDS.
+    With a session_id, a newer draft from the same session cancels this one,
+    which then raises Superseded.
+    """
+    message, goal, background = _normalize(message), _normalize(goal), _normalize(background)
+    key = (message, goal, background)
+
+    async def generate_feedback() -> str:
+        # Streamed so a cancelled analysis closes the stream and Ollama stops
+        response = ""
+        async for token in get_backend().stream(build_analysis_messages(message, goal, background)):
+            response += token
+        feedback = response.strip()
+        if not feedback:
+            feedback = "→ Keep typing..."
+        # Clean up any extra newlines
+        return "\n".join(line for line in feedback.split("\n") if line.strip().startswith(("✓", "→")))
+
+    if session_id is None:
+        return await _analysis_cache.get(key, generate_feedback)
+
+    cached = _analysis_cache.peek(key)
+    if cached is not None:
+        # Still supersede the session's older draft, and skip the debounce
+        _analysis_scheduler.cancel(session_id)
+        return cached
+    return await _analysis_scheduler.run(session_id, lambda: _analysis_cache.get(key, generate_feedback))
+
+async def _within_budget(coro, budget: float, fallback):
+    """Await coro, returning fallback if it misses its deadline"""
+    try:
+        return await asyncio.wait_for(coro, timeout=budget)
+    except asyncio.TimeoutError:
+        print(f"Generation exceeded its {budget}s budget")
+        return fallback
+
+async def _collect_within_budget(stream: AsyncIterator[dict], budget: float) -> list:
+    """Collect streamed items until the stream ends or the budget runs out"""
+    items = []
+
+    async def consume():
+        async for item in stream:
+            items.append(item)
+
+    try:
+        await asyncio.wait_for(consume(), timeout=budget)
+    except asyncio.TimeoutError:
+        print(f"Suggestions exceeded their {budget}s budget, returning {len(items)}")
+    except Exception as e:
+        print(f"Error generating suggestions: {str(e)}")
+    return items
+
+async def get_practice_result(
+    message: str,
+    conversation_history: Optional[str] = None,
+    goal: str = "",
+    response_budget: Optional[float] = None,
+    suggestions_budget: Optional[float] = None,
+    contact: Optional[str] = None,
+) -> Tuple[str, list]:
+    """Generate the simulated reply and suggestions concurrently.
+
+    Both calls share the cached context and run side by side, so latency is
+    bounded by the slower one instead of their sum. Suggestions are streamed,
+    so those completed before their budget runs out are still returned.
+    """
+    if response_budget is None:
+        response_budget = RESPONSE_BUDGET_SECONDS
+    if suggestions_budget is None:
+        suggestions_budget = SUGGESTIONS_BUDGET_SECONDS
+    return await asyncio.gather(
+        _within_budget(
+            get_response(message, conversation_history, contact),
+            response_budget,
+            RESPONSE_FALLBACK,
+        ),
+        _collect_within_budget(
+            stream_suggestions(message, conversation_history or "", goal, contact),
+            suggestions_budget,
+        ),
+    )
+
+async def stream_practice(
+    message: str,
+    conversation_history: Optional[str] = None,
+    goal: str = "",
+    contact: Optional[str] = None,
+) -> AsyncIterator[Tuple[str, object]]:
+    """Interleave reply tokens and suggestions as ("token", str) / ("suggestion", dict) events"""
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump(kind: str, stream: AsyncIterator):
+        try:
+            async for item in stream:
+                await queue.put((kind, item))
+        except Exception as e:
+            await queue.put(("error", f"{kind}: {e}"))
+        finally:
+            await queue.put(done)
+
+    tasks = [
+        asyncio.create_task(pump("token", stream_response(message, conversation_history, contact))),
+        asyncio.create_task(pump("suggestion", stream_suggestions(message, conversation_history or "", goal, contact))),
+    ]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await queue.get()
+            if event is done:
+                remaining -= 1
+            else:
+                yield event
+    finally:
+        for task in tasks:
+            task.cancel()
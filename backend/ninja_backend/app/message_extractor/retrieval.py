@@ -0,0 +1,158 @@
+"""BM25 index for picking the most relevant few-shot examples.
+
+The index is built once per exported corpus and saved next to the messages
+file, tagged with the corpus size and mtime, so it is only rebuilt when the
+corpus changes.
+"""
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def corpus_fingerprint(path: str) -> dict:
+    """Size and mtime of a corpus file, used to detect when an index is stale"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+class ExampleIndex:
+    """Okapi BM25 over example documents.
+
+    Postings are stored per term as contiguous slices of ``doc_ids`` and
+    ``weights``, where each weight already includes the term-frequency
+    saturation and length normalisation. A lookup is then one vectorised
+    scatter-add per query term plus a partial sort.
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, doc_ids: np.ndarray,
+                 weights: np.ndarray, idf: np.ndarray, num_docs: int,
+                 fingerprint: Optional[dict] = None):
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.idf = idf
+        self.num_docs = num_docs
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, documents: List[str], fingerprint: Optional[dict] = None,
+              k1: float = 1.5, b: float = 0.75) -> "ExampleIndex":
+        postings = {}
+        doc_lengths = []
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        num_docs = len(documents)
+        avg_length = (sum(doc_lengths) / num_docs) if num_docs else 0.0
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        doc_ids, weights, idf = [], [], []
+        for i, term in enumerate(terms):
+            docs = postings[term]
+            offsets[i + 1] = offsets[i] + len(docs)
+            idf.append(math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5)))
+            for doc_id, tf in docs:
+                norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                doc_ids.append(doc_id)
+                weights.append(tf * (k1 + 1) / (tf + norm))
+        return cls(
+            terms,
+            offsets,
+            np.array(doc_ids, dtype=np.int32),
+            np.array(weights, dtype=np.float32),
+            np.array(idf, dtype=np.float32),
+            num_docs,
+            fingerprint,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the index"""
+        arrays = self.offsets.nbytes + self.doc_ids.nbytes + self.weights.nbytes + self.idf.nbytes
+        terms = sys.getsizeof(self.term_ids) + sum(sys.getsizeof(term) for term in self.term_ids)
+        return arrays + terms
+
+    def search(self, query: str, k: int) -> List[int]:
+        """Ids of the k highest scoring documents for query, best first"""
+        scores = None
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            if scores is None:
+                scores = np.zeros(self.num_docs, dtype=np.float32)
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # A term appears at most once per document, so plain fancy-index add is safe
+            scores[self.doc_ids[start:end]] += self.idf[term_id] * self.weights[start:end]
+        if scores is None:
+            return []
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        # Highest score first, later (more recent) examples win ties
+        order = np.lexsort((-matched, -scores[matched]))
+        return [int(doc_id) for doc_id in matched[order]]
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            meta=np.array(json.dumps({"fingerprint": self.fingerprint, "num_docs": self.num_docs})),
+            terms=np.array(sorted(self.term_ids, key=self.term_ids.get)),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+            idf=self.idf,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ExampleIndex":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(
+                data["terms"].tolist(),
+                data["offsets"],
+                data["doc_ids"],
+                data["weights"],
+                data["idf"],
+                meta["num_docs"],
+                meta["fingerprint"],
+            )
+
+def index_path(messages_file: str) -> str:
+    """Where the index for a messages file lives (outside the messages_*.json glob)"""
+    return messages_file + ".bm25.npz"
+
+def load_or_build_index(messages_file: str, documents: List[str]) -> ExampleIndex:
+    """Load the saved index for messages_file, rebuilding it if the corpus changed"""
+    fingerprint = corpus_fingerprint(messages_file)
+    path = index_path(messages_file)
+    try:
+        index = ExampleIndex.load(path)
+        if index.fingerprint == fingerprint and index.num_docs == len(documents):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+
+    print(f"Building example index for {messages_file}")
+    index = ExampleIndex.build(documents, fingerprint)
+    try:
+        index.save(path)
+    except OSError as e:
+        print(f"WARNING: Could not save example index: {e}")
+    return index
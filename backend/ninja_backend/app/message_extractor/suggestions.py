@@ -0,0 +1,185 @@
+"""Structured suggestions: the JSON schema, validation and parse metrics.
+
+Suggestions are requested as JSON constrained by ``SUGGESTIONS_SCHEMA``
+(passed to Ollama as ``format``) and validated into ``Feedback``. The parser
+reads suggestion objects out of the text as it streams, so surrounding prose,
+code fences or a truncated tail only cost the objects they break. Callers
+re-ask the model when fewer than the requested number survive, up to
+``SUGGESTION_RETRIES`` times.
+"""
+import json
+import os
+from typing import List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+# Extra generations allowed when a reply yields too few valid suggestions
+SUGGESTION_RETRIES = int(os.getenv("SUGGESTION_RETRIES", "1"))
+# Suggestions scored below this are dropped
+MIN_SCORE = 6
+
+class Feedback(BaseModel):
+    text: str
+    score: int
+    explanation: str
+
+class Suggestions(BaseModel):
+    suggestions: List[Feedback]
+
+SUGGESTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "suggestions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "score": {"type": "integer", "minimum": 6, "maximum": 10},
+                    "explanation": {"type": "string"},
+                },
+                "required": ["text", "score", "explanation"],
+            },
+            "minItems": 3,
+            "maxItems": 3,
+        }
+    },
+    "required": ["suggestions"],
+}
+
+class SuggestionStats:
+    """Counters for how often generated suggestions fail to parse"""
+
+    def __init__(self):
+        self.requests = 0
+        self.generations = 0
+        self.failed_generations = 0
+        self.invalid_json = 0
+        self.invalid_items = 0
+        self.low_score = 0
+        self.retries = 0
+        self.short_requests = 0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "generations": self.generations,
+            "failed_generations": self.failed_generations,
+            "invalid_json": self.invalid_json,
+            "invalid_items": self.invalid_items,
+            "low_score": self.low_score,
+            "retries": self.retries,
+            "short_requests": self.short_requests,
+            "generation_failure_rate": self.failed_generations / self.generations if self.generations else 0.0,
+            "invalid_json_rate": self.invalid_json / self.generations if self.generations else 0.0,
+            "short_request_rate": self.short_requests / self.requests if self.requests else 0.0,
+        }
+
+_stats = SuggestionStats()
+
+def get_suggestion_stats() -> SuggestionStats:
+    return _stats
+
+class SuggestionParser:
+    """Incremental parser for streamed JSON suggestions.
+
+    Text is fed as it arrives; each suggestion is returned as soon as its
+    object closes and validates. Only innermost objects are considered, so a
+    bare array, a wrapper object or prose around the JSON all parse the same.
+    Duplicate texts are skipped, so a retry's output can be fed after
+    ``restart()`` to fill in what the first generation missed.
+    """
+
+    def __init__(self, limit: int = 3, stats: Optional[SuggestionStats] = None):
+        self.limit = limit
+        self.stats = stats or _stats
+        self.count = 0
+        self.seen = set()
+        self.error = ""
+        self.restart()
+
+    def restart(self):
+        """Start reading a new generation, keeping the suggestions found so far"""
+        self.text = ""
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Add streamed text and return any suggestions it completed"""
+        self.text += chunk
+        suggestions = []
+        for i in range(self.pos, len(self.text)):
+            char = self.text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.stack:
+                    self.stack[-1][1] = True
+                self.stack.append([i, False])
+            elif char == "}" and self.stack:
+                start, has_children = self.stack.pop()
+                if not has_children:
+                    suggestions.extend(self._parse(self.text[start : i + 1]))
+        self.pos = len(self.text)
+        return suggestions
+
+    def close(self) -> List[dict]:
+        """Finish the current generation and record how well it parsed"""
+        self.stats.generations += 1
+        # A stream stopped once it had enough suggestions isn't complete JSON
+        if self.count >= self.limit:
+            return []
+        self.stats.failed_generations += 1
+        try:
+            Suggestions.model_validate_json(self.text)
+            self.error = f"only {self.count} of {self.limit} suggestions were usable"
+        except ValidationError as e:
+            self.stats.invalid_json += 1
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            self.error = f"{error['msg']} at {location}" if location else error["msg"]
+        return []
+
+    def _parse(self, block: str) -> List[dict]:
+        if self.count >= self.limit:
+            return []
+        try:
+            feedback = Feedback.model_validate(json.loads(block))
+        except (ValueError, ValidationError) as e:
+            self.stats.invalid_items += 1
+            self.error = f"invalid suggestion: {e}"
+            return []
+        if feedback.score < MIN_SCORE:
+            self.stats.low_score += 1
+            return []
+        text = feedback.text.strip()
+        if not text or text in self.seen:
+            return []
+        self.seen.add(text)
+        self.count += 1
+        return [feedback.model_dump()]
+
+def parse_suggestions(text: str, limit: int = 3) -> List[dict]:
+    """Parse a complete suggestions completion"""
+    parser = SuggestionParser(limit=limit)
+    return parser.feed(text) + parser.close()
+
+def repair_messages(context_messages: List[dict], parser: SuggestionParser) -> List[dict]:
+    """Ask again after a reply that didn't yield enough suggestions"""
+    return context_messages + [
+        {"role": "assistant", "content": parser.text},
+        {
+            "role": "user",
+            "content": f"That reply couldn't be used ({parser.error}). "
+            f"Reply with only the JSON object, with exactly {parser.limit} suggestions.",
+        },
+    ]
@@ -0,0 +1 @@
+"""Fine-tuning jobs run in worker processes, outside the API event loop."""
@@ -0,0 +1,333 @@
+"""Training job manager.
+
+Each job runs its target function in a spawned worker process, so a
+fine-tune never shares the API's event loop or GIL. At most
+TRAINING_MAX_WORKERS jobs run at once; the rest wait in a queue. Workers
+report progress over a multiprocessing queue, which a listener thread in the
+API process folds into per-job status. A running job is cancelled by setting
+its cancel event, which the worker checks between training steps, and is
+terminated if it doesn't stop within TRAINING_CANCEL_GRACE_SECONDS.
+
+A plain ProcessPoolExecutor is not used because it cannot stop a task that
+has already started.
+"""
+import asyncio
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from typing import AsyncIterator, List, Optional
+
+TRAINING_MAX_WORKERS = int(os.getenv("TRAINING_MAX_WORKERS", "1"))
+TRAINING_CANCEL_GRACE_SECONDS = float(os.getenv("TRAINING_CANCEL_GRACE_SECONDS", "10"))
+# "module:function" run in the worker as target(messages_file, reporter)
+TRAINING_TARGET = os.getenv("TRAINING_TARGET", "app.training.worker:run_fine_tune")
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+class TrainingCancelled(Exception):
+    """Raised inside a worker to abandon a job that was cancelled"""
+
+class ProgressReporter:
+    """Handed to the target function in the worker to report progress"""
+
+    def __init__(self, job_id: str, events, cancel_event):
+        self.job_id = job_id
+        self.events = events
+        self.cancel_event = cancel_event
+
+    def update(self, **fields):
+        self.events.put((self.job_id, fields))
+
+    def phase(self, message: str, progress: Optional[int] = None):
+        """Report a coarse stage such as loading the model"""
+        fields = {"message": message}
+        if progress is not None:
+            fields["progress"] = progress
+        self.update(**fields)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TrainingCancelled()
+
+def _run_worker(target: str, job_id: str, messages_file: str, events, cancel_event):
+    """Worker process entry point"""
+    reporter = ProgressReporter(job_id, events, cancel_event)
+    try:
+        module_name, function_name = target.split(":")
+        function = getattr(importlib.import_module(module_name), function_name)
+        result = function(messages_file, reporter)
+        reporter.update(status="completed", progress=100, message="Training complete!", result=result)
+    except TrainingCancelled:
+        reporter.update(status="cancelled", message="Training cancelled")
+    except BaseException as e:
+        traceback.print_exc()
+        reporter.update(status="failed", message="Training failed", error=str(e) or type(e).__name__)
+
+class _Watcher:
+    """Latest snapshot of a job for one async consumer.
+
+    Updates arrive from the listener thread. A slow consumer skips the
+    intermediate snapshots and only ever sees the newest one.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.changed = asyncio.Event()
+        self.latest = None
+
+    def push(self, snapshot: dict):
+        try:
+            self.loop.call_soon_threadsafe(self._set, snapshot)
+        except RuntimeError:
+            # The consumer's loop has closed
+            pass
+
+    def _set(self, snapshot: dict):
+        self.latest = snapshot
+        self.changed.set()
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.changed.clear()
+        return self.latest
+
+class TrainingJobManager:
+    """Queues, runs, tracks and cancels training jobs"""
+
+    def __init__(self, max_workers: int = TRAINING_MAX_WORKERS, target: str = TRAINING_TARGET):
+        self.max_workers = max_workers
+        self.target = target
+        self.context = multiprocessing.get_context("spawn")
+        self.events = None
+        self.jobs = {}  # job id -> status dict
+        self.pending = deque()
+        self.running = {}  # job id -> (process, cancel event)
+        self.exited = {}  # job id -> when its worker was first seen dead
+        self.watchers = {}  # job id -> watchers of that job
+        self.lock = threading.RLock()
+        self.listener = None
+        self.stopping = False
+
+    def start(self, messages_file: str, target: Optional[str] = None) -> dict:
+        """Queue a fine-tune of messages_file and return its status"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "messages_file": messages_file,
+            "target": target or self.target,
+            "message": "Waiting for a training worker...",
+            "progress": 0,
+            "step": 0,
+            "max_steps": None,
+            "epoch": None,
+            "loss": None,
+            "samples_per_second": None,
+            "eta_seconds": None,
+            "error": None,
+            "result": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            self._publish(job_id)
+            self.pending.append(job_id)
+            self._ensure_listener()
+            self._dispatch()
+            return dict(job)
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued or running job; returns its status, or None if unknown"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued":
+                self.pending.remove(job_id)
+                self._finish(job_id, {"status": "cancelled", "message": "Training cancelled"})
+            elif job["status"] == "running":
+                process, cancel_event = self.running[job_id]
+                cancel_event.set()
+                job["message"] = "Cancelling..."
+                self._publish(job_id)
+                timer = threading.Timer(TRAINING_CANCEL_GRACE_SECONDS, self._terminate, (job_id, process))
+                timer.daemon = True
+                timer.start()
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self) -> List[dict]:
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def latest(self) -> Optional[dict]:
+        with self.lock:
+            if not self.jobs:
+                return None
+            return dict(next(reversed(self.jobs.values())))
+
+    async def watch(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """Yield a job's status now and whenever it changes, until it finishes.
+
+        Yields None after ``heartbeat`` seconds without a change, so callers
+        can keep a connection alive. Yields nothing for an unknown job.
+        """
+        watcher = _Watcher(asyncio.get_running_loop())
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            self.watchers.setdefault(job_id, []).append(watcher)
+            snapshot = dict(job)
+        try:
+            while True:
+                yield snapshot
+                if snapshot is not None and snapshot["status"] in TERMINAL_STATUSES:
+                    return
+                snapshot = await watcher.next(heartbeat)
+        finally:
+            with self.lock:
+                watchers = self.watchers.get(job_id, [])
+                if watcher in watchers:
+                    watchers.remove(watcher)
+                if not watchers:
+                    self.watchers.pop(job_id, None)
+
+    def shutdown(self):
+        """Stop every job and the listener thread"""
+        with self.lock:
+            self.stopping = True
+            for job_id in list(self.pending):
+                self.cancel(job_id)
+            running = list(self.running.items())
+        for job_id, (process, cancel_event) in running:
+            cancel_event.set()
+        for job_id, (process, _) in running:
+            process.join(TRAINING_CANCEL_GRACE_SECONDS)
+            self._terminate(job_id, process)
+        if self.listener is not None:
+            self.listener.join(timeout=5)
+
+    def _ensure_listener(self):
+        if self.listener is None:
+            self.events = self.context.Queue()
+            self.listener = threading.Thread(target=self._listen, name="training-jobs", daemon=True)
+            self.listener.start()
+
+    def _dispatch(self):
+        """Start queued jobs while workers are free (lock held)"""
+        while self.pending and len(self.running) < self.max_workers and not self.stopping:
+            job_id = self.pending.popleft()
+            job = self.jobs[job_id]
+            cancel_event = self.context.Event()
+            process = self.context.Process(
+                target=_run_worker,
+                args=(job["target"], job_id, job["messages_file"], self.events, cancel_event),
+                name=f"training-{job_id}",
+                daemon=True,
+            )
+            process.start()
+            self.running[job_id] = (process, cancel_event)
+            job.update(status="running", message="Starting training...", started_at=time.time())
+            self._publish(job_id)
+
+    def _listen(self):
+        """Apply worker events to job status and notice workers that died"""
+        while True:
+            try:
+                job_id, fields = self.events.get(timeout=1)
+            except queue.Empty:
+                job_id, fields = None, None
+            with self.lock:
+                if job_id is not None:
+                    if fields.get("status") in TERMINAL_STATUSES:
+                        self._finish(job_id, fields)
+                    elif job_id in self.jobs and self.jobs[job_id]["status"] == "running":
+                        job = self.jobs[job_id]
+                        before = dict(job)
+                        job.update(fields)
+                        # Only push real changes, e.g. not a repeated phase message
+                        if job != before:
+                            self._publish(job_id)
+                # A worker that exits normally reports first, so give its last
+                # events a moment to arrive before treating the exit as a crash
+                now = time.monotonic()
+                for running_id, (process, _) in list(self.running.items()):
+                    if process.is_alive():
+                        continue
+                    exited = self.exited.setdefault(running_id, now)
+                    if now - exited > 2:
+                        self._finish(running_id, {
+                            "status": "failed",
+                            "message": "Training failed",
+                            "error": f"Worker exited with code {process.exitcode}",
+                        })
+                if self.stopping and not self.running:
+                    return
+
+    def _terminate(self, job_id: str, process):
+        """Kill a worker that didn't stop after being cancelled"""
+        if process.is_alive():
+            process.terminate()
+            process.join(5)
+        with self.lock:
+            if job_id in self.running:
+                self._finish(job_id, {"status": "cancelled", "message": "Training cancelled"})
+
+    def _finish(self, job_id: str, fields: dict):
+        """Record a job's final status and hand its worker slot on (lock held)"""
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return
+        job.update(fields)
+        job["finished_at"] = time.time()
+        job["eta_seconds"] = None
+        self.exited.pop(job_id, None)
+        entry = self.running.pop(job_id, None)
+        if entry is not None:
+            entry[0].join(timeout=0)
+        self._publish(job_id)
+        self._dispatch()
+
+    def _publish(self, job_id: str):
+        """Send a job's current status to its watchers (lock held)"""
+        watchers = self.watchers.get(job_id)
+        if watchers:
+            snapshot = dict(self.jobs[job_id])
+            for watcher in watchers:
+                watcher.push(snapshot)
+
+_manager: Optional[TrainingJobManager] = None
+
+def get_manager() -> TrainingJobManager:
+    """Return the shared job manager, creating it on first use"""
+    global _manager
+    if _manager is None:
+        _manager = TrainingJobManager()
+    return _manager
+
+def shutdown_manager():
+    """Stop running jobs (called on application shutdown)"""
+    global _manager
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
@@ -0,0 +1,103 @@
+"""The MeGPT LoRA fine-tune, as run inside a training worker process.
+
+Only imported in the worker, so the API process never loads torch.
+"""
+import os
+import sys
+import time
+
+from transformers import TrainerCallback
+
+from app.message_extractor.fine_tune import train_model
+from app.training.jobs import ProgressReporter
+
+# MeGPT lives at the repository root, next to backend/
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+TRAINING_BASE_MODEL = os.getenv("TRAINING_BASE_MODEL", "facebook/opt-1.3b")
+TRAINING_OUTPUT_DIR = os.path.expanduser(os.getenv("TRAINING_OUTPUT_DIR", "~/Documents/ninja/models"))
+# "auto" trains on a GPU when there is one; "cpu" forces CPU training
+TRAINING_DEVICE = os.getenv("TRAINING_DEVICE", "auto")
+# fp32 or bf16 (CPU autocast)
+TRAINING_DTYPE = os.getenv("TRAINING_DTYPE", "fp32")
+# Torch intra-op threads on CPU; 0 uses every core
+TRAINING_NUM_THREADS = int(os.getenv("TRAINING_NUM_THREADS", "0"))
+TRAINING_BATCH_SIZE = int(os.getenv("TRAINING_BATCH_SIZE", "8"))
+TRAINING_GRAD_ACCUM = int(os.getenv("TRAINING_GRAD_ACCUM", "1"))
+
+# Share of the progress bar given to each stage around the training steps
+TRAINING_START_PROGRESS = 10
+TRAINING_END_PROGRESS = 95
+
+class ProgressCallback(TrainerCallback):
+    """Reports Trainer steps to the job and stops training once it is cancelled"""
+
+    def __init__(self, reporter: ProgressReporter):
+        self.reporter = reporter
+        self.started = None
+        self.loss = None
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.started = time.perf_counter()
+        self.reporter.update(
+            message="Training model...",
+            progress=TRAINING_START_PROGRESS,
+            step=0,
+            max_steps=state.max_steps,
+        )
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if logs and "loss" in logs:
+            self.loss = logs["loss"]
+
+    def on_step_end(self, args, state, control, **kwargs):
+        # Raising here leaves trainer.train() before anything is saved
+        self.reporter.check_cancelled()
+
+        elapsed = time.perf_counter() - self.started
+        step, max_steps = state.global_step, state.max_steps
+        samples = step * args.train_batch_size * args.gradient_accumulation_steps * args.world_size
+        span = TRAINING_END_PROGRESS - TRAINING_START_PROGRESS
+        self.reporter.update(
+            message=f"Training model... step {step}/{max_steps}",
+            progress=TRAINING_START_PROGRESS + int(span * step / max_steps) if max_steps else TRAINING_START_PROGRESS,
+            step=step,
+            max_steps=max_steps,
+            epoch=state.epoch,
+            loss=self.loss,
+            samples_per_second=samples / elapsed if elapsed else None,
+            eta_seconds=elapsed / step * (max_steps - step) if step else None,
+        )
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self.reporter.phase("Saving model...", TRAINING_END_PROGRESS)
+
+def output_dir_for(messages_file: str) -> str:
+    """Where the adapter trained on messages_file is saved"""
+    name = os.path.splitext(os.path.basename(messages_file))[0]
+    return os.path.join(TRAINING_OUTPUT_DIR, name)
+
+def run_fine_tune(messages_file: str, reporter: ProgressReporter) -> dict:
+    """Fine-tune the base model on an exported messages file"""
+    reporter.phase("Preparing data...", 0)
+    training_file = train_model(messages_file)
+    reporter.check_cancelled()
+
+    reporter.phase("Loading model...", 5)
+    if REPO_ROOT not in sys.path:
+        sys.path.append(REPO_ROOT)
+    from MeGPT.fine_tune import fine_tune
+
+    output_dir = output_dir_for(messages_file)
+    fine_tune(
+        training_file,
+        model_name=TRAINING_BASE_MODEL,
+        output_dir=output_dir,
+        callbacks=[ProgressCallback(reporter)],
+        device=TRAINING_DEVICE,
+        dtype=TRAINING_DTYPE,
+        num_threads=TRAINING_NUM_THREADS or None,
+        batch_size=TRAINING_BATCH_SIZE,
+        gradient_accumulation_steps=TRAINING_GRAD_ACCUM,
+    )
+    return {"output_dir": output_dir}
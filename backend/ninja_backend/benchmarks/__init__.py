@@ -0,0 +1,15 @@
+"""Benchmarks for the Ninja backend hot paths.
+
+Run from ``backend/ninja_backend`` with ``python -m benchmarks.<name>``.
+``python -m benchmarks.suite`` times the extraction and context hot paths on
+a synthetic chat.db and writes the results as JSON.
+``python -m benchmarks.loadtest`` load tests the chat endpoints over HTTP
+against ``benchmarks.mock_ollama``.
+"""
+import os
+import sys
+
+# Add MeGPT to path
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
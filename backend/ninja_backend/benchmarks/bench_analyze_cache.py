@@ -0,0 +1,65 @@
+"""Coalescing and caching of repeated ``/analyze`` calls.
+
+Fires a burst of identical draft analyses (as the chat UI does while the
+user edits), then repeats the draft with whitespace differences. The burst
+should cost one generation and the repeats should be answered from the cache
+without reaching the model.
+
+    python -m benchmarks.bench_analyze_cache --requests 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from benchmarks.bench_concurrency import setup_home
+
+async def run(n: int, latency: float) -> bool:
+    import httpx
+    from app.llm import client as llm_client
+    from app.main import app
+    from benchmarks.fakes import FakeOllamaClient
+
+    fake = FakeOllamaClient(latency=latency, content="✓ Clear and friendly\n→ Mention the plan")
+    llm_client._client = fake
+    payload = {"message": "want to grab dinner?", "context": {"goal": "make plans"}}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        start = time.perf_counter()
+        burst = await asyncio.gather(*(http.post("/api/v1/messages/analyze", json=payload) for _ in range(n)))
+        burst_wall = time.perf_counter() - start
+        burst_calls = fake.calls
+        same = len({r.json()["feedback"] for r in burst}) == 1
+
+        latencies = []
+        for i in range(n):
+            repeat = dict(payload, message=("  want to grab   dinner? " if i % 2 else payload["message"]))
+            start = time.perf_counter()
+            await http.post("/api/v1/messages/analyze", json=repeat)
+            latencies.append((time.perf_counter() - start) * 1000)
+        stats = (await http.get("/api/v1/messages/analyze/stats")).json()
+
+    repeat_calls = fake.calls - burst_calls
+    print(f"burst   n={n:3d} llm_calls={burst_calls} wall={burst_wall:6.3f}s identical={same}")
+    print(f"repeat  n={n:3d} llm_calls={repeat_calls} p50={statistics.median(latencies):6.2f}ms max={max(latencies):6.2f}ms")
+    print(f"stats   {stats}")
+    ok = (
+        burst_calls == 1 and same and repeat_calls == 0
+        and stats["misses"] == 1 and stats["coalesced"] == n - 1 and stats["hits"] == n
+    )
+    print("OK" if ok else "FAIL")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    setup_home()
+    sys.exit(0 if asyncio.run(run(args.requests, args.latency)) else 1)
+
+if __name__ == "__main__":
+    main()
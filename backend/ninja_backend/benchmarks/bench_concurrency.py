@@ -0,0 +1,89 @@
+"""Concurrency check for the async generation layer.
+
+Fires N parallel requests at ``/practice``, ``/real`` and ``/analyze`` against
+a fake Ollama client with a fixed latency. With a non-blocking LLM path the
+batch finishes in about max(latency), not sum(latency), and ``/healthz`` keeps
+answering while generations are in flight.
+
+    python -m benchmarks.bench_concurrency --requests 16 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+def setup_home():
+    """Point HOME at a temp dir holding a small exported messages file"""
+    home = tempfile.mkdtemp(prefix="ninja-bench-")
+    os.environ["HOME"] = home
+    messages_dir = os.path.join(home, "Documents", "ninja", "messages_data")
+    os.makedirs(messages_dir, exist_ok=True)
+    with open(os.path.join(messages_dir, "messages_+15550000000.json"), "w") as f:
+        json.dump([{"text": f"person: hey {i}\nMeGPT: yo {i}", "label": 0} for i in range(20)], f)
+    return home
+
+async def run(n: int, latency: float) -> bool:
+    import httpx
+    from app.llm import client as llm_client
+    from app.main import app
+    from benchmarks.fakes import FakeOllamaClient
+
+    suggestions = [{"text": f"sounds good {i}", "score": 8, "explanation": "casual"} for i in range(3)]
+    fake = FakeOllamaClient(latency=latency, content=json.dumps({"suggestions": suggestions}))
+    llm_client._client = fake
+
+    payloads = {
+        "/api/v1/messages/practice": {"message": "hey what's up", "context": {"goal": "make plans"}},
+        "/api/v1/messages/real": {"message": "hey", "context": {}, "messages": []},
+        "/api/v1/messages/analyze": {"message": "want to grab dinner?", "context": {"goal": "make plans"}},
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    ok = True
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        for path, payload in payloads.items():
+            calls_before = fake.calls
+
+            async def probe_health():
+                await asyncio.sleep(latency / 4)
+                start = time.perf_counter()
+                await http.get("/healthz")
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                # Distinct messages so cached/coalesced analyses don't hide the fan-out
+                *(http.post(path, json=dict(payload, message=f"{payload['message']} {i}")) for i in range(n)),
+                probe_health(),
+            )
+            elapsed = time.perf_counter() - start
+            health_latency = results[-1]
+            statuses = {r.status_code for r in results[:-1]}
+
+            llm_calls = fake.calls - calls_before
+            serial = llm_calls * latency
+            per_request = llm_calls / n * latency
+            passed = elapsed < per_request + latency and statuses == {200}
+            ok = ok and passed
+            print(
+                f"{path:32} n={n:3d} llm_calls={llm_calls:3d} wall={elapsed:6.3f}s "
+                f"serial={serial:6.2f}s healthz={health_latency * 1000:6.1f}ms "
+                f"statuses={sorted(statuses)} {'OK' if passed else 'FAIL'}"
+            )
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    setup_home()
+    ok = asyncio.run(run(args.requests, args.latency))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
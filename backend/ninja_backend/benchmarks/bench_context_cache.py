@@ -0,0 +1,115 @@
+"""Cold vs hot context lookups across several contacts.
+
+Exports a messages file per contact, then serves ``load_context`` for all of
+them in rotation. After the first (cold) load per contact every lookup should
+be a cache hit with no directory scan; rewriting a contact's file, or calling
+the export hook, must make the next lookup reload it. The cache must stay
+within its byte bound, and threads missing together must share one load.
+
+    python -m benchmarks.bench_context_cache --contacts 4 --examples 5000 --lookups 2000
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_concurrency import setup_home
+from benchmarks.bench_retrieval import write_messages_file
+from benchmarks.chatdb import phone_number, random_text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=4)
+    parser.add_argument("--examples", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_home()
+    from app.message_extractor import context_cache
+    from app.message_extractor.generate import load_context
+
+    contacts = [phone_number(i) for i in range(args.contacts)]
+    for i, contact in enumerate(contacts):
+        write_messages_file(context_cache.contact_messages_file(contact), args.examples, seed=i)
+
+    # Count directory scans so a hot lookup that globs shows up
+    scans = 0
+    real_glob = glob.glob
+
+    def counting_glob(*a, **kw):
+        nonlocal scans
+        scans += 1
+        return real_glob(*a, **kw)
+
+    context_cache.glob.glob = counting_glob
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for contact in contacts:
+        load_context("hey", contact=contact)
+    load_context("hey")
+    cold = (time.perf_counter() - start) / (len(contacts) + 1)
+    scans_after_cold = scans
+
+    latencies = []
+    for i in range(args.lookups):
+        contact = contacts[i % len(contacts)] if i % 5 else None
+        query = random_text(rng)
+        start = time.perf_counter()
+        load_context(query, contact=contact)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    stats = context_cache.get_cache().stats()
+    print(
+        f"contacts={len(contacts)} examples={args.examples} cold={cold * 1000:.1f}ms "
+        f"hot p50={statistics.median(latencies):.2f}ms p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms"
+    )
+    print(f"cache {stats}")
+    ok = stats["misses"] == len(contacts) and scans == scans_after_cold == 1 and stats["bytes"] <= stats["max_bytes"]
+
+    # A rewritten file is reloaded on the next lookup
+    target = context_cache.contact_messages_file(contacts[0])
+    write_messages_file(target, args.examples + 1, seed=99)
+    os.utime(target, ns=(time.time_ns(), time.time_ns() + 1))
+    load_context("hey", contact=contacts[0])
+    reloaded = context_cache.get_cache().stats()["misses"] == len(contacts) + 1
+    # The export hook drops the entry and makes the file the default context
+    context_cache.mark_exported(context_cache.contact_messages_file(contacts[1]))
+    load_context("hey")
+    hooked = context_cache.get_cache().stats()["misses"] == len(contacts) + 2
+    print(f"reload on change: {'OK' if reloaded else 'FAIL'}  export hook: {'OK' if hooked else 'FAIL'}")
+
+    # A tight byte bound keeps only the most recently used contacts
+    largest = max(entry[2] for entry in context_cache.get_cache().entries.values())
+    bounded = context_cache.ContextCache(max_bytes=largest)
+    from app.message_extractor.generate import load_examples
+    for contact in contacts:
+        bounded.get(context_cache.contact_messages_file(contact), load_examples)
+    stats = bounded.stats()
+    evicted = stats["entries"] == 1 and stats["evictions"] == len(contacts) - 1 and stats["bytes"] <= stats["max_bytes"]
+    print(f"byte-bounded eviction: {'OK' if evicted else 'FAIL'} {stats}")
+
+    # A file too large for the bound is served but not cached
+    tiny = context_cache.ContextCache(max_bytes=1)
+    examples, _ = tiny.get(context_cache.contact_messages_file(contacts[0]), load_examples)
+    stats = tiny.stats()
+    uncached = bool(examples) and stats["entries"] == 0 and stats["bytes"] == 0 and stats["oversized"] == 1
+    print(f"oversized entry skipped: {'OK' if uncached else 'FAIL'} {stats}")
+
+    # Concurrent misses on one file share a single load
+    shared = context_cache.ContextCache()
+    path = context_cache.contact_messages_file(contacts[2 % len(contacts)])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: shared.get(path, load_examples), range(8)))
+    stats = shared.stats()
+    coalesced = stats["misses"] == 1 and all(r is results[0] for r in results)
+    print(f"concurrent misses coalesced: {'OK' if coalesced else 'FAIL'} {stats}")
+
+    sys.exit(0 if ok and reloaded and hooked and evicted and uncached and coalesced else 1)
+
+if __name__ == "__main__":
+    main()
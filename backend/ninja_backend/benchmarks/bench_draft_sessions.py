@@ -0,0 +1,96 @@
+"""Model time spent on superseded drafts with many concurrent typists.
+
+Each simulated typist sends ``/analyze`` for every keystroke of a growing
+draft, and only the analysis of the final draft is ever shown. Without a
+session id every draft is generated to completion and queues behind the
+others for the model's limited slots. With a session id, each new draft
+cancels the previous one, and with a debounce most drafts never reach the
+model at all.
+
+    python -m benchmarks.bench_draft_sessions --typists 8 --keystrokes 10 --interval 0.1
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import time
+
+from benchmarks.bench_concurrency import setup_home
+
+def feedback_for(messages) -> str:
+    """Fake analysis that names the draft it was generated for"""
+    draft = re.search(r"^Message: (.*)$", messages[0]["content"], re.M).group(1)
+    return f"✓ Analyzed {draft}\n→ Keep it short"
+
+async def type_draft(http, typist: int, keystrokes: int, interval: float, session: bool):
+    """Send one /analyze per keystroke; return (seconds from last keystroke to feedback, correct)"""
+    words = [f"w{typist}x{i}" for i in range(keystrokes)]
+    pending = []
+    for i in range(keystrokes):
+        payload = {"message": " ".join(words[: i + 1]), "context": {"goal": "make plans"}}
+        if session:
+            payload["session_id"] = f"typist-{typist}"
+        pending.append(asyncio.create_task(http.post("/api/v1/messages/analyze", json=payload)))
+        if i < keystrokes - 1:
+            await asyncio.sleep(interval)
+    last_keystroke = time.perf_counter()
+    final = await pending[-1]
+    waited = time.perf_counter() - last_keystroke
+    await asyncio.gather(*pending[:-1])
+    return waited, " ".join(words) in final.json()["feedback"]
+
+async def run(args) -> bool:
+    import httpx
+    from app.llm import client as llm_client
+    from app.llm.scheduler import SessionScheduler
+    from app.main import app
+    from app.message_extractor import generate
+    from benchmarks.fakes import FakeOllamaClient
+
+    modes = [("no session", False, 0.0), ("session", True, 0.0), ("session+debounce", True, args.debounce)]
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    for name, session, debounce in modes:
+        fake = FakeOllamaClient(latency=args.latency, content=feedback_for, parallel=args.parallel)
+        llm_client._client = fake
+        generate.get_analysis_cache().clear()
+        generate._analysis_scheduler = SessionScheduler(debounce)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as http:
+            start = time.perf_counter()
+            outcomes = await asyncio.gather(
+                *(type_draft(http, t, args.keystrokes, args.interval, session) for t in range(args.typists))
+            )
+            wall = time.perf_counter() - start
+        waits = sorted(w for w, _ in outcomes)
+        correct = all(c for _, c in outcomes)
+        results[name] = (fake.busy_seconds, statistics.median(waits), correct)
+        print(
+            f"{name:17s} generations started={fake.calls:3d} completed={fake.completed:3d} aborted={fake.aborted:3d} "
+            f"model busy={fake.busy_seconds:6.2f}s final feedback p50={statistics.median(waits):5.2f}s "
+            f"max={waits[-1]:5.2f}s wall={wall:5.2f}s correct={correct}"
+        )
+
+    baseline = results["no session"][0]
+    ok = all(r[2] for r in results.values()) and all(
+        results[name][0] < baseline / 2 for name in ("session", "session+debounce")
+    )
+    print("OK" if ok else "FAIL")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--typists", type=int, default=8)
+    parser.add_argument("--keystrokes", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between keystrokes")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per generation")
+    parser.add_argument("--parallel", type=int, default=4, help="generations the model runs at once")
+    parser.add_argument("--debounce", type=float, default=0.2)
+    args = parser.parse_args()
+
+    setup_home()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
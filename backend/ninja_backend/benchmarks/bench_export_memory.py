@@ -0,0 +1,94 @@
+"""Peak memory of the export pipeline as history grows.
+
+Each export runs in a fresh subprocess and reports its peak RSS. The
+streaming pipeline (batched fetch, pair generator, JSON lines corpus and a
+chunked tar.gz) stays flat, while the previous approach of fetchall, two
+in-memory result lists, a temp JSON file and reading the archive back
+grows with the number of messages.
+
+    python -m benchmarks.bench_export_memory --sizes 20000 100000 400000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+from benchmarks.chatdb import create_chat_db
+
+def peak_rss_mb() -> float:
+    # VmHWM is per address space; ru_maxrss on Linux carries over the
+    # parent's peak across fork/exec, so prefer /proc when it exists
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def legacy_export(db_path: str, handle: str, output_file: str):
+    """The pre-streaming pipeline: everything materialised in memory"""
+    import sqlite3
+    from MeGPT.extract_messages import PAIRS_QUERY
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        messages_json = os.path.join(temp_dir, "messages.json")
+        conn = sqlite3.connect(db_path)
+        results = conn.execute(PAIRS_QUERY, (handle,)).fetchall()
+        conn.close()
+        results = [tuple(map(lambda x: x.replace("\n", " ") if x else "", row)) for row in results]
+        with open(messages_json, "w") as f:
+            json.dump([{"text": f"person: {row[0]}\nMeGPT: {row[1]}", "label": 0} for row in results], f, indent=4)
+        with tarfile.open(output_file, "w:gz") as tar:
+            tar.add(messages_json, arcname="messages.json")
+        with open(output_file, "rb") as f:
+            return f.read()
+
+def child(mode: str, db_path: str, handle: str, home: str):
+    os.environ["HOME"] = home
+    from app.message_extractor import extract_messages as extractor
+
+    baseline = peak_rss_mb()
+    if mode == "streaming":
+        extractor.extract_messages(handle, db_path)
+    else:
+        legacy_export(db_path, handle, os.path.join(home, "legacy.tar.gz"))
+    print(json.dumps({"baseline": baseline, "peak": peak_rss_mb()}))
+
+def measure(mode: str, db_path: str, handle: str) -> dict:
+    with tempfile.TemporaryDirectory() as home:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_export_memory", "--child", mode, db_path, handle, home],
+            check=True, capture_output=True, text=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000, 400000])
+    parser.add_argument("--child", nargs=4, metavar=("MODE", "DB", "HANDLE", "HOME"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db_path = os.path.join(tmp, f"chat_{size}.db")
+            handle = create_chat_db(db_path, messages_per_contact=size)[0]
+            line = f"messages={size:8d}"
+            for mode in ("streaming", "legacy"):
+                result = measure(mode, db_path, handle)
+                line += f"  {mode}: peak={result['peak']:7.1f}MB (+{result['peak'] - result['baseline']:6.1f}MB)"
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Equivalence and scaling of the message-pairing query.
+
+Runs the original self-join query and the window-function ``PAIRS_QUERY``
+on synthetic databases of growing size, checks they return identical pairs
+and reports time per message. The window query's time per message stays
+flat as history grows; the self-join's grows with it.
+
+    python -m benchmarks.bench_extract --sizes 1000 4000 16000 64000 --legacy-max 16000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from MeGPT.extract_messages import PAIRS_QUERY
+from benchmarks.chatdb import create_chat_db
+
+# The pairing query before the window-function rewrite, kept for comparison
+LEGACY_PAIRS_QUERY = """
+WITH messages_with_prev AS (
+    SELECT m.ROWID, m.guid, m.text, m.subject, m.country, m.date, chj.chat_id, m.is_from_me,
+           LAG(m.is_from_me) OVER (PARTITION BY chj.chat_id ORDER BY m.date) AS prev_is_from_me
+    FROM message AS m
+    JOIN chat_message_join AS chj ON m.ROWID = chj.message_id
+    JOIN handle h ON m.handle_id = h.ROWID
+    WHERE LENGTH(m.text) > 0
+    AND h.id = ?
+),
+grouped_messages AS (
+    SELECT *,
+           SUM(CASE WHEN is_from_me != IFNULL(prev_is_from_me, -1) THEN 1 ELSE 0 END) OVER (PARTITION BY chat_id ORDER BY date) AS grp
+    FROM messages_with_prev
+),
+consecutive_messages AS (
+    SELECT chat_id, is_from_me, group_concat(text, '\n') AS joined_text, MIN(date) AS min_date
+    FROM grouped_messages
+    GROUP BY chat_id, is_from_me, grp
+),
+my_consecutive_messages AS (
+    SELECT * FROM consecutive_messages WHERE is_from_me = 1
+),
+other_consecutive_messages AS (
+    SELECT * FROM consecutive_messages WHERE is_from_me = 0
+)
+
+SELECT other.joined_text AS prev_text, my.joined_text AS my_text
+        FROM my_consecutive_messages AS my
+LEFT JOIN other_consecutive_messages AS other ON my.chat_id = other.chat_id AND other.min_date < my.min_date
+WHERE other.min_date = (
+    SELECT MAX(min_date) FROM other_consecutive_messages AS ocm
+    WHERE ocm.chat_id = my.chat_id AND ocm.min_date < my.min_date
+)
+ORDER BY my.min_date;
+"""
+
+def timed_query(db_path: str, query: str, handle: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        start = time.perf_counter()
+        rows = conn.execute(query, (handle,)).fetchall()
+        return rows, time.perf_counter() - start
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 16000, 64000])
+    parser.add_argument("--legacy-max", type=int, default=16000, help="skip the self-join above this size")
+    parser.add_argument("--burstiness", type=float, default=0.5)
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db_path = os.path.join(tmp, f"chat_{size}.db")
+            handle = create_chat_db(db_path, messages_per_contact=size, burstiness=args.burstiness)[0]
+
+            rows, elapsed = timed_query(db_path, PAIRS_QUERY, handle)
+            line = f"messages={size:7d} pairs={len(rows):6d} window={elapsed * 1000:9.1f}ms ({elapsed / size * 1e6:6.2f}us/msg)"
+            if size <= args.legacy_max:
+                legacy_rows, legacy_elapsed = timed_query(db_path, LEGACY_PAIRS_QUERY, handle)
+                same = legacy_rows == rows
+                ok = ok and same
+                line += (
+                    f"  self-join={legacy_elapsed * 1000:9.1f}ms ({legacy_elapsed / size * 1e6:7.2f}us/msg)"
+                    f"  speedup={legacy_elapsed / elapsed:6.1f}x  identical={same}"
+                )
+            print(line)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
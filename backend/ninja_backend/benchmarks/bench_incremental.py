@@ -0,0 +1,107 @@
+"""Incremental re-export versus full extraction.
+
+Exports a contact from a synthetic database, appends a handful of new
+messages and re-exports. The re-export only scans rows past the watermark,
+so its cost tracks the number of new messages rather than the history.
+The resulting corpus is checked against a from-scratch export, including
+after many tiny increments that split blocks across export boundaries, and
+after concurrent exports of the same contact.
+
+    python -m benchmarks.bench_incremental --sizes 10000 50000 --new 50
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_concurrency import setup_home
+from benchmarks.chatdb import append_messages, create_chat_db
+from MeGPT.extract_messages import PAIRS_QUERY
+
+def reset(extractor, handle: str):
+    """Forget a contact's watermark so the next export is a full rebuild"""
+    for path in extractor._contact_paths(extractor._clean_number(handle)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def full_export(extractor, handle: str, db_path: str):
+    reset(extractor, handle)
+    start = time.perf_counter()
+    extractor.update_corpus(handle, db_path)
+    return extractor.read_corpus(handle), time.perf_counter() - start
+
+def query_pairs(extractor, handle: str, db_path: str):
+    """Pairs from the SQL window query, for cross-checking the streaming pairer"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(PAIRS_QUERY, (handle,)).fetchall()
+    conn.close()
+    return [extractor.format_pair(tuple(x.replace("\n", " ") for x in row)) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--new", type=int, default=50, help="messages appended before the re-export")
+    parser.add_argument("--steps", type=int, default=40, help="tiny increments in the stitching check")
+    parser.add_argument("--concurrent", type=int, default=4, help="simultaneous exports of one contact")
+    args = parser.parse_args()
+
+    setup_home()
+    from app.message_extractor import extract_messages as extractor
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db_path = os.path.join(tmp, f"chat_{size}.db")
+            handle = create_chat_db(db_path, messages_per_contact=size)[0]
+
+            records, full_elapsed = full_export(extractor, handle, db_path)
+            same_as_query = records == query_pairs(extractor, handle, db_path)
+
+            append_messages(db_path, handle, args.new, seed=size)
+            start = time.perf_counter()
+            extractor.update_corpus(handle, db_path)
+            incremental_elapsed = time.perf_counter() - start
+            incremental = extractor.read_corpus(handle)
+
+            rebuilt, _ = full_export(extractor, handle, db_path)
+            same = incremental == rebuilt and same_as_query
+            ok = ok and same
+            print(
+                f"history={size:7d} new={args.new:4d} full={full_elapsed * 1000:8.1f}ms "
+                f"incremental={incremental_elapsed * 1000:7.1f}ms speedup={full_elapsed / incremental_elapsed:7.1f}x "
+                f"pairs={len(incremental):6d} identical={same}"
+            )
+
+        # Many small exports: every boundary risks splitting a block
+        db_path = os.path.join(tmp, "chat_steps.db")
+        handle = create_chat_db(db_path, messages_per_contact=200, burstiness=0.8)[0]
+        reset(extractor, handle)
+        extractor.update_corpus(handle, db_path)
+        for step in range(args.steps):
+            append_messages(db_path, handle, 1 + step % 4, burstiness=0.8, seed=step)
+            extractor.update_corpus(handle, db_path)
+        stepped = extractor.read_corpus(handle)
+        rebuilt, _ = full_export(extractor, handle, db_path)
+        same = stepped == rebuilt
+        ok = ok and same
+        print(f"stitching: {args.steps} small exports, pairs={len(stepped)} identical={same}")
+
+        # Concurrent exports of one contact must not append the same pairs twice
+        db_path = os.path.join(tmp, "chat_concurrent.db")
+        handle = create_chat_db(db_path, messages_per_contact=args.sizes[0])[0]
+        reset(extractor, handle)
+        with ThreadPoolExecutor(max_workers=args.concurrent) as pool:
+            list(pool.map(lambda _: extractor.update_corpus(handle, db_path), range(args.concurrent)))
+        concurrent = extractor.read_corpus(handle)
+        rebuilt, _ = full_export(extractor, handle, db_path)
+        same = concurrent == rebuilt
+        ok = ok and same
+        print(f"concurrent: {args.concurrent} exports, pairs={len(concurrent)} rebuilt={len(rebuilt)} identical={same}")
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
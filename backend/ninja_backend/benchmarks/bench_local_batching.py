@@ -0,0 +1,107 @@
+"""Throughput and queue wait of the local model's dynamic batching.
+
+Runs closed-loop clients at rising concurrency against a BatchingGenerator,
+once with batching off (max batch size 1, one sequence per generate call as
+MeGPT/generate.py did) and once with it on. By default the model is a fake
+whose batch costs ``--batch-seconds`` plus ``--row-seconds`` per prompt,
+which is how a memory-bound decode behaves; ``--model`` runs the real
+fine-tuned model instead.
+
+    python -m benchmarks.bench_local_batching --concurrency 1 2 4 8 16 --requests 64
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from app.llm.batching import BatchingGenerator
+
+def fake_generate_batch(batch_seconds: float, row_seconds: float):
+    def generate_batch(prompts, max_new_tokens):
+        time.sleep(batch_seconds + row_seconds * len(prompts))
+        return [f"reply to {prompt}" for prompt in prompts]
+    return generate_batch
+
+async def drive(batcher: BatchingGenerator, concurrency: int, requests: int, max_new_tokens: int, check: bool) -> float:
+    """Closed loop: each client sends its next request once the last returns.
+
+    With check set, verifies each caller got the fake reply to its own prompt.
+    """
+    remaining = iter(range(requests))
+    wrong = 0
+
+    async def client():
+        nonlocal wrong
+        for i in remaining:
+            prompt = f"person: message {i}\nMeGPT:"
+            result = await batcher.submit(prompt, max_new_tokens)
+            if check and result != f"reply to {prompt}":
+                wrong += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    if wrong:
+        raise AssertionError(f"{wrong} results were routed to the wrong caller")
+    return time.perf_counter() - start
+
+async def run(args) -> bool:
+    if args.model:
+        from app.llm.local_model import LocalModel
+        model = LocalModel(args.model, args.device)
+        model.load()
+        generate_batch = model.generate_batch
+    else:
+        generate_batch = fake_generate_batch(args.batch_seconds, args.row_seconds)
+
+    results = []
+    for max_batch_size in (1, args.max_batch_size):
+        for concurrency in args.concurrency:
+            batcher = BatchingGenerator(generate_batch, max_batch_size=max_batch_size, max_wait=args.max_wait)
+            wall = await drive(batcher, concurrency, args.requests, args.max_new_tokens, not args.model)
+            stats = batcher.stats()
+            await batcher.close()
+            result = {
+                "max_batch_size": max_batch_size,
+                "concurrency": concurrency,
+                "wall_seconds": wall,
+                "throughput_per_second": args.requests / wall,
+                "mean_batch_size": stats["mean_batch_size"],
+                "queue_wait_p50_ms": stats["queue_wait_p50_seconds"] * 1000,
+                "queue_wait_p99_ms": stats["queue_wait_p99_seconds"] * 1000,
+            }
+            results.append(result)
+            print(
+                f"batch<={max_batch_size:2d} concurrency={concurrency:3d} throughput={result['throughput_per_second']:7.2f}/s "
+                f"mean batch={result['mean_batch_size']:5.2f} queue wait p50={result['queue_wait_p50_ms']:8.1f}ms "
+                f"p99={result['queue_wait_p99_ms']:8.1f}ms"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    top = max(args.concurrency)
+    unbatched = next(r for r in results if r["max_batch_size"] == 1 and r["concurrency"] == top)
+    batched = next(r for r in results if r["max_batch_size"] == args.max_batch_size and r["concurrency"] == top)
+    ok = top == 1 or batched["throughput_per_second"] > 2 * unbatched["throughput_per_second"]
+    print("OK" if ok else "FAIL")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64, help="requests per run")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=0.01, help="seconds a batch waits to fill")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--batch-seconds", type=float, default=0.1, help="fake model: fixed cost per generate call")
+    parser.add_argument("--row-seconds", type=float, default=0.01, help="fake model: added cost per prompt")
+    parser.add_argument("--model", default=None, help="benchmark the real local model (adapter directory or name)")
+    parser.add_argument("--device", default="auto")
+    parser.add_argument("--output", default=None, help="also write the JSON results here")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
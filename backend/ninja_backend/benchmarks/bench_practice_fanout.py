@@ -0,0 +1,75 @@
+"""Latency of the practice endpoint's reply + suggestions fan-out.
+
+The fake client answers the reply prompt and the suggestions prompt with
+different latencies. With the concurrent fan-out, ``/practice`` takes about
+max(reply, suggestions) instead of their sum, and when suggestions miss
+their budget the reply still comes back on time with empty feedback.
+
+    python -m benchmarks.bench_practice_fanout --reply 0.4 --suggestions 0.8
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.bench_concurrency import setup_home
+
+SUGGESTIONS = json.dumps({"suggestions": [
+    {"text": "sounds good", "score": 8, "explanation": "casual"},
+    {"text": "bet", "score": 7, "explanation": "short"},
+    {"text": "down", "score": 7, "explanation": "short"},
+]})
+
+def is_suggestion_prompt(messages) -> bool:
+    return "suggestions" in messages[-1]["content"]
+
+async def run(reply_latency: float, suggestions_latency: float) -> bool:
+    import httpx
+    from app.llm import client as llm_client
+    from app.main import app
+    from app.message_extractor import generate
+    from benchmarks.fakes import FakeOllamaClient
+
+    llm_client._client = FakeOllamaClient(
+        latency=lambda m: suggestions_latency if is_suggestion_prompt(m) else reply_latency,
+        content=lambda m: SUGGESTIONS if is_suggestion_prompt(m) else "lol yeah",
+    )
+    payload = {"message": "hey what's up", "context": {"goal": "make plans"}}
+    transport = httpx.ASGITransport(app=app)
+    ok = True
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        scenarios = [
+            ("within budget", suggestions_latency + 1.0, max(reply_latency, suggestions_latency), 3),
+            ("suggestions late", suggestions_latency / 5, max(reply_latency, suggestions_latency / 5), 0),
+        ]
+        for name, budget, expected, expected_feedback in scenarios:
+            generate.SUGGESTIONS_BUDGET_SECONDS = budget
+            start = time.perf_counter()
+            data = (await http.post("/api/v1/messages/practice", json=payload)).json()
+            elapsed = time.perf_counter() - start
+            passed = (
+                data["response"] == "lol yeah"
+                and len(data["feedback"]) == expected_feedback
+                and elapsed < expected + 0.15
+            )
+            ok = ok and passed
+            print(
+                f"{name:18} wall={elapsed:6.3f}s expected≈{expected:5.2f}s "
+                f"sum={reply_latency + suggestions_latency:5.2f}s feedback={len(data['feedback'])} "
+                f"{'OK' if passed else 'FAIL'}"
+            )
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reply", type=float, default=0.4)
+    parser.add_argument("--suggestions", type=float, default=0.8)
+    args = parser.parse_args()
+
+    setup_home()
+    sys.exit(0 if asyncio.run(run(args.reply, args.suggestions)) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Prompt size and prompt-eval latency against the prompt token budget.
+
+Builds the suggestions prompt for each round of a growing conversation in
+which some messages are long paragraphs, once with the old fixed counts (5
+related examples, last 5 history lines) and once per ``--budgets`` value with
+the budgeted builder. For each it reports the prompt tokens as counted by
+the app, how many distinct shared prefixes (instructions and recent examples)
+the rounds used, and the prompt-eval time: cold (nothing cached) and over the
+rounds in order (prefix cache warm). A budgeted prompt must keep one prefix.
+
+By default prompt evaluation is simulated (see ``PrefixCachingOllamaClient``).
+With ``--ollama`` it talks to a real server and reports the
+``prompt_eval_duration`` Ollama measured; there the cold column is the first
+round only.
+
+    python -m benchmarks.bench_prompt_budget --budgets 512 1024 2048 4096
+    python -m benchmarks.bench_prompt_budget --budgets 1024 2048 --ollama
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+
+from benchmarks.bench_retrieval import write_messages_file
+from benchmarks.chatdb import WORDS, random_text
+
+def build_rounds(rounds: int, long_every: int, seed: int = 0):
+    """(message, full history) for each round of a growing conversation"""
+    rng = random.Random(seed)
+    lines = []
+    result = []
+    for i in range(rounds):
+        message = random_text(rng)
+        result.append((message, "\n".join(lines)))
+        reply = random_text(rng)
+        if long_every and i % long_every == long_every - 1:
+            reply = " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 200)))
+        lines += [f"Other: {message}", f"User: {reply}"]
+    return result
+
+def fixed_prompt(generate, message: str, history: str) -> list:
+    """Suggestions prompt sized by counts, as before the token budget"""
+    context = generate.load_context(message, k=5)
+    return generate.build_suggestion_messages(context, message, "\n".join(history.split("\n")[-5:]), "make plans")
+
+async def eval_seconds(make_client, model: str, prompts, cold: bool) -> list:
+    """Prompt-eval seconds for each prompt, sharing one client unless cold"""
+    durations = []
+    client = make_client()
+    await client.chat(model=model, messages=[], keep_alive="30m")
+    for messages in prompts:
+        if cold:
+            await client.close()
+            client = make_client()
+        response = await client.chat(model=model, messages=messages, options={"num_predict": 1}, keep_alive="30m")
+        durations.append(response["prompt_eval_duration"] / 1e9)
+    await client.close()
+    return durations
+
+async def run(args) -> bool:
+    from app.llm import client as llm_client
+    from app.llm.backends import LLM_MODEL
+    from app.message_extractor import context_cache
+    from app.message_extractor import generate
+    from benchmarks.fakes import PrefixCachingOllamaClient
+
+    write_messages_file(context_cache.contact_messages_file("+15550000000"), args.examples)
+
+    if args.ollama:
+        import ollama
+        make_client = lambda: ollama.AsyncClient(host=llm_client.OLLAMA_HOST)
+    else:
+        make_client = lambda: PrefixCachingOllamaClient(load_seconds=0)
+
+    rounds = build_rounds(args.rounds, args.long_every)
+    configs = [("fixed", None)] + [(f"budget={b}", b) for b in args.budgets]
+    ok = True
+    for name, budget in configs:
+        prompts = []
+        for message, history in rounds:
+            if budget is None:
+                prompts.append(fixed_prompt(generate, message, history))
+            else:
+                prompts.append(generate.build_prompt(
+                    lambda context, h: generate.build_suggestion_messages(context, message, h, "make plans"),
+                    message,
+                    history,
+                    budget=budget,
+                ))
+        tokens = [generate.prompt_tokens(p) for p in prompts]
+        history_lines = [len(p[-2]["content"].split("\n")) if "Recent conversation" in p[-3]["content"] else 0 for p in prompts]
+        prefixes = len({json.dumps(generate.build_prefix_messages("")[:1] + p[1:3]) for p in prompts})
+
+        if args.ollama:
+            warm = await eval_seconds(make_client, LLM_MODEL, prompts, cold=False)
+            cold = warm[:1]
+        else:
+            cold = await eval_seconds(make_client, LLM_MODEL, prompts, cold=True)
+            warm = await eval_seconds(make_client, LLM_MODEL, prompts, cold=False)
+
+        within = budget is None or (max(tokens) <= budget and prefixes == 1)
+        ok = ok and within
+        print(
+            f"{name:12s} tokens mean={statistics.mean(tokens):7.1f} max={max(tokens):5d} "
+            f"history lines={statistics.mean(history_lines):5.1f} prefixes={prefixes:2d} "
+            f"prompt-eval cold p50={statistics.median(cold) * 1000:7.1f}ms "
+            f"in order mean={statistics.mean(warm[1:] or warm) * 1000:7.1f}ms "
+            f"{'OK' if within else 'FAIL (over budget or prefix changed)'}"
+        )
+    print(f"token counts: {generate.get_token_counter().stats()}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[512, 1024, 2048, 4096])
+    parser.add_argument("--rounds", type=int, default=40)
+    parser.add_argument("--long-every", type=int, default=4, help="every nth reply is a long paragraph (0 for none)")
+    parser.add_argument("--examples", type=int, default=2000)
+    parser.add_argument("--ollama", action="store_true", help="measure against a running Ollama server")
+    args = parser.parse_args()
+
+    from benchmarks.bench_concurrency import setup_home
+    setup_home()
+    ok = asyncio.run(run(args))
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Prompt-eval work on repeated practice requests, old vs cache-friendly prompts.
+
+Each round sends the reply prompt and the suggestions prompt for a new
+message, with the goal changing between rounds and the conversation history
+growing. The old layout put the goal in the suggestions system prompt and used
+a different system prompt per kind, so consecutive prompts shared almost no
+prefix. The current layout starts every prompt with the same instructions and
+recent examples.
+
+By default this runs against a simulated prompt cache (see
+``PrefixCachingOllamaClient``). With ``--ollama`` it talks to a real server
+and reports the ``prompt_eval_duration`` Ollama measured:
+
+    python -m benchmarks.bench_prompt_cache --rounds 20
+    python -m benchmarks.bench_prompt_cache --rounds 10 --ollama
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.bench_retrieval import write_messages_file
+from benchmarks.chatdb import random_text
+
+GOALS = ["make plans for the weekend", "apologize for being late", "ask about the new job"]
+
+def legacy_response_messages(context: str, message: str, history: str) -> list:
+    """Reply prompt as assembled before the shared prefix"""
+    messages = [
+        {"role": "system", "content": "You are simulating a specific person's texting style based on their message history.\n"
+         "CRITICAL RULES:\n1. Study and copy their EXACT style\n2. NEVER mention being AI\n3. Stay 100% in character"},
+        {"role": "user", "content": "Here are the person's actual text messages. Study their style carefully:"},
+        {"role": "assistant", "content": "I'll analyze their exact texting patterns."},
+        {"role": "user", "content": context},
+    ]
+    if history:
+        messages += [{"role": "user", "content": "Recent conversation context:"}, {"role": "assistant", "content": history}]
+    return messages + [{"role": "user", "content": f"Respond to this message: {message}"}]
+
+def legacy_suggestion_messages(context: str, message: str, history: str, goal: str) -> list:
+    """Suggestions prompt as assembled before the shared prefix, goal first"""
+    messages = [
+        {"role": "system", "content": f"You are analyzing a text message conversation and suggesting responses.\nGoal: {goal}\n"
+         "Your task is to suggest 3 possible responses.\nFormat each suggestion as:\nScore: [6-10]\nMessage: [text]\nExplanation: [1 line]"},
+        {"role": "user", "content": "Here are example messages showing the texting style:"},
+        {"role": "assistant", "content": "I'll analyze the style patterns."},
+        {"role": "user", "content": context},
+    ]
+    if history:
+        messages += [{"role": "user", "content": "Recent messages in the conversation:"}, {"role": "assistant", "content": history}]
+    return messages + [{"role": "user", "content": f"Message to respond to: {message}\nGenerate exactly 3 suggestions."}]
+
+def build_rounds(rounds: int, seed: int = 0):
+    """(message, history, goal) for each round of a growing conversation"""
+    rng = random.Random(seed)
+    lines = []
+    result = []
+    for i in range(rounds):
+        message = random_text(rng)
+        result.append((message, "\n".join(lines[-5:]), GOALS[i // 3 % len(GOALS)]))
+        lines += [f"Other: {message}", f"User: {random_text(rng)}"]
+    return result
+
+async def measure(client, model: str, prompts) -> list:
+    """Prompt-eval seconds reported for each prompt, sent in order"""
+    durations = []
+    for messages in prompts:
+        response = await client.chat(model=model, messages=messages, options={"num_predict": 1}, keep_alive="30m")
+        durations.append(response["prompt_eval_duration"] / 1e9)
+    return durations
+
+async def run(args) -> bool:
+    from app.llm import client as llm_client
+    from app.llm.backends import LLM_MODEL
+    from app.message_extractor import context_cache
+    from app.message_extractor import generate
+    from benchmarks.fakes import PrefixCachingOllamaClient
+
+    write_messages_file(context_cache.contact_messages_file("+15550000000"), args.examples)
+
+    if args.ollama:
+        import ollama
+        make_client = lambda: ollama.AsyncClient(host=llm_client.OLLAMA_HOST)
+    else:
+        make_client = lambda: PrefixCachingOllamaClient(num_parallel=args.parallel)
+
+    rounds = build_rounds(args.rounds)
+    legacy, current = [], []
+    for message, history, goal in rounds:
+        recent, related = generate.load_context(message)
+        joined = "\n\n".join(part for part in (recent, related) if part)
+        legacy += [legacy_response_messages(joined, message, history),
+                   legacy_suggestion_messages(joined, message, history, goal)]
+        current += [generate.build_response_messages((recent, related), message, history),
+                    generate.build_suggestion_messages((recent, related), message, history, goal)]
+
+    results = {}
+    for name, prompts in (("legacy", legacy), ("current", current)):
+        client = make_client()
+        # Load the model first so only prompt evaluation is compared
+        await client.chat(model=LLM_MODEL, messages=[], keep_alive="30m")
+        durations = await measure(client, LLM_MODEL, prompts)
+        await client.close()
+        # The first prompt is always evaluated in full
+        repeated = durations[1:]
+        results[name] = statistics.mean(repeated)
+        print(
+            f"{name:8s} prompts={len(prompts):3d} first={durations[0] * 1000:7.1f}ms "
+            f"repeated mean={results[name] * 1000:7.1f}ms p50={statistics.median(repeated) * 1000:7.1f}ms"
+        )
+    improved = results["current"] < results["legacy"] / 2
+    print(f"prompt-eval on repeated requests: {results['legacy'] / max(results['current'], 1e-9):.1f}x less "
+          f"{'OK' if improved else 'FAIL'}")
+
+    ok = improved
+    if not args.ollama:
+        # First request after startup, with and without the warm-up hook
+        for warmed in (False, True):
+            llm_client._client = PrefixCachingOllamaClient(num_parallel=args.parallel)
+            if warmed:
+                await generate.warm_up()
+            start = time.perf_counter()
+            await generate.get_response(rounds[0][0], rounds[0][1])
+            first = time.perf_counter() - start
+            print(f"first request {'after warm-up' if warmed else 'cold         '} {first * 1000:7.1f}ms")
+            if warmed:
+                ok = ok and first < cold / 2
+            else:
+                cold = first
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--examples", type=int, default=2000)
+    parser.add_argument("--parallel", type=int, default=1, help="simulated OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--ollama", action="store_true", help="measure against a running Ollama server")
+    args = parser.parse_args()
+
+    from benchmarks.bench_concurrency import setup_home
+    setup_home()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
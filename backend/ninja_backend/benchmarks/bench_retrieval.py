@@ -0,0 +1,68 @@
+"""Build, load and lookup cost of the few-shot example index.
+
+    python -m benchmarks.bench_retrieval --sizes 1000 10000 50000 --queries 500
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.chatdb import random_text
+
+def write_messages_file(path: str, size: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        json.dump(
+            [{"text": f"person: {random_text(rng)}\nMeGPT: {random_text(rng)}", "label": 0} for _ in range(size)],
+            f,
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.message_extractor import retrieval
+
+    ok = True
+    rng = random.Random(1)
+    queries = [random_text(rng) for _ in range(args.queries)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            messages_file = os.path.join(tmp, f"messages_{size}.json")
+            write_messages_file(messages_file, size)
+            with open(messages_file) as f:
+                documents = [m["text"].split("\n")[0][len("person: "):] for m in json.load(f)]
+
+            start = time.perf_counter()
+            retrieval.load_or_build_index(messages_file, documents)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = retrieval.load_or_build_index(messages_file, documents)
+            load = time.perf_counter() - start
+
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            p50 = statistics.median(latencies)
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            passed = p99 < 10
+            ok = ok and passed
+            print(
+                f"examples={size:6d} build={build * 1000:8.1f}ms load={load * 1000:7.1f}ms "
+                f"lookup p50={p50:5.2f}ms p99={p99:5.2f}ms {'OK' if passed else 'SLOW'}"
+            )
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
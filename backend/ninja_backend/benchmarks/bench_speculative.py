@@ -0,0 +1,101 @@
+"""Latency of /real with and without speculative suggestions.
+
+A conversation gets a new incoming message, and the user asks for
+suggestions ``--think`` seconds later. Without speculation ``/real`` pays the
+full generation latency; with ``/real/incoming`` called on arrival it finds
+the suggestions cached (think >= latency) or joins the running generation
+and only waits for the rest. A burst of incoming messages on one session
+checks the cap: stale speculations are cancelled and at most
+SPECULATIVE_MAX_PER_MINUTE are started.
+
+    python -m benchmarks.bench_speculative --latency 1.0 --think 0.3 0.6 1.2
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.bench_concurrency import setup_home
+
+async def run(latency: float, thinks, burst: int) -> bool:
+    import httpx
+    from app.llm import client as llm_client
+    from app.main import app
+    from app.message_extractor import generate
+    from benchmarks.fakes import FakeOllamaClient
+
+    suggestions = [{"text": f"sounds good {i}", "score": 8, "explanation": "casual"} for i in range(3)]
+    fake = FakeOllamaClient(latency=latency, content=json.dumps({"suggestions": suggestions}))
+    llm_client._client = fake
+    transport = httpx.ASGITransport(app=app)
+    ok = True
+
+    def payload(i: int, session: str = "bench") -> dict:
+        history = [
+            {"id": str(n), "text": f"message {i} {n}", "isUser": bool(n % 2), "timestamp": "2024-01-01T00:00:00Z"}
+            for n in range(4)
+        ]
+        return {"session_id": session, "message": f"want to grab dinner {i}?", "context": {}, "messages": history}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as http:
+        n = 0
+        for think in thinks:
+            for speculate in (False, True):
+                n += 1
+                body = payload(n)
+                calls_before = fake.calls
+                if speculate:
+                    status = (await http.post("/api/v1/messages/real/incoming", json=body)).json()["status"]
+                await asyncio.sleep(think)
+                start = time.perf_counter()
+                data = (await http.post("/api/v1/messages/real", json=body)).json()
+                elapsed = time.perf_counter() - start
+                expected = max(latency - think, 0) if speculate else latency
+                passed = len(data["feedback"]) == 3 and elapsed < expected + 0.1 and fake.calls - calls_before == 1
+                ok = ok and passed
+                print(
+                    f"think={think:4.2f}s {'speculative' if speculate else 'on demand  '} "
+                    f"{'(' + status + ')' if speculate else '':10s} /real={elapsed:6.3f}s expected≈{expected:5.2f}s "
+                    f"llm_calls={fake.calls - calls_before} {'OK' if passed else 'FAIL'}"
+                )
+
+        # A burst on one session: each message makes the previous speculation stale
+        speculator = generate.get_suggestion_speculator()
+        before = dict(speculator.stats())
+        calls_before = fake.calls
+        statuses = []
+        for i in range(burst):
+            statuses.append((await http.post("/api/v1/messages/real/incoming", json=payload(1000 + i, "burst"))).json()["status"])
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(latency + 0.1)
+        stats = speculator.stats()
+        started = stats["started"] - before["started"]
+        passed = (
+            started <= generate.SPECULATIVE_MAX_PER_MINUTE
+            and stats["completed"] - before["completed"] <= generate.SPECULATIVE_MAX_IN_FLIGHT
+            and fake.calls - calls_before == started
+        )
+        ok = ok and passed
+        print(
+            f"burst n={burst} started={started} limited={statuses.count('limited')} "
+            f"superseded={stats['superseded'] - before['superseded']} completed={stats['completed'] - before['completed']} "
+            f"llm_calls={fake.calls - calls_before} aborted={fake.aborted} {'OK' if passed else 'FAIL'}"
+        )
+        print(f"stats {(await http.get('/api/v1/messages/real/stats')).json()}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--think", type=float, nargs="+", default=[0.3, 0.6, 1.2], help="seconds before the user asks")
+    parser.add_argument("--burst", type=int, default=10, help="incoming messages in the burst")
+    args = parser.parse_args()
+
+    setup_home()
+    ok = asyncio.run(run(args.latency, args.think, args.burst))
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Time-to-first-byte of the SSE endpoints versus their blocking versions.
+
+The fake client streams tokens evenly over its latency. The blocking
+``/practice`` only answers once everything is generated, while
+``/practice/stream`` and ``/real/stream`` deliver the first token and each
+suggestion as they are produced.
+
+    python -m benchmarks.bench_streaming --latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+
+from benchmarks.bench_concurrency import setup_home
+from benchmarks.bench_practice_fanout import SUGGESTIONS, is_suggestion_prompt
+
+async def serve(app):
+    """Start the app on a real socket; ASGITransport would buffer the stream"""
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+async def read_events(http, path: str, payload: dict = None, method: str = "POST"):
+    """Request an SSE endpoint and return (event, data, seconds since start) tuples"""
+    events = []
+    start = time.perf_counter()
+    async with http.stream(method, path, json=payload) as response:
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):]), time.perf_counter() - start))
+    return events
+
+async def run(latency: float) -> bool:
+    import httpx
+    from app.llm import client as llm_client
+    from app.main import app
+    from benchmarks.fakes import FakeOllamaClient
+
+    llm_client._client = FakeOllamaClient(
+        latency=latency,
+        content=lambda m: SUGGESTIONS if is_suggestion_prompt(m) else "lol yeah we should def do that this weekend",
+    )
+    server, task, base_url = await serve(app)
+    practice = {"message": "hey what's up", "context": {"goal": "make plans"}}
+    real = {"message": "hey", "context": {}, "messages": []}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        start = time.perf_counter()
+        await http.post("/api/v1/messages/practice", json=practice)
+        blocking = time.perf_counter() - start
+        print(f"/practice          first byte={blocking:6.3f}s")
+
+        ok = True
+        for path, payload in (("/api/v1/messages/practice/stream", practice), ("/api/v1/messages/real/stream", real)):
+            events = await read_events(http, path, payload)
+            first = events[0][2]
+            suggestions = [t for e, _, t in events if e == "suggestion"]
+            done = events[-1]
+            passed = done[0] == "done" and len(suggestions) == 3 and suggestions[0] < 0.8 * blocking
+            ok = ok and passed
+            print(
+                f"{path.replace('/api/v1/messages', ''):18} first event={first:6.3f}s "
+                f"suggestions at {', '.join(f'{t:.3f}s' for t in suggestions)} "
+                f"done={done[2]:6.3f}s {'OK' if passed else 'FAIL'}"
+            )
+
+    server.should_exit = True
+    await task
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    setup_home()
+    sys.exit(0 if asyncio.run(run(args.latency)) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Pushed training progress for concurrent jobs versus one-second polling.
+
+Starts two training jobs at once (a CPU-bound stand-in for the fine-tune)
+and follows each over its own ``/training/jobs/{id}/events`` stream. Each
+stream must carry only its own job, send an event only when the job's state
+changed, and end with ``done``. Request counts are compared with what the old
+one-second polling of ``/training-progress`` would have needed.
+
+    python -m benchmarks.bench_training_events --jobs 2 --steps 20 --step-seconds 0.1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.bench_concurrency import setup_home
+from benchmarks.bench_streaming import read_events, serve
+
+async def run(args) -> bool:
+    import httpx
+    from app.llm import client as llm_client
+    from app.main import app
+    from app.training.jobs import get_manager, shutdown_manager
+    from benchmarks.fakes import FakeOllamaClient
+
+    llm_client._client = FakeOllamaClient(latency=0)
+    server, task, base_url = await serve(app)
+    ok = True
+    try:
+        manager = get_manager()
+        jobs = [manager.start(f"messages_{i}.json") for i in range(args.jobs)]
+        start = time.perf_counter()
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+            streams = await asyncio.gather(*(
+                read_events(http, f"/api/v1/messages/training/jobs/{job['id']}/events", method="GET") for job in jobs
+            ))
+            missing = (await http.get("/api/v1/messages/training/jobs/unknown/events")).status_code
+        elapsed = time.perf_counter() - start
+
+        for job, events in zip(jobs, streams):
+            progress = [data for event, data, _ in events if event == "progress"]
+            own = all(data["job_id"] == job["id"] for _, data, _ in events)
+            distinct = all(a != b for a, b in zip(progress, progress[1:]))
+            finished = events[-1][0] == "done" and events[-1][1]["status"] == "completed" and events[-1][1]["progress"] == 100
+            steps = [data["step"] for data in progress]
+            passed = own and distinct and finished and steps == sorted(steps) and len(progress) <= args.steps + 6
+            ok = ok and passed
+            print(
+                f"job {job['id']} events={len(events):3d} progress={len(progress):3d} last step={steps[-1]} "
+                f"own-only={own} changes-only={distinct} done={finished} {'OK' if passed else 'FAIL'}"
+            )
+        polling = int(elapsed) * args.jobs
+        print(f"{args.jobs} jobs in {elapsed:.1f}s: {args.jobs} streaming requests vs ~{polling} polls at 1/s "
+              f"(which could only see the latest job); unknown job -> {missing}")
+        ok = ok and missing == 404
+    finally:
+        shutdown_manager()
+        server.should_exit = True
+        await task
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--step-seconds", type=float, default=0.1)
+    args = parser.parse_args()
+
+    setup_home()
+    os.environ["BENCH_TRAINING_STEPS"] = str(args.steps)
+    os.environ["BENCH_TRAINING_STEP_SECONDS"] = str(args.step_seconds)
+    os.environ["TRAINING_TARGET"] = "benchmarks.fakes:simulated_training"
+    os.environ["TRAINING_MAX_WORKERS"] = str(args.jobs)
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Training jobs in worker processes: event-loop impact, progress, cancel and queueing.
+
+Runs a CPU-bound stand-in for the fine-tune (``benchmarks.fakes.simulated_training``)
+first on a thread inside the API process, as the old background task did,
+then through the job manager's worker processes, and measures how late the
+event loop wakes up meanwhile. Then checks that a second job queues behind
+the first, that cancelling a running job stops it promptly and starts the
+next one, and that a worker crash is reported as a failure.
+
+    python -m benchmarks.bench_training_jobs --steps 40 --step-seconds 0.05
+"""
+import argparse
+import asyncio
+import os
+import queue
+import sys
+import threading
+import time
+
+async def loop_lag(until) -> list:
+    """Wake-up delays (ms) of a 10ms sleep loop while until() is False"""
+    lags = []
+    while not until():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - start - 0.01) * 1000)
+    return lags
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0.0
+
+async def wait_for_status(manager, job_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    return manager.get(job_id)
+
+async def run(args) -> bool:
+    from app.training.jobs import ProgressReporter, TrainingJobManager
+    from benchmarks.fakes import simulated_training
+
+    ok = True
+
+    # In-process thread, like the old train_in_background
+    done = threading.Event()
+    thread = threading.Thread(
+        target=lambda: (simulated_training("", ProgressReporter("inline", queue.Queue(), threading.Event())), done.set())
+    )
+    thread.start()
+    lags = await loop_lag(done.is_set)
+    thread.join()
+    inline_p99 = percentile(lags, 0.99)
+    print(f"in-process thread   loop lag p50={percentile(lags, 0.5):6.2f}ms p99={inline_p99:6.2f}ms max={max(lags):6.2f}ms")
+
+    manager = TrainingJobManager(max_workers=1, target="benchmarks.fakes:simulated_training")
+    try:
+        first = manager.start("messages_a.json")
+        second = manager.start("messages_b.json")
+        queued = manager.get(second["id"])["status"] == "queued"
+
+        lags = await loop_lag(lambda: manager.get(first["id"])["status"] in ("completed", "failed", "cancelled"))
+        job = manager.get(first["id"])
+        worker_p99 = percentile(lags, 0.99)
+        print(f"worker process      loop lag p50={percentile(lags, 0.5):6.2f}ms p99={worker_p99:6.2f}ms max={max(lags):6.2f}ms")
+        reported = job["status"] == "completed" and job["progress"] == 100 and job["step"] == args.steps and job["loss"] is not None
+        print(f"job {job['id']} {job['status']} step={job['step']}/{job['max_steps']} loss={job['loss']:.3f} "
+              f"samples/s={job['samples_per_second']:.1f} queued second job={queued} {'OK' if reported else 'FAIL'}")
+        ok = ok and reported and queued and worker_p99 < inline_p99
+
+        # Cancel the second job mid-run; a third queued job should take its slot
+        third = manager.start("messages_c.json")
+        await wait_for_status(manager, second["id"], ("running",))
+        while manager.get(second["id"])["step"] < args.steps // 4:
+            await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        manager.cancel(second["id"])
+        job = await wait_for_status(manager, second["id"], ("cancelled", "completed", "failed"))
+        cancel_latency = time.perf_counter() - start
+        started_next = (await wait_for_status(manager, third["id"], ("running", "completed")))["status"] in ("running", "completed")
+        cancelled = job["status"] == "cancelled" and job["step"] < args.steps and started_next
+        print(f"cancel at step {job['step']}/{args.steps} took {cancel_latency * 1000:.0f}ms, "
+              f"next job started={started_next} {'OK' if cancelled else 'FAIL'}")
+        ok = ok and cancelled
+        await wait_for_status(manager, third["id"], ("completed", "failed", "cancelled"))
+
+        # A worker that dies without reporting is marked failed
+        crash = manager.start("messages_d.json", target="benchmarks.fakes:crashing_training")
+        job = await wait_for_status(manager, crash["id"], ("completed", "failed", "cancelled"))
+        crashed = job["status"] == "failed" and "code 3" in (job["error"] or "")
+        print(f"worker crash -> {job['status']}: {job['error']} {'OK' if crashed else 'FAIL'}")
+        ok = ok and crashed
+    finally:
+        manager.shutdown()
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=40)
+    parser.add_argument("--step-seconds", type=float, default=0.05)
+    args = parser.parse_args()
+
+    os.environ["BENCH_TRAINING_STEPS"] = str(args.steps)
+    os.environ["BENCH_TRAINING_STEP_SECONDS"] = str(args.step_seconds)
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Synthetic ``chat.db`` generator.
+
+Builds the subset of the macOS Messages schema the extractor reads
+(``handle``, ``chat``, ``chat_message_join`` and ``message``) so the
+extraction paths can be benchmarked without a real Messages database.
+
+    python -m benchmarks.chatdb /tmp/chat.db --contacts 5 --messages 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+from typing import List
+
+# Messages stores dates as nanoseconds since 2001-01-01
+APPLE_EPOCH = 978307200
+NANOSECONDS = 1_000_000_000
+
+WORDS = (
+    "hey yeah lol ok sure sounds good what are you up to tonight omw haha "
+    "dinner later maybe idk tomorrow work gym coffee call me when free nice "
+    "lmk can't wait same wanna grab food running late see you soon"
+).split()
+
+SCHEMA = """
+CREATE TABLE handle (ROWID INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL, service TEXT NOT NULL);
+CREATE TABLE chat (ROWID INTEGER PRIMARY KEY AUTOINCREMENT, guid TEXT UNIQUE NOT NULL, chat_identifier TEXT, service_name TEXT);
+CREATE TABLE chat_handle_join (chat_id INTEGER, handle_id INTEGER, UNIQUE(chat_id, handle_id));
+CREATE TABLE message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    text TEXT,
+    subject TEXT,
+    country TEXT,
+    date INTEGER,
+    handle_id INTEGER DEFAULT 0,
+    is_from_me INTEGER DEFAULT 0,
+    service TEXT
+);
+CREATE TABLE chat_message_join (chat_id INTEGER, message_id INTEGER, message_date INTEGER DEFAULT 0, PRIMARY KEY (chat_id, message_id));
+CREATE INDEX message_idx_handle ON message(handle_id, date);
+CREATE INDEX chat_message_join_idx_message_id_only ON chat_message_join(message_id);
+"""
+
+def phone_number(index: int) -> str:
+    return f"+1555{index:07d}"
+
+def random_text(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+
+def create_chat_db(
+    path: str,
+    contacts: int = 1,
+    messages_per_contact: int = 1000,
+    burstiness: float = 0.5,
+    empty_ratio: float = 0.03,
+    start_rowid: int = 0,
+    seed: int = 0,
+) -> List[str]:
+    """Create a synthetic Messages database at path and return its handle ids.
+
+    ``burstiness`` is the probability that a message has the same sender as
+    the one before it, so higher values mean longer runs of consecutive
+    messages. ``empty_ratio`` of messages have no text, like attachments.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    if start_rowid:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('message', ?)", (start_rowid,))
+
+    handles = [phone_number(i) for i in range(contacts)]
+    timeline = []
+    for handle_rowid, handle in enumerate(handles, 1):
+        conn.execute("INSERT INTO handle (ROWID, id, service) VALUES (?, ?, 'iMessage')", (handle_rowid, handle))
+        conn.execute(
+            "INSERT INTO chat (ROWID, guid, chat_identifier, service_name) VALUES (?, ?, ?, 'iMessage')",
+            (handle_rowid, f"iMessage;-;{handle}", handle),
+        )
+        conn.execute("INSERT INTO chat_handle_join VALUES (?, ?)", (handle_rowid, handle_rowid))
+
+        date = rng.randint(0, 86400) * NANOSECONDS
+        is_from_me = rng.randint(0, 1)
+        for _ in range(messages_per_contact):
+            if rng.random() > burstiness:
+                is_from_me = 1 - is_from_me
+            # Bursts arrive seconds apart, conversations resume minutes to hours later
+            date += rng.randint(1, 30 if rng.random() < burstiness else 7200) * NANOSECONDS + rng.randint(0, NANOSECONDS - 1)
+            text = None if rng.random() < empty_ratio else random_text(rng)
+            timeline.append((date, handle_rowid, is_from_me, text))
+
+    # Insert in date order so ROWIDs grow with time like a real database
+    timeline.sort()
+    for date, handle_rowid, is_from_me, text in timeline:
+        cursor = conn.execute(
+            "INSERT INTO message (guid, text, date, handle_id, is_from_me, service) VALUES (?, ?, ?, ?, ?, 'iMessage')",
+            (f"{handle_rowid}-{date}", text, date, handle_rowid, is_from_me),
+        )
+        conn.execute(
+            "INSERT INTO chat_message_join (chat_id, message_id, message_date) VALUES (?, ?, ?)",
+            (handle_rowid, cursor.lastrowid, date),
+        )
+    conn.commit()
+    conn.close()
+    return handles
+
+def append_messages(path: str, handle: str, count: int, burstiness: float = 0.5, seed: int = 1) -> None:
+    """Append count new messages for an existing handle, continuing its timeline"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    handle_rowid = conn.execute("SELECT ROWID FROM handle WHERE id = ?", (handle,)).fetchone()[0]
+    date, is_from_me = conn.execute(
+        "SELECT date, is_from_me FROM message WHERE handle_id = ? ORDER BY date DESC LIMIT 1", (handle_rowid,)
+    ).fetchone()
+    for _ in range(count):
+        if rng.random() > burstiness:
+            is_from_me = 1 - is_from_me
+        date += rng.randint(1, 600) * NANOSECONDS
+        cursor = conn.execute(
+            "INSERT INTO message (guid, text, date, handle_id, is_from_me, service) VALUES (?, ?, ?, ?, ?, 'iMessage')",
+            (f"{handle_rowid}-{date}", random_text(rng), date, handle_rowid, is_from_me),
+        )
+        conn.execute(
+            "INSERT INTO chat_message_join (chat_id, message_id, message_date) VALUES (?, ?, ?)",
+            (handle_rowid, cursor.lastrowid, date),
+        )
+    conn.commit()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Messages chat.db")
+    parser.add_argument("path")
+    parser.add_argument("--contacts", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=1000, help="messages per contact")
+    parser.add_argument("--burstiness", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    handles = create_chat_db(args.path, args.contacts, args.messages, args.burstiness, seed=args.seed)
+    print(f"Wrote {args.contacts * args.messages} messages for {len(handles)} contacts to {args.path}")
+    print("Handles:", ", ".join(handles[:5]) + (" ..." if len(handles) > 5 else ""))
+
+if __name__ == "__main__":
+    main()
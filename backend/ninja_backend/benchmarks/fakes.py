@@ -0,0 +1,184 @@
+"""Stand-ins for external services used by the benchmarks."""
+import asyncio
+import re
+
+class FakeOllamaClient:
+    """Mimics ``ollama.AsyncClient.chat`` with a configurable per-call latency.
+
+    ``latency`` and ``content`` may be plain values or callables taking the
+    chat messages, so a benchmark can give each kind of prompt its own timing.
+    With ``parallel`` set, at most that many generations run at once and the
+    rest queue, like ``OLLAMA_NUM_PARALLEL``. ``completed`` and ``aborted``
+    count streams that ran to the end or were closed early, and
+    ``busy_seconds`` the generation time spent across all of them.
+    """
+
+    def __init__(self, latency=0.5, content="✓ Clear and friendly\n→ Mention the plan", parallel=None):
+        self.latency = latency
+        self.content = content
+        self.slots = asyncio.Semaphore(parallel) if parallel else None
+        self.calls = 0
+        self.completed = 0
+        self.aborted = 0
+        self.busy_seconds = 0.0
+
+    async def chat(self, model: str = "", messages=None, stream: bool = False, **kwargs):
+        self.calls += 1
+        latency = self.latency(messages) if callable(self.latency) else self.latency
+        content = self.content(messages) if callable(self.content) else self.content
+        if stream:
+            return self._stream(content, latency)
+        async with self._slot():
+            await asyncio.sleep(latency)
+        self.completed += 1
+        return {"message": {"role": "assistant", "content": content}}
+
+    async def _stream(self, content: str, latency: float):
+        """Spread the latency evenly over whitespace-delimited tokens"""
+        tokens = re.findall(r"\s*\S+|\s+", content) or [""]
+        finished = False
+        try:
+            async with self._slot():
+                for token in tokens:
+                    await asyncio.sleep(latency / len(tokens))
+                    yield {"message": {"role": "assistant", "content": token}, "done": False}
+            finished = True
+            yield {"message": {"role": "assistant", "content": ""}, "done": True}
+        finally:
+            if finished:
+                self.completed += 1
+            else:
+                self.aborted += 1
+
+    def _slot(self):
+        return _BusySlot(self)
+
+    async def close(self):
+        pass
+
+class _BusySlot:
+    """Holds one of the fake's generation slots and times how long it is used"""
+
+    def __init__(self, client: FakeOllamaClient):
+        self.client = client
+
+    async def __aenter__(self):
+        if self.client.slots is not None:
+            await self.client.slots.acquire()
+        self.start = asyncio.get_running_loop().time()
+
+    async def __aexit__(self, *exc):
+        self.client.busy_seconds += asyncio.get_running_loop().time() - self.start
+        if self.client.slots is not None:
+            self.client.slots.release()
+
+class PrefixCachingOllamaClient:
+    """Models Ollama's prompt cache and model loading, without generating text.
+
+    Each of ``num_parallel`` slots remembers the tokens of its last prompt. A
+    request takes the slot sharing the longest prefix with its prompt, and only
+    the tokens after that prefix are evaluated, at ``seconds_per_token``. The
+    model is loaded (``load_seconds``) on first use or after ``keep_alive``
+    seconds idle, which also empties every slot. Responses carry Ollama's
+    ``prompt_eval_count`` / ``prompt_eval_duration`` fields.
+    """
+
+    def __init__(self, seconds_per_token=0.0002, load_seconds=0.5, num_parallel=1, content="lol yeah"):
+        self.seconds_per_token = seconds_per_token
+        self.load_seconds = load_seconds
+        self.slots = [[] for _ in range(num_parallel)]
+        self.content = content
+        self.loaded_until = None
+        self.calls = 0
+
+    @staticmethod
+    def render(messages) -> list:
+        """Approximate a chat template as a list of tokens"""
+        text = "".join(f"<|{m['role']}|>\n{m['content']}\n" for m in messages or [])
+        return re.findall(r"\w+|[^\w\s]", text)
+
+    async def chat(self, model: str = "", messages=None, stream: bool = False, keep_alive="5m", options=None, **kwargs):
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        load = 0.0
+        if self.loaded_until is None or loop.time() > self.loaded_until:
+            load = self.load_seconds
+            self.slots = [[] for _ in self.slots]
+            await asyncio.sleep(load)
+
+        tokens = self.render(messages)
+        best, reused = 0, 0
+        for i, cached in enumerate(self.slots):
+            shared = 0
+            for a, b in zip(cached, tokens):
+                if a != b:
+                    break
+                shared += 1
+            if shared > reused:
+                best, reused = i, shared
+        self.slots[best] = tokens
+        evaluated = len(tokens) - reused
+        await asyncio.sleep(evaluated * self.seconds_per_token)
+        self.loaded_until = loop.time() + parse_duration(keep_alive)
+
+        response = {
+            "message": {"role": "assistant", "content": self.content},
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(evaluated * self.seconds_per_token * 1e9),
+            "done": True,
+        }
+        if stream:
+            return self._stream(response)
+        return response
+
+    async def _stream(self, response):
+        yield response
+
+    async def close(self):
+        pass
+
+def parse_duration(value) -> float:
+    """Seconds in an Ollama keep_alive value such as 300, "5m" or "1h" (negative: forever)"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    if isinstance(value, str) and value and value[-1] in units:
+        seconds = float(value[:-1]) * units[value[-1]]
+    else:
+        seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+def simulated_training(messages_file: str, reporter):
+    """Training job target that burns CPU like a fine-tune and reports Trainer-style progress.
+
+    Reads BENCH_TRAINING_STEPS and BENCH_TRAINING_STEP_SECONDS from the
+    environment, which spawned workers inherit.
+    """
+    import os
+    import time
+
+    steps = int(os.getenv("BENCH_TRAINING_STEPS", "20"))
+    step_seconds = float(os.getenv("BENCH_TRAINING_STEP_SECONDS", "0.05"))
+    reporter.phase("Loading model...", 5)
+    started = time.perf_counter()
+    for step in range(1, steps + 1):
+        end = time.perf_counter() + step_seconds
+        while time.perf_counter() < end:
+            sum(range(1000))
+        reporter.check_cancelled()
+        elapsed = time.perf_counter() - started
+        reporter.update(
+            message=f"Training model... step {step}/{steps}",
+            progress=10 + 85 * step // steps,
+            step=step,
+            max_steps=steps,
+            loss=2.0 / step,
+            samples_per_second=step * 8 / elapsed,
+            eta_seconds=elapsed / step * (steps - step),
+        )
+    return {"output_dir": None}
+
+def crashing_training(messages_file: str, reporter):
+    """Training job target whose worker dies without reporting"""
+    import os
+    reporter.phase("Loading model...", 5)
+    os._exit(3)
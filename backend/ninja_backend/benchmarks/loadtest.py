@@ -0,0 +1,294 @@
+"""HTTP load test of the chat endpoints against a mock Ollama server.
+
+Starts ``benchmarks.mock_ollama`` and the target app (``app.main:app`` or
+``local_server:app``) as separate processes, the app pointed at the mock
+through OLLAMA_HOST, and drives ``/practice``, ``/real`` and ``/analyze``
+over real sockets:
+
+- closed loop: ``--concurrency`` clients each sending their next request
+  as soon as the last one returns
+- open loop: requests arriving as a Poisson process at each ``--rates``
+  rate, timed from their scheduled start so a slow server can't hide
+  queueing (no coordinated omission)
+
+For every run it reports throughput, error rate, p50/p90/p99/max latency, a
+latency histogram and the app's event-loop lag, sampled inside the app
+process. The highest open-loop rate that met ``--slo`` p99 with under 1%
+errors is reported as the endpoint's max sustainable RPS.
+
+    python -m benchmarks.loadtest --target app.main:app --concurrency 1 8 32 --rates 5 10 20 --duration 10
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+
+from benchmarks.bench_concurrency import setup_home
+
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")]
+REQUEST_IDS = itertools.count()
+
+def payload_for(endpoint: str) -> dict:
+    """A distinct request, so caches and coalescing don't hide the load"""
+    message = f"want to grab dinner later {next(REQUEST_IDS)}?"
+    if endpoint == "real":
+        history = [
+            {"id": str(n), "text": f"message {n}", "isUser": bool(n % 2), "timestamp": "2024-01-01T00:00:00Z"}
+            for n in range(6)
+        ]
+        return {"message": message, "context": {"goal": "make plans"}, "messages": history}
+    return {"message": message, "context": {"goal": "make plans"}}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# -- Inside the target process -------------------------------------------
+
+def serve_target(target: str, port: int):
+    """Run the target app with an event-loop lag monitor at /loadtest/lag"""
+    import uvicorn
+
+    module_name, attribute = target.split(":")
+    app = getattr(importlib.import_module(module_name), attribute)
+    samples = deque(maxlen=100_000)
+    interval = 0.01
+
+    async def monitor():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            samples.append(max(time.perf_counter() - start - interval, 0.0))
+
+    @app.on_event("startup")
+    async def start_monitor():
+        app.state.lag_monitor = asyncio.create_task(monitor())
+
+    async def lag(reset: bool = False):
+        values = sorted(samples)
+        if reset:
+            samples.clear()
+        return summarize([v * 1000 for v in values])
+
+    app.add_api_route("/loadtest/lag", lag, methods=["GET"])
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+# -- Driver ---------------------------------------------------------------
+
+def summarize(latencies_ms) -> dict:
+    if not latencies_ms:
+        return {"count": 0}
+    ordered = sorted(latencies_ms)
+
+    def pct(q):
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pct(0.5),
+        "p90_ms": pct(0.9),
+        "p99_ms": pct(0.99),
+        "max_ms": ordered[-1],
+        "mean_ms": sum(ordered) / len(ordered),
+    }
+
+def histogram(latencies_ms) -> dict:
+    counts = {}
+    for bound in HISTOGRAM_BUCKETS_MS:
+        counts["le_inf" if bound == float("inf") else f"le_{bound}ms"] = 0
+    for latency in latencies_ms:
+        for bound in HISTOGRAM_BUCKETS_MS:
+            if latency <= bound:
+                counts["le_inf" if bound == float("inf") else f"le_{bound}ms"] += 1
+                break
+    return counts
+
+class Recorder:
+    def __init__(self):
+        self.latencies_ms = []
+        self.errors = 0
+        self.error_kinds = {}
+
+    async def send(self, http, endpoint: str, started: float):
+        try:
+            response = await http.post(f"/api/v1/messages/{endpoint}", json=payload_for(endpoint))
+            ok = response.status_code < 400
+            kind = str(response.status_code)
+        except Exception as e:
+            ok, kind = False, type(e).__name__
+        if ok:
+            self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        else:
+            self.errors += 1
+            self.error_kinds[kind] = self.error_kinds.get(kind, 0) + 1
+
+async def closed_loop(http, endpoint: str, concurrency: int, duration: float) -> Recorder:
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            await recorder.send(http, endpoint, time.perf_counter())
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return recorder
+
+async def open_loop(http, endpoint: str, rate: float, duration: float, seed: int) -> Recorder:
+    recorder = Recorder()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    scheduled = start
+    tasks = []
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - start > duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(recorder.send(http, endpoint, scheduled)))
+    await asyncio.gather(*tasks)
+    return recorder
+
+async def wait_ready(http, path: str, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await http.get(path)).status_code < 500:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{path} didn't come up within {timeout}s")
+
+async def drive(args, base_url: str, mock_url: str) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    runs = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as http:
+        await wait_ready(http, "/healthz")
+        async with httpx.AsyncClient(base_url=mock_url) as mock:
+            await wait_ready(mock, "/api/version")
+
+        scenarios = [("closed", c) for c in args.concurrency] + [("open", r) for r in args.rates]
+        for endpoint in args.endpoints:
+            for mode, level in scenarios:
+                await http.get("/loadtest/lag", params={"reset": True})
+                start = time.perf_counter()
+                if mode == "closed":
+                    recorder = await closed_loop(http, endpoint, int(level), args.duration)
+                else:
+                    recorder = await open_loop(http, endpoint, level, args.duration, args.seed)
+                wall = time.perf_counter() - start
+                lag = (await http.get("/loadtest/lag", params={"reset": True})).json()
+
+                total = len(recorder.latencies_ms) + recorder.errors
+                run = {
+                    "endpoint": endpoint,
+                    "mode": mode,
+                    "concurrency" if mode == "closed" else "rate": level,
+                    "requests": total,
+                    "throughput_rps": len(recorder.latencies_ms) / wall,
+                    "error_rate": recorder.errors / total if total else 0.0,
+                    "errors": recorder.error_kinds,
+                    "latency": summarize(recorder.latencies_ms),
+                    "histogram": histogram(recorder.latencies_ms),
+                    "event_loop_lag": lag,
+                }
+                runs.append(run)
+                latency = run["latency"]
+                print(
+                    f"{endpoint:9s} {mode:6s} {'c' if mode == 'closed' else 'r'}={level:<6g} "
+                    f"rps={run['throughput_rps']:7.2f} err={run['error_rate'] * 100:5.1f}% "
+                    f"p50={latency.get('p50_ms', 0):8.1f}ms p99={latency.get('p99_ms', 0):8.1f}ms "
+                    f"max={latency.get('max_ms', 0):8.1f}ms loop lag p99={lag.get('p99_ms', 0):6.1f}ms max={lag.get('max_ms', 0):6.1f}ms"
+                )
+
+    sustainable = {}
+    for endpoint in args.endpoints:
+        passing = [
+            run["rate"] for run in runs
+            if run["endpoint"] == endpoint and run["mode"] == "open"
+            and run["error_rate"] < 0.01 and run["latency"].get("p99_ms", float("inf")) <= args.slo * 1000
+            and run["throughput_rps"] >= 0.9 * run["rate"]
+        ]
+        sustainable[endpoint] = max(passing) if passing else None
+        if args.rates:
+            print(f"{endpoint:9s} max sustainable rate (p99 <= {args.slo}s, <1% errors): {sustainable[endpoint]}")
+    return {"runs": runs, "max_sustainable_rps": sustainable}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="app.main:app", help="app.main:app or local_server:app")
+    parser.add_argument("--endpoints", nargs="+", default=["practice", "real", "analyze"])
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32], help="closed-loop client counts")
+    parser.add_argument("--rates", type=float, nargs="*", default=[5, 10, 20], help="open-loop arrival rates (req/s)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per run")
+    parser.add_argument("--slo", type=float, default=5.0, help="p99 seconds for a rate to count as sustainable")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock Ollama: seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="mock Ollama: token rate")
+    parser.add_argument("--tokens", type=int, default=20, help="mock Ollama: tokens per reply")
+    parser.add_argument("--parallel", type=int, default=4, help="mock Ollama: generations at once")
+    parser.add_argument("--output", default=None, help="write the JSON results here")
+    # Internal: run the target app with the lag monitor
+    parser.add_argument("--serve-target", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_target:
+        serve_target(args.serve_target, args.port)
+        return
+
+    home = setup_home()
+    mock_port, app_port = free_port(), free_port()
+    env = dict(
+        os.environ,
+        HOME=home,
+        OLLAMA_HOST=f"http://127.0.0.1:{mock_port}",
+        LLM_BACKEND="ollama",
+        OLLAMA_WARM_UP="0",
+    )
+    logs = tempfile.mkdtemp(prefix="ninja-loadtest-")
+    processes = []
+    try:
+        for name, command in (
+            ("mock_ollama", [
+                "-m", "benchmarks.mock_ollama", "--port", str(mock_port), "--latency", str(args.latency),
+                "--tokens-per-second", str(args.tokens_per_second), "--tokens", str(args.tokens),
+                "--parallel", str(args.parallel),
+            ]),
+            ("target", ["-m", "benchmarks.loadtest", "--serve-target", args.target, "--port", str(app_port)]),
+        ):
+            log = open(os.path.join(logs, f"{name}.log"), "w")
+            processes.append(subprocess.Popen([sys.executable] + command, env=env, stdout=log, stderr=subprocess.STDOUT))
+        print(f"{args.target} on :{app_port}, mock Ollama on :{mock_port} (logs in {logs})")
+
+        report = asyncio.run(drive(args, f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{mock_port}"))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(10)
+
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("serve_target", "port", "output")}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    ok = all(run["error_rate"] == 0 for run in report["runs"])
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Mock Ollama HTTP server for load tests.
+
+Serves ``/api/chat`` (streamed as NDJSON or as one JSON response), plus
+``/api/tags`` and ``/api/version``, with replies from the app's
+FakeBackend: deterministic text shaped like what the prompt asks for, a
+configurable time to first token and token rate, and a limit on parallel
+generations like ``OLLAMA_NUM_PARALLEL``. Point the app at it with
+``OLLAMA_HOST``.
+
+    python -m benchmarks.mock_ollama --port 11435 --latency 0.2 --tokens-per-second 50 --parallel 4
+"""
+import argparse
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.llm.backends import FakeBackend
+
+def create_app(latency: float = 0.2, tokens_per_second: float = 50.0, tokens: int = 20, parallel: int = 4) -> FastAPI:
+    app = FastAPI()
+    fake = FakeBackend(
+        "mock",
+        latency=latency,
+        seconds_per_token=1 / tokens_per_second if tokens_per_second else 0,
+        tokens=tokens,
+        parallel=parallel or None,
+    )
+    app.state.fake = fake
+
+    def chunk(model: str, content: str, done: bool, **extra) -> dict:
+        return {
+            "model": model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+            **extra,
+        }
+
+    def totals(start: float, count: int) -> dict:
+        elapsed = int((time.perf_counter() - start) * 1e9)
+        return {"done_reason": "stop", "total_duration": elapsed, "eval_count": count, "eval_duration": elapsed}
+
+    @app.post("/api/chat")
+    async def api_chat(request: Request):
+        body = await request.json()
+        model = body.get("model", "")
+        messages = body.get("messages", [])
+        options = body.get("options") or {}
+        format = body.get("format") or None
+        start = time.perf_counter()
+
+        if not body.get("stream", True):
+            content = await fake.chat(messages, options, format)
+            return JSONResponse(chunk(model, content, True, **totals(start, len(content.split()))))
+
+        async def lines():
+            count = 0
+            async for token in fake.stream(messages, options, format):
+                count += 1
+                yield json.dumps(chunk(model, token, False)) + "\n"
+            yield json.dumps(chunk(model, "", True, **totals(start, count))) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/api/tags")
+    async def api_tags():
+        return {"models": [{"name": "llama3.1:8b", "model": "llama3.1:8b"}]}
+
+    @app.get("/api/version")
+    async def api_version():
+        return {"version": "0.0.0-mock"}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return fake.stats()
+
+    return app
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=20, help="tokens per reply")
+    parser.add_argument("--parallel", type=int, default=4, help="generations at once (0 = unlimited)")
+    args = parser.parse_args()
+    app = create_app(args.latency, args.tokens_per_second, args.tokens, args.parallel)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Hot-path benchmark suite with machine-readable results.
+
+Generates a synthetic chat.db (see ``benchmarks.chatdb``) at the requested
+scale in a temporary HOME, then times the extraction and context paths:
+
+- ``get_contacts``: listing handles
+- ``extract_messages.cold`` / ``.incremental``: a contact's first export,
+  and a re-export with nothing new
+- ``load_context.cold`` / ``.warm``: loading examples and building the
+  retrieval index, then retrieving from the cached examples
+- ``prompt.response`` / ``prompt.suggestions``: assembling the chat messages
+- ``prompt.budgeted``: retrieving, counting and fitting examples and history
+  into the prompt token budget
+- ``parse.suggestions`` / ``parse.streamed``: parsing a suggestions
+  completion whole, and fed in small chunks as it streams
+
+Results (p50/p90/min/mean in milliseconds, plus the scale and environment)
+are written as JSON. With ``--baseline`` the run is compared against an
+earlier results file and fails if any p50 got slower than ``--tolerance``.
+
+    python -m benchmarks.suite --contacts 20 --messages 5000 --output results.json
+    python -m benchmarks.suite --contacts 20 --messages 5000 --baseline results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.chatdb import WORDS, create_chat_db
+
+def measure(fn, repeats: int, setup=None) -> dict:
+    """Time fn() repeats times (after setup(), untimed) with its output silenced"""
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "runs": repeats,
+        "p50_ms": statistics.median(times),
+        "p90_ms": times[min(int(len(times) * 0.9), len(times) - 1)],
+        "min_ms": times[0],
+        "mean_ms": statistics.mean(times),
+    }
+
+def suggestions_text(rng: random.Random, blocks: int) -> str:
+    suggestions = []
+    for i in range(blocks):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 15)))
+        suggestions.append({"text": text, "score": rng.randint(6, 10), "explanation": "casual like their examples"})
+    return json.dumps({"suggestions": suggestions})
+
+def run(args) -> dict:
+    # Paths in the app are resolved from HOME at import time
+    home = tempfile.mkdtemp(prefix="ninja-suite-")
+    os.environ["HOME"] = home
+    db_path = os.path.join(home, "chat.db")
+    start = time.perf_counter()
+    handles = create_chat_db(db_path, args.contacts, args.messages, args.burstiness, seed=args.seed)
+    print(f"Generated {args.contacts * args.messages} messages for {args.contacts} contacts in {time.perf_counter() - start:.1f}s")
+
+    from app.message_extractor import extract_messages as extractor
+    from app.message_extractor import generate
+    from app.message_extractor.context_cache import contact_messages_file, get_cache, mark_exported
+    from app.message_extractor.retrieval import index_path
+    from app.message_extractor.suggestions import SuggestionParser, parse_suggestions
+
+    handle = handles[0]
+    clean = extractor._clean_number(handle)
+    rng = random.Random(args.seed)
+    results = {}
+
+    def only(name):
+        return not args.only or any(name.startswith(prefix) for prefix in args.only)
+
+    if only("get_contacts"):
+        results["get_contacts"] = measure(lambda: extractor.get_contacts(db_path), args.repeats)
+
+    def reset_corpus():
+        for path in extractor._contact_paths(clean):
+            if os.path.exists(path):
+                os.remove(path)
+
+    extract = lambda: extractor.extract_messages(handle, db_path)
+    if only("extract_messages"):
+        results["extract_messages.cold"] = measure(extract, args.repeats, setup=reset_corpus)
+        results["extract_messages.incremental"] = measure(extract, args.repeats)
+
+    # Export the contact's pairs where the generation paths look for them
+    messages_file = contact_messages_file(handle)
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract()
+        extractor.write_json_array(messages_file, extractor.iter_corpus(handle))
+    mark_exported(messages_file)
+
+    queries = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 10))) for _ in range(args.repeats)]
+    next_query = iter(queries * 4).__next__
+
+    def reset_context():
+        get_cache().invalidate(messages_file)
+        if os.path.exists(index_path(messages_file)):
+            os.remove(index_path(messages_file))
+
+    if only("load_context"):
+        results["load_context.cold"] = measure(
+            lambda: generate.load_context(next_query(), contact=handle), args.repeats, setup=reset_context
+        )
+        results["load_context.warm"] = measure(lambda: generate.load_context(next_query(), contact=handle), args.repeats)
+
+    context = generate.load_context(queries[0], contact=handle)
+    history = "\n".join(f"{'User' if i % 2 else 'Other'}: {q}" for i, q in enumerate(queries[:5]))
+    if only("prompt"):
+        results["prompt.response"] = measure(
+            lambda: generate.build_response_messages(context, queries[0], history), args.repeats
+        )
+        results["prompt.suggestions"] = measure(
+            lambda: generate.build_suggestion_messages(context, queries[0], history, "make plans"), args.repeats
+        )
+        results["prompt.budgeted"] = measure(
+            lambda: generate.build_prompt(
+                lambda c, h: generate.build_suggestion_messages(c, queries[0], h, "make plans"),
+                queries[0],
+                history,
+                handle,
+            ),
+            args.repeats,
+        )
+
+    text = suggestions_text(rng, args.suggestion_blocks)
+
+    def parse_streamed():
+        parser = SuggestionParser(limit=args.suggestion_blocks)
+        for i in range(0, len(text), 4):
+            parser.feed(text[i : i + 4])
+        parser.close()
+
+    if only("parse"):
+        results["parse.suggestions"] = measure(
+            lambda: parse_suggestions(text, limit=args.suggestion_blocks), args.repeats
+        )
+        results["parse.streamed"] = measure(parse_streamed, args.repeats)
+
+    return {
+        "meta": {
+            "contacts": args.contacts,
+            "messages_per_contact": args.messages,
+            "burstiness": args.burstiness,
+            "seed": args.seed,
+            "repeats": args.repeats,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+def compare(report: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> bool:
+    """Print p50 changes against baseline; False if any exceeds tolerance.
+
+    Slowdowns under min_delta_ms are ignored, since sub-millisecond timings
+    jitter by more than any sensible tolerance.
+    """
+    ok = True
+    if baseline.get("meta", {}).get("messages_per_contact") != report["meta"]["messages_per_contact"]:
+        print("WARNING: baseline was generated at a different scale")
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        ratio = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+        regressed = ratio > 1 + tolerance and result["p50_ms"] - before["p50_ms"] > min_delta_ms
+        ok = ok and not regressed
+        print(f"{name:30s} {before['p50_ms']:10.3f}ms -> {result['p50_ms']:10.3f}ms {ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=5000, help="messages per contact")
+    parser.add_argument("--burstiness", type=float, default=0.5, help="chance a message has the same sender as the last")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--suggestion-blocks", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="run only benchmarks whose name starts with these")
+    parser.add_argument("--output", default=None, help="write the JSON results here")
+    parser.add_argument("--baseline", default=None, help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown against the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1, help="ignore p50 slowdowns smaller than this")
+    args = parser.parse_args()
+
+    report = run(args)
+    for name, result in report["results"].items():
+        print(f"{name:30s} p50={result['p50_ms']:10.3f}ms p90={result['p90_ms']:10.3f}ms min={result['min_ms']:10.3f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    ok = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            ok = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
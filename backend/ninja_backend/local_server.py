@@ -1,16 +1,33 @@
 """Local server for message extraction."""
 import os
 import sys
+import json
+import asyncio
 import tempfile
 import logging
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.message_extractor.extract_messages import extract_messages, get_contacts
-from app.message_extractor.generate import get_response, analyze_message_suggestions
-from app.api.v1.messages import router
+from app.message_extractor.extract_messages import (
+    count_records,
+    get_contacts,
+    iter_corpus,
+    iter_export_archive,
+    update_corpus,
+)
+from app.message_extractor.generate import (
+    WARM_UP_ON_STARTUP,
+    analyze_message_suggestions,
+    get_practice_result,
+    get_suggestion_speculator,
+    warm_up,
+)
+from app.api.v1.messages import format_conversation_history, router
+from app.llm.client import close_client
+from app.llm.backends import close_backend
+from app.training.jobs import shutdown_manager
 from typing import Optional, List
 
 # Set up logging
@@ -60,23 +77,30 @@ async def healthz():
     """Health check endpoint."""
     return {"status": "ok"}
 
+def iter_messages_json(contact_id: str):
+    """Stream a contact's records as {"messages": [...]} one record at a time"""
+    yield '{"messages": ['
+    for i, record in enumerate(iter_corpus(contact_id)):
+        yield ("," if i else "") + json.dumps(record)
+    yield "]}"
+
 @app.get("/messages")
 async def get_messages(contact_id: str | None = None):
     """Get messages endpoint."""
+    if not contact_id:
+        raise HTTPException(status_code=400, detail="contact_id is required")
     try:
-        messages = extract_messages(contact_id)
-        if not messages and contact_id:
+        # Bring the corpus up to date, then stream the records straight from it
+        state = await asyncio.to_thread(update_corpus, contact_id)
+        if not count_records(state):
             raise HTTPException(
                 status_code=404,
                 detail=f"No messages found for contact {contact_id}"
             )
-        elif not messages:
-            raise HTTPException(
-                status_code=403,
-                detail="Please grant Full Disk Access permission in System Preferences > Security & Privacy > Privacy"
-            )
-        return {"messages": messages}
-    except FileNotFoundError:
+        return StreamingResponse(iter_messages_json(contact_id), media_type="application/json")
+    except HTTPException:
+        raise
+    except (FileNotFoundError, PermissionError):
         raise HTTPException(
             status_code=403,
             detail="Messages database not accessible. Please grant Full Disk Access permission."
@@ -130,26 +154,28 @@ async def export_messages(request: ExportRequest):
     try:
         # Clean the phone number for filename
         clean_number = '+' + ''.join(c for c in request.phoneNumber.lstrip('+') if c.isdigit())
-        output_file = os.path.join(os.path.expanduser("~/Documents/ninja/messages_data"), f"{clean_number}.tar.gz")
         
-        # Run the export script
-        messages_data = extract_messages(request.phoneNumber)
-        if messages_data is None:
+        # Bring the corpus up to date, then stream the archive straight from it
+        state = await asyncio.to_thread(update_corpus, request.phoneNumber)
+        if not count_records(state):
             logger.warning(f"No messages found for phone number: {request.phoneNumber}")
             raise HTTPException(
                 status_code=404,
                 detail=f"No messages found for phone number {request.phoneNumber}"
             )
         
-        # Return the file
-        return FileResponse(
-            output_file,
+        return StreamingResponse(
+            iter_export_archive(request.phoneNumber),
             media_type="application/gzip",
-            filename=f"{clean_number}.tar.gz",
-            background=None  # Prevent async file deletion
+            headers={"Content-Disposition": f'attachment; filename="{clean_number}.tar.gz"'}
         )
     except HTTPException:
         raise
+    except (FileNotFoundError, PermissionError):
+        raise HTTPException(
+            status_code=403,
+            detail="Messages database not accessible. Please grant Full Disk Access permission."
+        )
     except Exception as e:
         logger.error(f"Export failed: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -161,17 +187,12 @@ async def export_messages(request: ExportRequest):
 async def practice_chat(request: MessageRequest):
     """Practice chat endpoint using Claude as fallback."""
     try:
-        response = get_response(
+        # Generate response and suggestions concurrently, each within its budget
+        response, suggestions = await get_practice_result(
             message=request.message,
             conversation_history=request.conversation_history,
-            use_claude=request.use_claude
-        )
-        
-        # Generate suggestions
-        suggestions = analyze_message_suggestions(
-            request.message,
-            request.conversation_history or "",
-            request.context.get("goal", "")
+            goal=request.context.get("goal", ""),
+            contact=request.context.get("contact")
         )
         
         return {
@@ -192,17 +213,15 @@ async def real_chat(request: RealChatRequest):
         logger.debug(f"Received real chat request: {request.message}")
         
         # Convert conversation history to string format
-        conversation_history = "\n".join([
-            f"{'User' if msg.isUser else 'Other'}: {msg.text}"
-            for msg in request.messages[-5:]  # Only use last 5 messages for context
-        ])
+        conversation_history = format_conversation_history(request.messages)
         logger.debug(f"Conversation history: {conversation_history}")
         
         # Get suggestions using the model
-        suggestions = analyze_message_suggestions(
+        suggestions = await analyze_message_suggestions(
             request.message,
             conversation_history,
-            request.context.get("goal", "")
+            request.context.get("goal", ""),
+            request.context.get("contact")
         )
         logger.debug(f"Generated suggestions: {suggestions}")
         
@@ -224,6 +243,17 @@ async def startup_event():
         logger.debug(f"Found {len(contacts)} contacts")
     except Exception as e:
         logger.error(f"Database access failed: {e}")
+    # Load the model in the background so the server accepts requests right away
+    if WARM_UP_ON_STARTUP:
+        app.state.warm_up = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled Ollama connections and stop training jobs."""
+    get_suggestion_speculator().cancel_all()
+    await close_client()
+    await close_backend()
+    await asyncio.to_thread(shutdown_manager)
 
 if __name__ == "__main__":
     logger.info("Starting server...")
@@ -5,6 +5,7 @@ import { ChatMessage } from './ChatMessage';
 import { FeedbackPanel } from './FeedbackPanel';
 import { PaperAirplaneIcon, MicrophoneIcon, StopIcon, PlusCircleIcon, PencilIcon, UserCircleIcon } from '@heroicons/react/24/solid';
 import { cn } from '@/lib/utils';
+import { readSSE } from '@/lib/sse';
 import { ContextSettings } from '@/types';
 import { Sidebar } from './Sidebar';
 
@@ -60,6 +61,9 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
   const pollingIntervalRef = useRef<NodeJS.Timeout | undefined>(undefined);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const lastAnalyzedInputRef = useRef<string>('');
+  // Lets the backend cancel this chat's older draft analyses when a newer one arrives
+  const analyzeSessionIdRef = useRef<string>(crypto.randomUUID());
+  const analyzeAbortRef = useRef<AbortController | null>(null);
 
   // Update contact when activePhoneNumber changes
   useEffect(() => {
@@ -118,6 +122,11 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
 
   const handleAnalyze = async () => {
     if (!input.trim()) return;
+
+    // Only the latest draft's analysis is shown, so drop the previous request
+    analyzeAbortRef.current?.abort();
+    const controller = new AbortController();
+    analyzeAbortRef.current = controller;
     
     setIsAnalyzing(true);
     try {
@@ -127,22 +136,29 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
         body: JSON.stringify({
           message: input.trim(),
           context: contextSettings,
-          conversation_history: messages.map(m => `${m.isUser ? 'User' : 'Assistant'}: ${m.text}`).join('\n')
-        })
+          conversation_history: messages.map(m => `${m.isUser ? 'User' : 'Assistant'}: ${m.text}`).join('\n'),
+          session_id: analyzeSessionIdRef.current
+        }),
+        signal: controller.signal
       });
 
       if (!response.ok) throw new Error('Failed to get feedback');
       
       const data = await response.json();
+      if (data.superseded) return;
       if (data.feedback) {
         console.log('Analysis feedback:', data.feedback);
         onRealtimeFeedback(data.feedback);
       }
     } catch (err) {
+      if (controller.signal.aborted) return;
       console.error('Failed to analyze message:', err);
       onRealtimeFeedback('');
     } finally {
-      setIsAnalyzing(false);
+      if (analyzeAbortRef.current === controller) {
+        analyzeAbortRef.current = null;
+        setIsAnalyzing(false);
+      }
     }
   };
 
@@ -156,10 +172,10 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
   };
 
   // For suggestions, let's add a retry mechanism
-  const getSuggestions = async (retries = 3) => {
-    if (!messages.length) return; // Exit if no messages
+  const getSuggestions = async (history: Message[] = messages, retries = 3) => {
+    if (!history.length) return; // Exit if no messages
 
-    const lastMessage = messages[messages.length - 1];
+    const lastMessage = history[history.length - 1];
     if (!lastMessage) return; // Extra safety check
 
     for (let i = 0; i < retries; i++) {
@@ -170,7 +186,7 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
           body: JSON.stringify({
             message: lastMessage.text,
             context: contextSettings,
-            messages: messages
+            messages: history
           })
         });
 
@@ -207,7 +223,7 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
     setError(null);
 
     try {
-        const response = await fetch('http://localhost:3001/api/v1/messages/practice', {
+        const response = await fetch('http://localhost:3001/api/v1/messages/practice/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -224,34 +240,66 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
+        // Render the reply as tokens arrive and suggestions as each one completes
+        const aiMessageId = (Date.now() + 1).toString();
+        let replyText = '';
+        const streamedFeedback: Feedback[] = [];
+        let data: PracticeResponse | null = null;
+
+        await readSSE(response, ({ event, data: payload }) => {
+            if (event === 'token') {
+                const isFirstToken = !replyText;
+                replyText += payload.text;
+                if (isFirstToken) {
+                    setMessages(prev => [...prev, {
+                        text: replyText,
+                        isUser: false,
+                        id: aiMessageId,
+                        timestamp: new Date().toLocaleTimeString()
+                    }]);
+                } else {
+                    setMessages(prev => prev.map(m => m.id === aiMessageId ? { ...m, text: replyText } : m));
+                }
+            } else if (event === 'suggestion') {
+                streamedFeedback.push(payload);
+                onFeedbackChange([...streamedFeedback]);
+            } else if (event === 'error') {
+                console.error('Practice stream error:', payload.detail);
+            } else if (event === 'done') {
+                data = payload;
+            }
+        });
+
+        const result = data as PracticeResponse | null;
         console.log('API Response:', {
             status: response.status,
-            data: data,
-            feedback: data.feedback,
-            feedbackLength: data.feedback?.length
+            data: result,
+            feedback: result?.feedback,
+            feedbackLength: result?.feedback?.length
         });
 
         // Handle AI response
-        if (data.response) {
-            const aiMessage: Message = {
-                text: data.response,
+        if (result?.response) {
+            setMessages(prev => prev.map(m => m.id === aiMessageId ? { ...m, text: result.response } : m));
+
+            // The conversation as it stands now, including the reply that just arrived
+            const history: Message[] = [...messages, userMessage, {
+                text: result.response,
                 isUser: false,
-                id: (Date.now() + 1).toString(),
+                id: aiMessageId,
                 timestamp: new Date().toLocaleTimeString()
-            };
-            setMessages(prev => [...prev, aiMessage]);
+            }];
 
             // Get suggestions with retry mechanism
-            await getSuggestions();
+            await getSuggestions(history);
         }
 
         // Handle initial feedback
-        if (data.feedback && Array.isArray(data.feedback)) {
-            console.log('Setting initial feedback:', data.feedback);
-            onFeedbackChange(data.feedback);
+        if (result?.feedback && Array.isArray(result.feedback)) {
+            console.log('Setting initial feedback:', result.feedback);
+            onFeedbackChange(result.feedback);
         } else {
-            console.log('No valid feedback received:', data.feedback);
+            console.log('No valid feedback received:', result?.feedback);
             onFeedbackChange([]);
         }
     } catch (err) {
@@ -409,7 +457,7 @@ export function ChatInterface({ contextSettings, onFeedbackChange, onRealtimeFee
               <button
                 type="button"
                 onClick={handleAnalyze}
-                disabled={!input.trim() || isAnalyzing}
+                disabled={!input.trim()}
                 className={cn(
                   "p-3 rounded-xl transition-colors",
                   isAnalyzing 
@@ -33,6 +33,7 @@ interface ExportProgress {
 }
 
 interface TrainingProgress {
+  job_id?: string;
   is_training: boolean;
   progress: number;
   message: string;
@@ -61,39 +62,41 @@ export default function Home() {
     error: null
   });
   const [activePhoneNumber, setActivePhoneNumber] = useState<string>('');
+  const [trainingJobId, setTrainingJobId] = useState<string | null>(null);
 
-  // Add polling for training progress
+  // Follow the export's training job; the server pushes progress only when it changes
   useEffect(() => {
-    let pollInterval: NodeJS.Timeout;
+    if (!showExportDialog || exportProgress.step !== 'training' || !trainingJobId) return;
 
-    // Only poll if dialog is open AND we're in training step
-    if (showExportDialog && exportProgress.step === 'training') {
-      pollInterval = setInterval(async () => {
-        try {
-          const response = await fetch('http://localhost:3001/api/v1/messages/training-progress');
-          const progress = await response.json();
-          setTrainingProgress(progress);
+    const source = new EventSource(
+      `http://localhost:3001/api/v1/messages/training/jobs/${trainingJobId}/events`
+    );
 
-          if (progress.error) {
-            setExportProgress({ 
-              step: 'error', 
-              message: progress.error 
-            });
-            clearInterval(pollInterval);
-          } else if (progress.progress === 100) {
-            setExportProgress({ step: 'complete' });
-            clearInterval(pollInterval);
-          }
-        } catch (err) {
-          console.error('Failed to fetch training progress:', err);
-        }
-      }, 1000);
-    }
+    source.addEventListener('progress', (event) => {
+      const progress = JSON.parse((event as MessageEvent).data);
+      setTrainingProgress(progress);
+
+      if (progress.error) {
+        setExportProgress({ 
+          step: 'error', 
+          message: progress.error 
+        });
+        source.close();
+      } else if (progress.progress === 100) {
+        setExportProgress({ step: 'complete' });
+        source.close();
+      }
+    });
 
-    return () => {
-      if (pollInterval) clearInterval(pollInterval);
+    source.addEventListener('done', () => source.close());
+
+    source.onerror = (err) => {
+      // EventSource reconnects on its own; this only logs the drop
+      console.error('Training progress stream interrupted:', err);
     };
-  }, [exportProgress.step, showExportDialog]);
+
+    return () => source.close();
+  }, [exportProgress.step, showExportDialog, trainingJobId]);
 
   const handleExport = async () => {
     if (!phoneNumber) return;
@@ -119,6 +122,7 @@ export default function Home() {
       
       // Set active phone number
       setActivePhoneNumber(phoneNumber);
+      setTrainingJobId(data.job_id ?? null);
       
       // Download the JSON file
       const a = document.createElement('a');
@@ -0,0 +1,34 @@
+export interface SSEEvent {
+  event: string;
+  data: any;
+}
+
+// Read a text/event-stream response body, calling onEvent for each complete event
+export async function readSSE(response: Response, onEvent: (event: SSEEvent) => void) {
+  if (!response.body) return;
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      let event = 'message';
+      let data = '';
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice('event: '.length);
+        else if (line.startsWith('data: ')) data += line.slice('data: '.length);
+      }
+      if (data) onEvent({ event, data: JSON.parse(data) });
+    }
+  }
+}